@@ -0,0 +1,15 @@
+"""Batch scoring of the CKB stroke risk models.
+
+The notebook `Run Models for External Validation.ipynb` compares the model
+outputs for a single new individual. This package scores whole cohorts:
+
+    from ckb_stroke import score_cohort
+    risks = score_cohort(raw_df, 'Female')
+"""
+
+from .parameters import HORIZONS, MODEL_FAMILIES, RAW_COLUMN_NAMES
+from .registry import ModelRegistry, get_registry, warm_up
+from .scoring import score_cohort
+
+__all__ = ['HORIZONS', 'MODEL_FAMILIES', 'RAW_COLUMN_NAMES', 'ModelRegistry', 'get_registry', 'score_cohort',
+           'warm_up']
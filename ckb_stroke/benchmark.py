@@ -0,0 +1,265 @@
+"""Benchmarks of every scoring stage on synthetic cohorts.
+
+Each stage (input validation, feature derivation, imputation, each model
+family, risk table rendering and the headless HTML report) is measured in fresh processes, one per
+batch size, so that its cold start and peak memory are not hidden by
+another stage's imports or loaded models:
+
+    cold_start_s            first call with one row in a fresh process, including model
+                            loading and lazy backend imports
+    warm_latency_ms         median time per call with one row, once warm
+    throughput_rows_per_s   rows per second at each batch size, once warm
+    peak_rss_mb             peak resident memory of the process at each batch size
+
+Synthetic cohorts are drawn around the CKB mean values that the notebook
+imputes with (`male_mean_value_df` and `female_mean_value_df`): indicators
+are Bernoulli draws with the mean as probability, one-hot groups are
+categorical draws, continuous risk factors are normal around their mean
+(clipped to the ranges of ckb_stroke.validation, and counts rounded), and
+regions are uniform. Results are written as JSON so that runs can be
+compared between releases:
+
+    python -m ckb_stroke.benchmark -o benchmark.json
+    python -m ckb_stroke.benchmark --stages derivation,lr,gbt --batch-sizes 1,100 --sex Female
+
+Stages whose models are not available (e.g. the RSF .rds files) or whose
+backend is not installed (e.g. matplotlib for table rendering) are reported
+with the error instead of timings.
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from .parameters import FEATURE_COLUMNS, IMPUTATION_MEANS, MALE, RAW_COLUMN_NAMES, REGIONS, SEXES
+from .validation import COUNT_COLUMNS, ONE_HOT_GROUPS, RANGES
+
+STAGES = ['validation', 'derivation', 'imputation', 'FSRP', 'Recalibrated_Refitted_FSRP', 'Cox', 'RSF', 'LR', 'SVM',
+          'GBT', 'MLP', 'table_rendering', 'report_writing']
+
+BATCH_SIZES = [1, 100, 10**4, 10**6]
+
+#Rendering draws one figure per individual, so larger batches are not measured
+MAX_BATCH_SIZES = {'table_rendering': 100}
+
+#Warm calls are repeated for at least this long
+MIN_TIME = 0.2
+
+#Raw risk factors that are not indicators
+CONTINUOUS_COLUMNS = ['age', 'sbp_mean', 'household_size', 'years_since_quitting_smoking', 'children', 'siblings',
+                      'met', 'met_hours', 'standing_height_cm', 'sitting_height_cm', 'waist_cm',
+                      'waist_hip_ratio_percent', 'weight_kg', 'bmi_calc', 'fat_percent', 'dbp_mean',
+                      'heart_rate_mean_10s']
+
+#Relative standard deviation of the continuous risk factors
+RELATIVE_SD = 0.2
+
+
+##########################################################################################################
+#SYNTHETIC COHORTS
+
+def _raw_means(sex):
+    means = dict(zip(FEATURE_COLUMNS, IMPUTATION_MEANS[sex]))
+    #The input vector holds age/10 and sbp_mean/10
+    means['age'] = means['age_at_study_date']*10
+    means['sbp_mean'] = means['sbp_mean']*10
+    return means
+
+
+def synthetic_cohort(n, sex, seed=0):
+    """Return `n` rows of raw risk factors drawn around the CKB mean values for `sex`."""
+    rng = np.random.default_rng(seed)
+    means = _raw_means(sex)
+    columns = {}
+    for prefix, group in ONE_HOT_GROUPS.items():
+        p = np.array([means[column] for column in group])
+        choice = rng.choice(len(group), size=n, p=p/p.sum())
+        for k, column in enumerate(group):
+            columns[column] = (choice == k).astype(np.float64)
+    for column in RAW_COLUMN_NAMES:
+        if column == 'region' or column in columns:
+            continue
+        mean = means[column]
+        if column in CONTINUOUS_COLUMNS:
+            values = rng.normal(mean, RELATIVE_SD*mean, size=n)
+            if column in COUNT_COLUMNS:
+                columns[column] = np.round(np.maximum(values, 0))
+            else:
+                columns[column] = np.clip(values, *RANGES[column])
+        else:
+            columns[column] = (rng.random(n) < mean).astype(np.float64)
+    columns['region'] = rng.choice(REGIONS, size=n)
+    return pd.DataFrame(columns, columns=RAW_COLUMN_NAMES)
+
+
+##########################################################################################################
+#STAGES
+
+def _stage(name, sex, raw_df):
+    """Prepare the input of stage `name` from `raw_df` and return a function running the stage on it."""
+    from .preprocessing import derive_features, impute_missing_values
+    from .registry import get_registry
+    from .scoring import ML_FAMILIES, risk_table, score_cohort
+    from .survival import PROPORTIONAL_HAZARDS_FAMILIES, proportional_hazards_risk
+    from .validation import validate
+
+    if name == 'validation':
+        return lambda: validate(raw_df, sex)
+    if name == 'derivation':
+        return lambda: derive_features(raw_df)
+    features = derive_features(raw_df)
+    if name == 'imputation':
+        return lambda: impute_missing_values(features, sex)
+    features, _ = impute_missing_values(features, sex)
+    if name in PROPORTIONAL_HAZARDS_FAMILIES:
+        return lambda: proportional_hazards_risk(features, sex, [name])
+    if name in ML_FAMILIES:
+        return lambda: ML_FAMILIES[name](features, sex, registry=get_registry())
+
+    from io import BytesIO, StringIO
+
+    from .report import save_risk_table_figure, write_risks
+
+    risk_df = score_cohort(raw_df, sex)
+    if name == 'report_writing':
+        return lambda: write_risks(risk_df, StringIO(), 'html')
+
+    def render():
+        for row in risk_df.index:
+            save_risk_table_figure(risk_table(risk_df, row), BytesIO())
+    return render
+
+
+def _peak_rss_mb():
+    #ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak/2**20 if sys.platform == 'darwin' else peak/2**10
+
+
+def measure(name, sex, batch_size, min_time=MIN_TIME, seed=0):
+    """Measure one stage at one batch size in the current process, which should not have run it before.
+
+    Returns a dict with the first call's time (`first_call_s`), the median
+    time per warm call (`warm_call_s`), warm throughput and peak RSS.
+    """
+    run = _stage(name, sex, synthetic_cohort(batch_size, sex, seed))
+    start = time.perf_counter()
+    run()
+    first_call = time.perf_counter()-start
+
+    times = []
+    start = time.perf_counter()
+    while not times or time.perf_counter()-start < min_time:
+        call_start = time.perf_counter()
+        run()
+        times.append(time.perf_counter()-call_start)
+    return {
+        'first_call_s': first_call,
+        'warm_call_s': float(np.median(times)),
+        'throughput_rows_per_s': batch_size*len(times)/sum(times),
+        'peak_rss_mb': _peak_rss_mb(),
+    }
+
+
+def _measure_in_subprocess(name, sex, batch_size, min_time, seed):
+    command = [sys.executable, '-m', 'ckb_stroke.benchmark', '--measure', name, '--sex', sex,
+               '--batch-sizes', str(batch_size), '--min-time', str(min_time), '--seed', str(seed)]
+    #The child must import this copy of the package whatever its working directory
+    package_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [package_root, os.environ.get('PYTHONPATH')])))
+    result = subprocess.run(command, capture_output=True, text=True, env=env)
+    if result.returncode != 0:
+        lines = result.stderr.strip().splitlines()
+        return {'error': lines[-1] if lines else 'exit code {}'.format(result.returncode)}
+    return json.loads(result.stdout)
+
+
+def run_benchmarks(stages=STAGES, batch_sizes=BATCH_SIZES, sex=MALE, min_time=MIN_TIME, seed=0, log=None):
+    """Benchmark `stages` at `batch_sizes`, each in a fresh process, and return the results as a dict."""
+    results = {}
+    for name in stages:
+        stage = results[name] = {'cold_start_s': None, 'warm_latency_ms': None, 'throughput_rows_per_s': {},
+                                 'peak_rss_mb': {}}
+        for batch_size in batch_sizes:
+            if batch_size > MAX_BATCH_SIZES.get(name, batch_size):
+                continue
+            if log:
+                log('{} x {}'.format(name, batch_size))
+            measured = _measure_in_subprocess(name, sex, batch_size, min_time, seed)
+            if 'error' in measured:
+                stage['error'] = measured['error']
+                break
+            stage['throughput_rows_per_s'][str(batch_size)] = measured['throughput_rows_per_s']
+            stage['peak_rss_mb'][str(batch_size)] = measured['peak_rss_mb']
+            if batch_size == 1:
+                stage['cold_start_s'] = measured['first_call_s']
+                stage['warm_latency_ms'] = measured['warm_call_s']*1000
+    return {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'sex': sex,
+        'batch_sizes': list(batch_sizes),
+        'min_time_s': min_time,
+        'seed': seed,
+        'environment': {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+        },
+        'stages': results,
+    }
+
+
+def _comma_list(value, choices, convert=str):
+    lookup = {str(choice).lower(): choice for choice in choices} if choices else None
+    items = []
+    for item in (item.strip() for item in value.split(',') if item.strip()):
+        if lookup is None:
+            items.append(convert(item))
+        elif item.lower() in lookup:
+            items.append(lookup[item.lower()])
+        else:
+            raise argparse.ArgumentTypeError('unknown stage: {} (choose from {})'.format(item, ', '.join(choices)))
+    return items
+
+
+def main(argv=None, prog=None):
+    parser = argparse.ArgumentParser(prog=prog, description='Benchmark every scoring stage on synthetic cohorts.')
+    parser.add_argument('--stages', type=lambda value: _comma_list(value, STAGES), default=STAGES,
+                        help='comma-separated stages (default: all of {})'.format(', '.join(STAGES)))
+    parser.add_argument('--batch-sizes', type=lambda value: _comma_list(value, None, int), default=BATCH_SIZES,
+                        help='comma-separated batch sizes (default: 1,100,10000,1000000)')
+    parser.add_argument('--sex', choices=SEXES, default=MALE)
+    parser.add_argument('--min-time', type=float, default=MIN_TIME,
+                        help='seconds to repeat warm calls for (default: {})'.format(MIN_TIME))
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('-o', '--output', help='JSON output file (default: stdout)')
+    parser.add_argument('--measure', choices=STAGES, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.measure:
+        #Child process of run_benchmarks
+        json.dump(measure(args.measure, args.sex, args.batch_sizes[0], args.min_time, args.seed), sys.stdout)
+        return
+
+    results = run_benchmarks(args.stages, args.batch_sizes, args.sex, args.min_time, args.seed,
+                             log=lambda message: print(message, file=sys.stderr))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == '__main__':
+    main()
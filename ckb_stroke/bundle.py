@@ -0,0 +1,196 @@
+"""Single memory-mappable bundle of every model parameter.
+
+`write_bundle` packs the compiled models (see ckb_stroke.export), with the
+stacked horizon models scored for GBT and MLP, and the proportional hazards
+kernels of parameters.py into one file:
+
+    magic (8 bytes) | format version (uint32) | header length (uint32) | JSON header | arrays
+
+The JSON header indexes every array by (offset, dtype, shape). Each array
+starts on a 64-byte boundary, so `Bundle` opens the file with np.memmap and
+builds the models as read-only views of the mapping without copying or
+unpickling anything. The arrays are stored in the layouts used for scoring
+(e.g. the packed tree levels and the kernels' coefficient matrices and log
+baseline survival tables), so nothing is recomputed either. Processes that
+open the same bundle share one copy of it in the page cache, and loading
+does not depend on the scikit-learn, keras or R versions the models were
+trained with.
+
+The registry takes models and proportional hazards parameters from
+`ckb_stroke_models.bundle` in the model directory in preference to the
+compiled .npz files, the original model objects and parameters.py. The
+compiled .npz files and parameters.py are the versioned source of the
+parameters; the bundle is built from them and is not committed. Build it, or
+rebuild it after the models are re-exported or parameters.py changes, with
+
+    python -m ckb_stroke.export --bundle
+"""
+
+import json
+import os
+import struct
+
+import numpy as np
+
+from .forest import SurvivalForest
+from .linear import CalibratedLinearSVM, LogisticModel
+from .mlp import DenseNetwork, stack_networks
+from .parameters import COX_COLUMNS, HORIZONS, MODEL_FAMILIES, SEXES
+from .registry import COMPILED_LOADERS, STACKED
+from .survival import PROPORTIONAL_HAZARDS_KERNELS, ProportionalHazardsKernel
+from .trees import TreeEnsemble, stack_ensembles
+
+MAGIC = b'CKBSTRK\0'
+
+#Version of the bundle format; the compiled .npz format has its own (see ckb_stroke.export)
+BUNDLE_FORMAT_VERSION = 2
+_PREAMBLE = struct.Struct('<8sII')
+
+#Byte alignment of every array in a bundle or shared memory block
+ALIGNMENT = 64
+
+COMPILED_CLASSES = {cls.__name__: cls for cls in (LogisticModel, CalibratedLinearSVM, DenseNetwork, TreeEnsemble,
+                                                  SurvivalForest)}
+
+#Families whose four horizon models of one sex are scored as one stacked model (see ckb_stroke.models)
+STACK_FUNCTIONS = {'GBT': stack_ensembles, 'MLP': stack_networks}
+
+
+def _aligned(offset):
+    return -(-offset//ALIGNMENT)*ALIGNMENT
+
+
+def array_layout(arrays, offset=0):
+    """Place `arrays` one after another from `offset`, each on an ALIGNMENT boundary.
+
+    Returns {name: (offset, dtype, shape)} and the offset just past the last array.
+    """
+    layout = {}
+    for name, array in arrays.items():
+        offset = _aligned(offset)
+        layout[name] = (offset, array.dtype.str, array.shape)
+        offset += array.nbytes
+    return layout, offset
+
+
+def write_arrays(buffer, layout, arrays, base=0):
+    for name, (offset, dtype, shape) in layout.items():
+        np.ndarray(shape, dtype, buffer=buffer, offset=base+offset)[...] = arrays[name]
+
+
+def view_arrays(buffer, layout, base=0):
+    """Return the arrays described by `layout` as views of `buffer`."""
+    return {name: np.ndarray(tuple(shape), dtype, buffer=buffer, offset=base+offset)
+            for name, (offset, dtype, shape) in layout.items()}
+
+
+def layout_bytes(layout):
+    return sum(np.dtype(dtype).itemsize*int(np.prod(shape)) for _, dtype, shape in layout.values())
+
+
+def compiled_models(registry, sexes=SEXES, families=MODEL_FAMILIES, exclude=()):
+    """Yield (key, model) for every compiled model of `sexes` and `families` available to `registry`.
+
+    The four horizon models of a family in STACK_FUNCTIONS are followed by
+    their stack, under horizon STACKED. Keys in `exclude` are skipped.
+    """
+    for sex in sexes:
+        for family in families:
+            if family not in COMPILED_LOADERS:
+                continue
+            models = []
+            for horizon in ([None] if family == 'RSF' else HORIZONS):
+                if registry.compiled_path(sex, family, horizon) is None:
+                    continue
+                models.append(registry.get(sex, family, horizon))
+                if (sex, family, horizon) not in exclude:
+                    yield (sex, family, horizon), models[-1]
+            if family in STACK_FUNCTIONS and len(models) == len(HORIZONS) and (sex, family, STACKED) not in exclude:
+                stacked = STACK_FUNCTIONS[family](models)
+                if stacked is not None:
+                    yield (sex, family, STACKED), stacked
+
+
+##########################################################################################################
+#WRITING AND READING
+
+def write_bundle(path, registry, sexes=SEXES, families=MODEL_FAMILIES):
+    """Write every compiled model of `sexes` and `families` available to `registry`, with the proportional hazards
+    kernels of every sex, to `path`.
+
+    The bundle is written next to `path` and then renamed over it, so
+    processes that have the previous bundle mapped keep a consistent view.
+    Returns the keys of the bundled models.
+    """
+    models, parameters = [], []
+    offset = 0
+    for sex in SEXES:
+        arrays = PROPORTIONAL_HAZARDS_KERNELS[sex].to_arrays()
+        layout, offset = array_layout(arrays, offset)
+        parameters.append((sex, layout, arrays))
+    for key, model in compiled_models(registry, sexes, families):
+        arrays = model.mapped_arrays()
+        layout, offset = array_layout(arrays, offset)
+        models.append((key, type(model).__name__, layout, arrays))
+
+    header = json.dumps({
+        'models': [{'key': key, 'class': class_name, 'arrays': layout} for key, class_name, layout, _ in models],
+        'parameters': {sex: {'arrays': layout, 'cox_columns': COX_COLUMNS[sex]} for sex, layout, _ in parameters},
+    }).encode('utf-8')
+    data_start = _aligned(_PREAMBLE.size+len(header))
+
+    temp_path = '{}.{}.tmp'.format(path, os.getpid())
+    with open(temp_path, 'wb') as f:
+        f.write(_PREAMBLE.pack(MAGIC, BUNDLE_FORMAT_VERSION, len(header)))
+        f.write(header)
+        f.truncate(data_start+_aligned(offset))
+    data = np.memmap(temp_path, dtype=np.uint8, mode='r+', offset=data_start)
+    for _, layout, arrays in parameters:
+        write_arrays(data, layout, arrays)
+    for _, _, layout, arrays in models:
+        write_arrays(data, layout, arrays)
+    data.flush()
+    del data
+    os.replace(temp_path, path)
+    return [key for key, _, _, _ in models]
+
+
+class Bundle:
+    """A model bundle mapped read-only into memory."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            preamble = f.read(_PREAMBLE.size)
+            if len(preamble) < _PREAMBLE.size or _PREAMBLE.unpack(preamble)[0] != MAGIC:
+                raise ValueError('Not a model bundle: {}'.format(path))
+            _, version, header_length = _PREAMBLE.unpack(preamble)
+            if version != BUNDLE_FORMAT_VERSION:
+                raise ValueError('Unsupported bundle format version {} in {}'.format(version, path))
+            header = json.loads(f.read(header_length).decode('utf-8'))
+        self._data = np.memmap(path, dtype=np.uint8, mode='r', offset=_aligned(_PREAMBLE.size+header_length))
+        self._models = {tuple(entry['key']): (entry['class'], entry['arrays']) for entry in header['models']}
+        missing = [sex for sex in SEXES if sex not in header['parameters']]
+        if missing:
+            raise ValueError('{} has no {} parameters'.format(path, ', '.join(missing)))
+        self._kernels = {sex: ProportionalHazardsKernel(sex, view_arrays(self._data, parameters['arrays']),
+                                                        parameters['cox_columns'])
+                         for sex, parameters in header['parameters'].items()}
+
+    def __contains__(self, key):
+        return key in self._models
+
+    def keys(self):
+        return list(self._models)
+
+    def model(self, sex, family, horizon=None):
+        """Return the compiled model for (sex, family, horizon), built on views of the mapped file."""
+        class_name, layout = self._models[(sex, family, horizon)]
+        return COMPILED_CLASSES[class_name].from_arrays(view_arrays(self._data, layout))
+
+    def nbytes(self, sex, family, horizon=None):
+        return layout_bytes(self._models[(sex, family, horizon)][1])
+
+    def proportional_hazards_kernel(self, sex):
+        """Return the proportional hazards kernel of `sex`, built on views of the mapped file."""
+        return self._kernels[sex]
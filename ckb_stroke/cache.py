@@ -0,0 +1,115 @@
+"""Memoization of risk estimates for repeated individuals.
+
+A front-end that re-submits the same individual while a form is edited would
+otherwise re-run every model family each time. `ResultCache` keeps the risk
+estimates of recently scored individuals, keyed by a hash of their canonical
+input: sex, region, the scored model families and the input vector after
+derivation and imputation. Submissions that differ only in ways imputation
+removes (e.g. 'Missing' versus the CKB mean value) therefore share an entry.
+score_cohort looks every row up before scoring and runs the models only for
+the rows that miss.
+
+    cache = ResultCache(max_entries=10000, ttl=600)
+    risks = score_cohort(raw_df, 'Male', cache=cache)
+    cache.stats()
+
+A cache holds results of one set of trained models: use a separate cache for
+each registry or model directory, and clear it when the models change.
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+def row_keys(features, sexes, families, precision='float64'):
+    """Return the cache key of every row of an imputed FeatureMatrix, given each row's sex.
+
+    Risks scored with a ReducedPrecision are kept apart from float64 ones by passing its description as
+    `precision`.
+    """
+    #Adding 0.0 turns -0.0 into 0.0, which scores the same; the region indicators encode region
+    x = features.ml_input().astype(np.float64) + 0.0
+    prefix = '|'.join(families if precision == 'float64' else families+[precision]).encode('utf-8')
+    return [hashlib.blake2b(b'|'.join([prefix, sex.encode('utf-8'), row.tobytes()]), digest_size=16).digest()
+            for sex, row in zip(sexes, x)]
+
+
+class ResultCache:
+    """A thread-safe LRU cache of risk estimates with an optional time to live.
+
+    `max_entries` bounds the number of individuals kept; the least recently
+    used is evicted first. Entries older than `ttl` seconds are treated as
+    misses and dropped.
+    """
+
+    def __init__(self, max_entries=10000, ttl=None):
+        if max_entries < 1:
+            raise ValueError('max_entries must be at least 1')
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get_many(self, keys):
+        """Return the cached risk estimates for `keys`, None where missing or expired."""
+        now = time.monotonic()
+        found = []
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is not None and self.ttl is not None and now-entry[0] > self.ttl:
+                    del self._entries[key]
+                    self.expirations += 1
+                    entry = None
+                if entry is None:
+                    self.misses += 1
+                    found.append(None)
+                else:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    found.append(entry[1])
+        return found
+
+    def put_many(self, keys, values):
+        now = time.monotonic()
+        with self._lock:
+            for key, value in zip(keys, values):
+                self._entries[key] = (now, value)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits+self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_s': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits/lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+            }
+
+    def prometheus_text(self):
+        """Return the statistics as Prometheus gauges, e.g. ckb_stroke_cache_hits."""
+        return ''.join('# TYPE ckb_stroke_cache_{0} gauge\nckb_stroke_cache_{0} {1!r}\n'.format(name, float(value))
+                       for name, value in self.stats().items() if value is not None)
@@ -0,0 +1,209 @@
+"""Command line interface.
+
+    ckb-stroke score cohort.csv --models fsrp,cox,lr -o risks.csv
+    ckb-stroke score cohort.csv --workers 8 -o risks.csv
+    ckb-stroke score cohort.csv -o risks.csv --metrics metrics.prom
+    ckb-stroke score cohort.parquet --chunk-size 100000 -o risks.parquet
+    ckb-stroke score cohort.csv --chunk-size 10000 -o risks.html
+    ckb-stroke score cohort.csv --quarantine invalid.csv -o risks.csv
+    ckb-stroke score cohort.csv --float32 1e-4 -o risks.csv
+    ckb-stroke serve --port 8000
+    ckb-stroke export svm gbt mlp
+    ckb-stroke benchmark --batch-sizes 1,100,10000 -o benchmark.json
+
+The ckb-stroke command is installed by `pip install -e .` in the repository
+(editable, since the trained models are read from the repository root);
+without installing, run `python -m ckb_stroke ...` instead. After any other
+install, give the directory of the model files with --model-dir or the
+CKB_STROKE_MODEL_DIR environment variable; score and serve stop at start-up
+if it holds no trained models. Model backends are imported only when a
+requested model family needs them: scoring FSRP and Cox never imports
+scikit-learn, keras or rpy2, and matplotlib is imported only for figure
+output.
+"""
+
+import argparse
+import os
+import sys
+from functools import partial
+
+from .parameters import MODEL_FAMILIES, SEXES
+
+#--models accepts family names in any case, and these shorter names
+MODEL_ALIASES = dict({family.lower(): family for family in MODEL_FAMILIES},
+                     recalibrated='Recalibrated_Refitted_FSRP', recalibrated_fsrp='Recalibrated_Refitted_FSRP')
+
+OUTPUT_FORMATS = ['csv', 'json', 'jsonl', 'parquet', 'html', 'png']
+
+
+def parse_models(value):
+    """Parse a comma-separated list of model families, e.g. 'fsrp,cox,lr'."""
+    names = [name.strip().lower() for name in value.split(',') if name.strip()]
+    unknown = [name for name in names if name not in MODEL_ALIASES]
+    if unknown:
+        raise argparse.ArgumentTypeError('unknown models: {} (choose from {})'.format(
+            ', '.join(unknown), ', '.join(family.lower() for family in MODEL_FAMILIES)))
+    return list(dict.fromkeys(MODEL_ALIASES[name] for name in names))
+
+
+#Output formats implied by the output file extension, when --format is not given
+OUTPUT_EXTENSIONS = {'.json': 'json', '.jsonl': 'jsonl', '.ndjson': 'jsonl', '.parquet': 'parquet', '.pq': 'parquet',
+                     '.html': 'html', '.htm': 'html', '.png': 'png'}
+
+
+def output_format(args, output):
+    if args.format:
+        return args.format
+    extension = os.path.splitext(output)[1].lower() if isinstance(output, str) else ''
+    return OUTPUT_EXTENSIONS.get(extension, 'csv')
+
+
+def score_command(args):
+    from .registry import MODEL_DIR, ModelRegistry, check_model_dir
+    from .scoring import risk_table, score_cohort
+    from .report import REPORT_FORMATS, flat_columns, write_risks
+    from .streaming import read_cohort, score_file
+
+    check_model_dir(args.model_dir or MODEL_DIR, MODEL_FAMILIES if args.models is None else args.models)
+    source = sys.stdin if args.input == '-' else args.input
+    output = sys.stdout if args.output in (None, '-') else args.output
+    out_format = output_format(args, output)
+    if args.chunk_size and out_format not in REPORT_FORMATS:
+        raise ValueError('--chunk-size writes {} output'.format(', '.join(REPORT_FORMATS)))
+    if out_format in ('parquet', 'png') and output is sys.stdout:
+        raise ValueError('{} output needs an --output file'.format(out_format))
+
+    if args.metrics:
+        from . import metrics
+        metrics.enable()
+    registry = ModelRegistry(args.model_dir) if args.model_dir else None
+    #Model families named in --models must have their trained models; by default missing ones are NaN
+    strict = args.models is not None
+    precision = None
+    if args.float32 is not None:
+        if args.workers > 1:
+            raise ValueError('--float32 scores in one process; drop --workers')
+        from .precision import ReducedPrecision
+        precision = ReducedPrecision(args.float32)
+    if args.workers > 1:
+        from .parallel import ParallelScorer
+        scorer = ParallelScorer(args.workers, args.models, args.model_dir or MODEL_DIR,
+                                [args.sex] if args.sex else SEXES, strict)
+        score = scorer.score
+    else:
+        scorer = None
+        score = partial(score_cohort, families=args.models, registry=registry, precision=precision, strict=strict)
+    try:
+        if args.chunk_size:
+            score_file(source, output, args.sex, args.models, args.chunk_size, registry, scorer,
+                       out_format=out_format, quarantine=args.quarantine, precision=precision, strict=strict)
+            if precision is not None:
+                report_precision(precision, args.models, registry, [args.sex] if args.sex else SEXES)
+            if args.metrics:
+                write_metrics(args.metrics)
+            return
+        raw_df = read_cohort(source)
+        if args.quarantine:
+            from .validation import validate
+            report = validate(raw_df, args.sex)
+            report.quarantined(raw_df).to_csv(args.quarantine)
+            raw_df = raw_df[report.valid]
+        risk_df = score(raw_df, args.sex)
+    finally:
+        if scorer is not None:
+            scorer.close()
+    if precision is not None:
+        report_precision(precision, args.models, registry, [args.sex] if args.sex else SEXES)
+
+    if out_format in REPORT_FORMATS:
+        write_risks(risk_df, output, out_format)
+    elif out_format == 'json':
+        flat_columns(risk_df).to_json(output, orient='index')
+    else:
+        if len(risk_df) != 1:
+            raise ValueError('png output needs a single individual')
+        from .report import save_risk_table_figure
+        save_risk_table_figure(risk_table(risk_df, risk_df.index[0]), output)
+    if args.metrics:
+        write_metrics(args.metrics)
+
+
+def report_precision(precision, families, registry, sexes):
+    """Print to stderr the model families that --float32 scored in float64, with their differences."""
+    report_df = precision.report(families, registry, sexes)
+    differences = report_df.drop(columns='float32').max(axis=1)
+    #Families without a trained model have no difference and are not scored at all
+    for (sex, family), difference in differences[~report_df['float32'] & differences.notna()].items():
+        print('{} ({}): scored in float64, float32 differs by up to {:.3g} (tolerance {:g})'.format(
+            family, sex, difference, precision.tolerance), file=sys.stderr)
+
+
+def write_metrics(path):
+    """Write the scoring metrics as Prometheus text if `path` ends in .prom, else as JSON."""
+    import json
+
+    from .metrics import METRICS
+
+    with open(path, 'w') as f:
+        if path.endswith('.prom'):
+            f.write(METRICS.prometheus_text())
+        else:
+            json.dump(METRICS.snapshot(), f, indent=2)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='ckb-stroke', description='CKB stroke risk models.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    score = commands.add_parser('score', help='score a cohort of raw risk factors')
+    score.add_argument('input', help="CSV or Parquet file of raw risk factors, one individual per row ('-' for CSV "
+                                     "on stdin)")
+    score.add_argument('--sex', choices=SEXES, help="sex of every individual (default: the input's sex column)")
+    score.add_argument('--models', type=parse_models, default=None,
+                       help='comma-separated model families, e.g. fsrp,cox,lr (default: all); unlike the default, '
+                            'a named family without its trained model is an error')
+    score.add_argument('-o', '--output', help='output file (default: stdout)')
+    score.add_argument('--format', choices=OUTPUT_FORMATS,
+                       help="output format (default: from the output file extension, else csv); 'html' writes the "
+                            "notebook's risk table of every individual, and 'png' draws it for one individual")
+    score.add_argument('--chunk-size', type=int,
+                       help='stream the input in chunks of this many rows, appending csv, jsonl, parquet or html '
+                            'output')
+    score.add_argument('--workers', type=int, default=1,
+                       help='score in this many processes, sharing the compiled models (default: 1)')
+    score.add_argument('--quarantine', help='validate the input first and write invalid rows, with their errors, '
+                                            'to this CSV file instead of scoring them')
+    score.add_argument('--float32', type=float, nargs='?', const=1e-4, metavar='TOLERANCE',
+                       help='score in float32 the model families whose risks differ from float64 by at most '
+                            'TOLERANCE (default: 1e-4) on a reference sample, and the others in float64')
+    score.add_argument('--model-dir', help='directory of the trained models (default: $CKB_STROKE_MODEL_DIR, else '
+                                           'the repository root)')
+    score.add_argument('--metrics', help='write stage timings, model calls and imputation counts to this file '
+                                         '(Prometheus text if it ends in .prom, else JSON); not collected from '
+                                         '--workers processes')
+
+    #The other commands keep their own options
+    commands.add_parser('serve', help='run the HTTP scoring service', add_help=False)
+    commands.add_parser('export', help='export trained models into compiled formats', add_help=False)
+    commands.add_parser('benchmark', help='benchmark every scoring stage on synthetic cohorts', add_help=False)
+
+    args, remaining = parser.parse_known_args(argv)
+    if args.command == 'serve':
+        from .service import main as serve_main
+        return serve_main(remaining, prog='ckb-stroke serve')
+    if args.command == 'export':
+        from .export import main as export_main
+        return export_main(remaining, prog='ckb-stroke export')
+    if args.command == 'benchmark':
+        from .benchmark import main as benchmark_main
+        return benchmark_main(remaining, prog='ckb-stroke benchmark')
+    if remaining:
+        parser.error('unrecognized arguments: {}'.format(' '.join(remaining)))
+    try:
+        score_command(args)
+    except (ValueError, FileNotFoundError) as error:
+        parser.exit(2, 'ckb-stroke: error: {}\n'.format(error))
+
+
+if __name__ == '__main__':
+    main()
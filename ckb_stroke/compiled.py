@@ -0,0 +1,33 @@
+"""Saving and loading of compiled models.
+
+Every compiled model class (see ckb_stroke.export) derives from
+`CompiledModel`, which saves the arrays of its `to_arrays` to a .npz file
+stamped with FORMAT_VERSION and builds the model back with `from_arrays`.
+Bundles and shared memory blocks hold the arrays of `mapped_arrays`, which
+may add arrays computed from the saved ones, so that models built on views of
+them need not compute or copy anything.
+"""
+
+import numpy as np
+
+#Version of the compiled .npz format, checked when a compiled model is loaded
+FORMAT_VERSION = 1
+
+
+class CompiledModel:
+    """Saving and loading of a compiled model as a .npz file of its `to_arrays`."""
+
+    def save(self, path):
+        with open(path, 'wb') as f:
+            np.savez(f, format_version=FORMAT_VERSION, **self.to_arrays())
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as arrays:
+            if int(arrays['format_version']) != FORMAT_VERSION:
+                raise ValueError('Unsupported {} format version in {}'.format(cls.__name__, path))
+            return cls.from_arrays(arrays)
+
+    def mapped_arrays(self):
+        """Return the arrays to place in a bundle or shared memory block, from which `from_arrays` builds the model."""
+        return self.to_arrays()
@@ -0,0 +1,131 @@
+"""Export trained model objects into compact compiled formats.
+
+The registry loads a compiled model in preference to the original model
+object whenever one is present next to it. Run this once, in an environment
+that can unpickle the original objects (scikit-learn 0.22), after the models
+are retrained:
+
+    python -m ckb_stroke.export rsf lr svm gbt mlp
+
+Exporting the RSF models needs R with ranger and rpy2; scoring the exported
+forests does not. The forests keep the survival where the notebook reads it,
+unless exported with `--rsf-survival exact` (see ckb_stroke.rsession). The
+MLPs are read from their .h5 files with h5py, so exporting them does not need
+keras either.
+
+`--bundle` also packs every compiled model into the memory-mapped model
+bundle (see ckb_stroke.bundle); given alone, it rebuilds the bundle from the
+compiled models already exported:
+
+    python -m ckb_stroke.export --bundle
+
+The compiled model classes save and load through ckb_stroke.compiled.
+"""
+
+import argparse
+import os
+from functools import partial
+
+from .forest import SurvivalForest
+from .linear import CalibratedLinearSVM, LogisticModel
+from .mlp import DenseNetwork
+from .parameters import HORIZONS, SEXES
+from .registry import BUNDLE_FILE_NAME, MODEL_DIR, ModelRegistry, _load_pickle, _load_rds, compiled_file_name
+from .rsession import SURVIVAL_READINGS
+from .survival import SURVIVAL_YEARS
+from .trees import TreeEnsemble
+
+
+def export_rsf(registry, sex, horizon, reading='notebook'):
+    return SurvivalForest.from_ranger(_load_rds(registry.path(sex, 'RSF')), SURVIVAL_YEARS, reading)
+
+
+def export_lr(registry, sex, horizon):
+    return LogisticModel.from_sklearn(_load_pickle(registry.path(sex, 'LR', horizon)))
+
+
+def export_svm(registry, sex, horizon):
+    svm = _load_pickle(registry.path(sex, 'SVM', horizon))
+    scaler = _load_pickle(registry.path(None, 'scaler'))
+    return CalibratedLinearSVM.from_sklearn(svm, scaler)
+
+
+def export_gbt(registry, sex, horizon):
+    return TreeEnsemble.from_sklearn(_load_pickle(registry.path(sex, 'GBT', horizon)))
+
+
+def export_mlp(registry, sex, horizon):
+    scaler = _load_pickle(registry.path(None, 'scaler'))
+    return DenseNetwork.from_keras_h5(registry.path(sex, 'MLP', horizon), scaler)
+
+
+EXPORTERS = {
+    'RSF': export_rsf,
+    'LR': export_lr,
+    'SVM': export_svm,
+    'GBT': export_gbt,
+    'MLP': export_mlp,
+}
+
+
+def export_models(families=tuple(EXPORTERS), model_dir=MODEL_DIR, out_dir=None, rsf_reading='notebook'):
+    """Compile every available model of `families`, writing them to `out_dir` (default `model_dir`).
+
+    RSF survival is read as `rsf_reading` says (see
+    ckb_stroke.rsession.survival_columns). Returns the paths written.
+    """
+    registry = ModelRegistry(model_dir, use_bundle=False)
+    out_dir = out_dir or model_dir
+    written = []
+    for family in families:
+        exporter = partial(export_rsf, reading=rsf_reading) if family == 'RSF' else EXPORTERS[family]
+        for sex in SEXES:
+            for horizon in ([None] if family == 'RSF' else HORIZONS):
+                try:
+                    model = exporter(registry, sex, horizon)
+                except FileNotFoundError:
+                    continue
+                path = os.path.join(out_dir, compiled_file_name(sex, family, horizon))
+                model.save(path)
+                written.append(path)
+    return written
+
+
+def export_bundle(model_dir=MODEL_DIR, out_dir=None):
+    """Pack the compiled models in `model_dir` into a model bundle in `out_dir` (default `model_dir`).
+
+    Returns the path written.
+    """
+    from .bundle import write_bundle
+
+    path = os.path.join(out_dir or model_dir, BUNDLE_FILE_NAME)
+    write_bundle(path, ModelRegistry(model_dir, use_bundle=False))
+    return path
+
+
+def main(argv=None, prog=None):
+    parser = argparse.ArgumentParser(prog=prog, description='Export trained models into compiled formats.')
+    parser.add_argument('families', nargs='*', type=str.upper,
+                        help='model families to export ({}; default: all, or none with --bundle)'.format(
+                            ', '.join(EXPORTERS)))
+    parser.add_argument('--bundle', action='store_true',
+                        help='pack the compiled models into {}'.format(BUNDLE_FILE_NAME))
+    parser.add_argument('--model-dir', default=MODEL_DIR)
+    parser.add_argument('--out-dir', default=None)
+    parser.add_argument('--rsf-survival', choices=SURVIVAL_READINGS, default='notebook',
+                        help="read RSF survival at the unique death time after 3, 6 and 9 years, as the notebook "
+                             "does ('notebook', the default), or at exactly those years ('exact')")
+    args = parser.parse_args(argv)
+    if not args.families and not args.bundle:
+        args.families = list(EXPORTERS)
+    unknown = [family for family in args.families if family not in EXPORTERS]
+    if unknown:
+        parser.error('cannot export: {}'.format(', '.join(unknown)))
+    for path in export_models(args.families, args.model_dir, args.out_dir, args.rsf_survival):
+        print(path)
+    if args.bundle:
+        print(export_bundle(args.out_dir or args.model_dir))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""Concurrent scoring of the model families of one request.
+
+score_cohort runs the model families one after another, as the notebook's
+cells do. NumPy's BLAS, scikit-learn, TensorFlow and the embedded R session
+spend most of their time outside the GIL, so for a single individual, or a
+small batch, the families can overlap. `FanOutScorer` scores the independent
+families (the proportional hazards models together, then RSF, LR, SVM, GBT
+and MLP, for each sex in the batch) as tasks on a bounded thread pool and
+gathers them into the usual risk table, so that the latency of a request
+approaches that of its slowest model rather than the sum of all of them:
+
+    with FanOutScorer(max_workers=6) as scorer:
+        risk_df = scorer.score(raw_df, 'Male')
+
+    async with FanOutScorer() as scorer:
+        risk_df = await scorer.score_async(raw_df, 'Male')
+
+Results are the same as score_cohort's. Large batches gain little: each
+family then keeps a core busy on its own, and ParallelScorer (see
+ckb_stroke.parallel) shards rows across processes instead.
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from .scoring import score_cohort
+
+#One task for the proportional hazards models and one per ML model family
+DEFAULT_MAX_WORKERS = 6
+
+
+class FanOutScorer:
+    """Scores the model families of each request concurrently on a pool of `max_workers` threads.
+
+    `families`, `registry` and `cache` are passed to score_cohort. The pool
+    is shared by all requests, so at most `max_workers` model families run
+    at any time.
+    """
+
+    def __init__(self, max_workers=DEFAULT_MAX_WORKERS, families=None, registry=None, cache=None):
+        if max_workers < 1:
+            raise ValueError('max_workers must be at least 1')
+        self.families = families
+        self.registry = registry
+        self.cache = cache
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='ckb-stroke-fan-out')
+
+    def score(self, raw_df, sex=None):
+        """Return the risk estimates of score_cohort(raw_df, sex), scoring the model families concurrently."""
+        return score_cohort(raw_df, sex, families=self.families, registry=self.registry, cache=self.cache,
+                            executor=self._executor)
+
+    async def score_async(self, raw_df, sex=None):
+        """Coroutine returning the result of score(raw_df, sex) without blocking the event loop.
+
+        Preprocessing and gathering run in the loop's default executor, and
+        the model families on the pool.
+        """
+        return await asyncio.get_running_loop().run_in_executor(None, self.score, raw_df, sex)
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await asyncio.get_running_loop().run_in_executor(None, self.close)
@@ -0,0 +1,106 @@
+"""Canonical feature matrix of a cohort.
+
+The notebook builds `risk_factor_df` by appending a dict to an empty
+DataFrame, so every column is of object dtype, and each model then selects
+its columns by name. `FeatureMatrix` instead holds a cohort's input vectors
+as one C-contiguous float matrix with the columns of ML_COLUMN_NAMES: the
+risk factors in FEATURE_COLUMNS order (the notebook's `column_names` without
+region) followed by the region indicators of the ML models. Region is also
+kept as integer codes into REGIONS.
+
+Each model selects its columns with an integer index array built once when
+it is set up (see `column_index`), so selection is a single `take`. The ML
+models read the whole matrix, which is already in their column order, and
+slicing rows of one sex returns views, so scoring makes no per-call copies of
+the input.
+"""
+
+import numpy as np
+import pandas as pd
+
+from .parameters import FEATURE_COLUMNS, ML_COLUMN_NAMES, REGION_DUMMY_COLUMNS, REGIONS
+
+N_FEATURES = len(FEATURE_COLUMNS)
+
+_FEATURE_POSITIONS = {column: k for k, column in enumerate(FEATURE_COLUMNS)}
+
+#Column of each region's indicator in the ML matrix, by region code
+_REGION_DUMMY_POSITIONS = N_FEATURES+np.array([REGION_DUMMY_COLUMNS.index('region_'+region) for region in REGIONS])
+
+
+def column_index(columns):
+    """Return the positions of `columns` in FEATURE_COLUMNS as an integer array."""
+    return np.array([_FEATURE_POSITIONS[column] for column in columns], dtype=np.intp)
+
+
+def region_codes(regions):
+    """Return the index of each region in REGIONS as an integer array."""
+    codes = pd.Categorical(regions, categories=REGIONS).codes
+    if (codes < 0).any():
+        raise ValueError('Unknown regions: {}'.format(', '.join(map(str, sorted(set(regions) - set(REGIONS))))))
+    return codes
+
+
+class FeatureMatrix:
+    """Input vectors of a cohort: `data` of shape (N, len(ML_COLUMN_NAMES)) and `region_codes` of shape (N,).
+
+    `x` is the view of `data` holding the FEATURE_COLUMNS.
+    """
+
+    def __init__(self, data, region_codes):
+        self.data = data
+        self.region_codes = region_codes
+
+    @classmethod
+    def empty(cls, region_codes, dtype=np.float64):
+        """Return a matrix for rows of the given regions, with the region indicators set and the features unset."""
+        n_rows = len(region_codes)
+        data = np.empty((n_rows, len(ML_COLUMN_NAMES)), dtype=dtype)
+        data[:, N_FEATURES:] = 0
+        data[np.arange(n_rows), _REGION_DUMMY_POSITIONS[region_codes]] = 1
+        return cls(data, region_codes)
+
+    @classmethod
+    def from_frame(cls, risk_factor_df, dtype=np.float64):
+        """Build the matrix from a DataFrame with region and the FEATURE_COLUMNS."""
+        features = cls.empty(region_codes(risk_factor_df['region']), dtype)
+        features.x[...] = risk_factor_df[FEATURE_COLUMNS].to_numpy(dtype=dtype)
+        return features
+
+    @property
+    def x(self):
+        return self.data[:, :N_FEATURES]
+
+    @property
+    def dtype(self):
+        return self.data.dtype
+
+    def __len__(self):
+        return len(self.data)
+
+    def take(self, index):
+        """Return the feature columns at `index` (see column_index) as a new (N, len(index)) matrix."""
+        return self.data.take(index, axis=1)
+
+    def ml_input(self):
+        """Return the input of the ML models, with the columns of ML_COLUMN_NAMES, without copying."""
+        return self.data
+
+    def rows(self, rows):
+        """Return the rows selected by `rows`, views of this matrix if `rows` is a slice."""
+        return FeatureMatrix(self.data[rows], self.region_codes[rows])
+
+    def astype(self, dtype):
+        """Return the matrix with `dtype` entries, or this matrix if it already has them."""
+        if self.data.dtype == dtype:
+            return self
+        return FeatureMatrix(self.data.astype(dtype), self.region_codes)
+
+    def copy(self):
+        return FeatureMatrix(self.data.copy(), self.region_codes.copy())
+
+    def to_frame(self, index=None):
+        """Return the input vectors as a DataFrame with the notebook's `column_names`."""
+        risk_factor_df = pd.DataFrame(self.x, index=index, columns=FEATURE_COLUMNS)
+        risk_factor_df.insert(0, 'region', np.array(REGIONS, dtype=object)[self.region_codes])
+        return risk_factor_df
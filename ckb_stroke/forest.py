@@ -0,0 +1,117 @@
+"""Compiled random survival forests.
+
+`{Sex}_RSF_Model.rds` is a ranger survival forest, which the notebook scores
+by starting R through rpy2. `SurvivalForest` holds the same trees as
+contiguous arrays (split feature, threshold, left and right child) with the
+cumulative hazard of every terminal node at 3, 6 and 9 years, and walks all
+trees for a block of rows at once, one vectorized step per tree level. As in
+ranger, the forest's cumulative hazard is the mean over trees and survival is
+exp(-cumulative hazard). As in ckb_stroke.rsession, the hazard is kept at
+the unique death time after each of 3, 6 and 9 years, where the notebook
+reads it, unless the forest is compiled with reading='exact'; `times` holds
+the death times kept.
+
+Terminal nodes point to themselves, so rows that reach a leaf early simply
+stay there until the deepest row has reached its leaf.
+"""
+
+import numpy as np
+
+from .compiled import CompiledModel
+from .parameters import ML_COLUMN_NAMES, REGION_DUMMY_COLUMNS
+from .rsession import survival_columns
+
+#Rows traversed at once, bounding the (rows x trees) index arrays
+BLOCK_SIZE = 256
+
+
+class SurvivalForest(CompiledModel):
+
+    def __init__(self, feature, threshold, left, right, chf, roots, times):
+        self.feature = np.asarray(feature, dtype=np.int32)
+        self.threshold = np.asarray(threshold, dtype=np.float64)
+        self.left = np.asarray(left, dtype=np.int32)
+        self.right = np.asarray(right, dtype=np.int32)
+        self.chf = np.asarray(chf, dtype=np.float64)
+        self.roots = np.asarray(roots, dtype=np.int32)
+        self.times = np.asarray(times, dtype=np.float64)
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    def leaves(self, x):
+        """Return the terminal node reached in every tree by each row of `x`, shape (N, n_trees)."""
+        nodes = np.broadcast_to(self.roots, (len(x), self.n_trees))
+        while True:
+            #ranger sends a row left when its value is at most the split value
+            go_left = np.take_along_axis(x, self.feature[nodes], axis=1) <= self.threshold[nodes]
+            next_nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+            if np.array_equal(next_nodes, nodes):
+                return nodes
+            nodes = next_nodes
+
+    def cumulative_hazard(self, x):
+        """Return the forest's cumulative hazard at `times` for risk factors in ML_COLUMN_NAMES order."""
+        x = np.asarray(x, dtype=np.float64)
+        chf = np.empty((len(x), len(self.times)))
+        for start in range(0, len(x), BLOCK_SIZE):
+            chf[start:start+BLOCK_SIZE] = self.chf[self.leaves(x[start:start+BLOCK_SIZE])].mean(axis=1)
+        return chf
+
+    def cumulative_risk(self, x):
+        """Return 1 - survival at `times`, shape (N, len(times))."""
+        return -np.expm1(-self.cumulative_hazard(x))
+
+    def to_arrays(self):
+        return {'feature': self.feature, 'threshold': self.threshold, 'left': self.left, 'right': self.right,
+                'chf': self.chf, 'roots': self.roots, 'times': self.times}
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        return cls(arrays['feature'], arrays['threshold'], arrays['left'], arrays['right'], arrays['chf'],
+                   arrays['roots'], arrays['times'])
+
+    @classmethod
+    def from_ranger(cls, ranger_model, years, reading='notebook'):
+        """Compile a ranger survival forest (as returned by readRDS through rpy2), keeping only the cumulative hazard
+        at `years`, read as ckb_stroke.rsession.survival_columns does.
+
+        Split variable IDs index `independent.variable.names` from zero, as in
+        ranger 0.11 and later; the region indicators are named after the region
+        only, as in the training data.
+        """
+        forest = ranger_model.rx2('forest')
+        death_times = np.asarray(forest.rx2('unique.death.times'), dtype=np.float64)
+        time_columns = survival_columns(death_times, years, reading)
+
+        column_index = {column[len('region_'):] if column in REGION_DUMMY_COLUMNS else column: i
+                        for i, column in enumerate(ML_COLUMN_NAMES)}
+        variable_names = list(forest.rx2('independent.variable.names'))
+        unknown = [name for name in variable_names if name not in column_index]
+        if unknown:
+            raise ValueError('Unknown RSF variables: {}'.format(', '.join(unknown)))
+        variable_columns = np.array([column_index[name] for name in variable_names])
+
+        feature, threshold, left, right, chf, roots = [], [], [], [], [], []
+        n_nodes = 0
+        for child_node_ids, split_var_ids, split_values, tree_chf in zip(
+                forest.rx2('child.nodeIDs'), forest.rx2('split.varIDs'), forest.rx2('split.values'),
+                forest.rx2('chf')):
+            tree_left, tree_right = np.asarray(child_node_ids[0]), np.asarray(child_node_ids[1])
+            node_ids = np.arange(n_nodes, n_nodes+len(tree_left))
+            #The root is never a child, so 0 marks a terminal node
+            terminal = (tree_left == 0) & (tree_right == 0)
+            feature.append(np.where(terminal, 0, variable_columns[np.asarray(split_var_ids)]))
+            threshold.append(np.where(terminal, np.inf, np.asarray(split_values)))
+            left.append(np.where(terminal, node_ids, tree_left+n_nodes))
+            right.append(np.where(terminal, node_ids, tree_right+n_nodes))
+            node_chf = np.zeros((len(tree_left), len(time_columns)))
+            for node in np.flatnonzero(terminal):
+                node_chf[node] = np.asarray(tree_chf[node])[time_columns]
+            chf.append(node_chf)
+            roots.append(n_nodes)
+            n_nodes += len(tree_left)
+
+        return cls(np.concatenate(feature), np.concatenate(threshold), np.concatenate(left), np.concatenate(right),
+                   np.vstack(chf), roots, death_times[time_columns])
@@ -0,0 +1,147 @@
+"""Compiled linear models.
+
+Each `*_SVM_Model_*YrRisk.pkl` is a CalibratedClassifierCV holding, for every
+calibration fold, a LinearSVC (inside a GridSearchCV) and an isotonic
+calibrator, and is applied to risk factors scaled by `data_scaler.pkl`.
+`CalibratedLinearSVM` keeps only what inference needs: per fold, the primal
+weights and intercept with the MinMaxScaler folded in, and the isotonic
+calibration curve. Scoring is then one matrix product and a linear
+interpolation per fold, averaged over folds exactly as predict_proba does.
+
+Each `*_LR_Model_*YrRisk.pkl` is a binary LogisticRegressionCV on unscaled
+risk factors, and `LogisticModel` keeps its coefficients and intercept.
+
+Both compute in the dtype of their input, so float32 risk factors are scored
+with float32 weights.
+"""
+
+import numpy as np
+
+from .compiled import CompiledModel
+
+
+class LogisticModel(CompiledModel):
+
+    def __init__(self, coef, intercept):
+        self.coef = np.asarray(coef, dtype=np.float64)
+        self.intercept = float(intercept)
+
+    def predict_proba(self, x):
+        """Return the stroke risk for unscaled risk factors, shape (N,)."""
+        return 1/(1+np.exp(-(x.dot(self.coef.astype(x.dtype, copy=False))+x.dtype.type(self.intercept))))
+
+    def to_arrays(self):
+        return {'coef': self.coef, 'intercept': np.array(self.intercept)}
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        return cls(arrays['coef'], arrays['intercept'])
+
+    @classmethod
+    def from_sklearn(cls, logistic_regression):
+        """Compile a fitted binary LogisticRegression or LogisticRegressionCV."""
+        return cls(logistic_regression.coef_.ravel(), logistic_regression.intercept_[0])
+
+
+def linear_predictor(x, coeffs, changed=None):
+    """Return x.dot(coeffs).
+
+    `changed` lists the columns of `x` in which its rows may differ from the
+    first (e.g. perturbations of one individual, see ckb_stroke.whatif): the
+    first row's product is computed in full and each other row only adds its
+    change over those columns.
+    """
+    if changed is None:
+        return x.dot(coeffs)
+    return x[:1].dot(coeffs)+(x[:, changed]-x[:1, changed]).dot(coeffs[changed])
+
+
+def stacked_logistic_risk(models, x, changed=None):
+    """Score several compiled logistic regressions (e.g. the four horizons of one sex) with one matrix product.
+
+    `changed` is as in linear_predictor.
+    """
+    coef = np.column_stack([model.coef for model in models]).astype(x.dtype, copy=False)
+    intercepts = np.array([model.intercept for model in models], dtype=x.dtype)
+    return 1/(1+np.exp(-(linear_predictor(x, coef, changed)+intercepts)))
+
+
+class CalibratedLinearSVM(CompiledModel):
+
+    def __init__(self, weights, intercepts, calibration_x, calibration_y):
+        self.weights = np.asarray(weights, dtype=np.float64)
+        self.intercepts = np.asarray(intercepts, dtype=np.float64)
+        self.calibration_x = [np.asarray(x, dtype=np.float64) for x in calibration_x]
+        self.calibration_y = [np.asarray(y, dtype=np.float64) for y in calibration_y]
+
+    @property
+    def n_folds(self):
+        return len(self.intercepts)
+
+    def decision_function(self, x):
+        """Return the SVM decision value of each fold for unscaled risk factors, shape (N, n_folds)."""
+        return x.dot(self.weights.T.astype(x.dtype, copy=False))+self.intercepts.astype(x.dtype, copy=False)
+
+    def calibrate(self, decision_values):
+        """Map decision values (N, n_folds) to stroke risk, averaging the folds' isotonic calibrations."""
+        #np.interp clamps to the end points, matching IsotonicRegression(out_of_bounds='clip')
+        return np.mean([np.interp(decision_values[:, k], self.calibration_x[k], self.calibration_y[k])
+                        for k in range(self.n_folds)], axis=0)
+
+    def predict_proba(self, x):
+        """Return the calibrated stroke risk for unscaled risk factors, shape (N,)."""
+        return self.calibrate(self.decision_function(x))
+
+    def to_arrays(self):
+        return {'weights': self.weights, 'intercepts': self.intercepts,
+                'calibration_x': np.concatenate(self.calibration_x),
+                'calibration_y': np.concatenate(self.calibration_y),
+                'calibration_offsets': np.cumsum([0]+[len(x) for x in self.calibration_x])}
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        offsets = arrays['calibration_offsets']
+        bounds = list(zip(offsets[:-1], offsets[1:]))
+        return cls(arrays['weights'], arrays['intercepts'],
+                   [arrays['calibration_x'][start:end] for start, end in bounds],
+                   [arrays['calibration_y'][start:end] for start, end in bounds])
+
+    @classmethod
+    def from_sklearn(cls, calibrated_classifier, scaler):
+        """Compile a fitted CalibratedClassifierCV of LinearSVCs trained on MinMaxScaler-scaled data.
+
+        Folding the scaler into the weights: w.(x*scale + min) + b = (w*scale).x + (w.min + b).
+        """
+        weights, intercepts, calibration_x, calibration_y = [], [], [], []
+        for fold in calibrated_classifier.calibrated_classifiers_:
+            svm = getattr(fold, 'estimator', None) or fold.base_estimator
+            svm = getattr(svm, 'best_estimator_', svm)
+            calibrators = getattr(fold, 'calibrators', None) or fold.calibrators_
+            w = svm.coef_.ravel()
+            weights.append(w*scaler.scale_)
+            intercepts.append(svm.intercept_[0]+w.dot(scaler.min_))
+            #Isotonic regression predicts by linear interpolation between its thresholds
+            calibrator = calibrators[0]
+            if hasattr(calibrator, 'X_thresholds_'):
+                calibration_x.append(calibrator.X_thresholds_)
+                calibration_y.append(calibrator.y_thresholds_)
+            else:
+                calibration_x.append(calibrator._necessary_X_)
+                calibration_y.append(calibrator._necessary_y_)
+        return cls(np.array(weights), np.array(intercepts), calibration_x, calibration_y)
+
+
+def stacked_svm_risk(svms, x):
+    """Score several compiled SVMs (e.g. the four horizons of one sex) with a single matrix product.
+
+    Returns shape (N, len(svms)).
+    """
+    weights = np.vstack([svm.weights for svm in svms]).astype(x.dtype, copy=False)
+    intercepts = np.concatenate([svm.intercepts for svm in svms]).astype(x.dtype, copy=False)
+    decision_values = x.dot(weights.T)+intercepts
+    risks = np.empty((len(x), len(svms)))
+    start = 0
+    for i, svm in enumerate(svms):
+        risks[:, i] = svm.calibrate(decision_values[:, start:start+svm.n_folds])
+        start += svm.n_folds
+    return risks
@@ -0,0 +1,219 @@
+"""Instrumentation of the scoring hot path.
+
+When enabled, scoring records into the process-wide `METRICS`:
+
+    stage timers     calls and seconds spent in each stage, following the
+                     notebook's cells: validation, derivation (with region
+                     encoding), imputation, proportional_hazards (FSRP, Recalibrated and Refitted FSRP
+                     and Cox, which are evaluated together), one stage per ML
+                     model family, risk_table, table_rendering and
+                     report_writing
+    model calls      calls and rows scored per (model family, sex)
+    missing models   scoring calls per (model family, sex) left NaN because
+                     the trained model is not available
+    model loads      loads and seconds per (model family, source), where the
+                     source is the bundle, a compiled .npz file or the original
+                     pickle/h5/rds artifact
+    imputed values   values imputed per input column
+    batch sizes      a histogram of the rows per score_cohort call
+
+Instrumentation is off by default; each instrumented call then costs one
+attribute check. Enable it with `enable()` or by setting CKB_STROKE_METRICS=1.
+Metrics are per process, and worker processes of a ParallelScorer keep their
+own.
+
+    from ckb_stroke import metrics
+    metrics.enable()
+    ...
+    print(metrics.METRICS.prometheus_text())
+"""
+
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import nullcontext
+
+import numpy as np
+
+#Upper bounds of the batch size histogram buckets
+BATCH_SIZE_BUCKETS = [1, 10, 100, 1000, 10**4, 10**5, 10**6]
+
+_NULL_TIMER = nullcontext()
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(**labels):
+    return '{' + ','.join('{}="{}"'.format(name, _escape(value)) for name, value in labels.items()) + '}'
+
+
+class Metrics:
+    """Thread-safe counters and timers of one process."""
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.stage_calls = defaultdict(int)
+            self.stage_seconds = defaultdict(float)
+            self.model_calls = defaultdict(int)
+            self.model_rows = defaultdict(int)
+            self.missing_models = defaultdict(int)
+            self.load_calls = defaultdict(int)
+            self.load_seconds = defaultdict(float)
+            self.imputed_values = defaultdict(int)
+            self.batch_size_buckets = [0]*len(BATCH_SIZE_BUCKETS)
+            self.batches = 0
+            self.batch_rows = 0
+
+    def timer(self, stage):
+        """Return a context manager adding the time spent in it to `stage`."""
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, stage)
+
+    def record_stage(self, stage, seconds):
+        with self._lock:
+            self.stage_calls[stage] += 1
+            self.stage_seconds[stage] += seconds
+
+    def record_batch(self, n_rows):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.batches += 1
+            self.batch_rows += n_rows
+            for i, bound in enumerate(BATCH_SIZE_BUCKETS):
+                if n_rows <= bound:
+                    self.batch_size_buckets[i] += 1
+
+    def record_model_call(self, family, sex, n_rows):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.model_calls[(family, sex)] += 1
+            self.model_rows[(family, sex)] += n_rows
+
+    def record_missing_model(self, family, sex):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.missing_models[(family, sex)] += 1
+
+    def record_load(self, family, source, seconds):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.load_calls[(family, source)] += 1
+            self.load_seconds[(family, source)] += seconds
+
+    def record_imputation(self, counts):
+        """Add a Series of values imputed per column (see preprocessing.impute_missing_values)."""
+        if not self.enabled:
+            return
+        values = counts.to_numpy()
+        nonzero = np.flatnonzero(values)
+        if not len(nonzero):
+            return
+        with self._lock:
+            for i in nonzero:
+                self.imputed_values[counts.index[i]] += int(values[i])
+
+    def snapshot(self):
+        """Return every metric as a JSON-serializable dict."""
+        with self._lock:
+            return {
+                'stages': {stage: {'calls': self.stage_calls[stage], 'seconds': self.stage_seconds[stage]}
+                           for stage in self.stage_calls},
+                'model_calls': [{'model': family, 'sex': sex, 'calls': calls, 'rows': self.model_rows[(family, sex)]}
+                                for (family, sex), calls in self.model_calls.items()],
+                'missing_models': [{'model': family, 'sex': sex, 'calls': calls}
+                                   for (family, sex), calls in self.missing_models.items()],
+                'model_loads': [{'model': family, 'source': source, 'loads': loads,
+                                 'seconds': self.load_seconds[(family, source)]}
+                                for (family, source), loads in self.load_calls.items()],
+                'imputed_values': dict(self.imputed_values),
+                'batches': {'count': self.batches, 'rows': self.batch_rows,
+                            'buckets': dict(zip(map(str, BATCH_SIZE_BUCKETS), self.batch_size_buckets))},
+            }
+
+    def prometheus_text(self):
+        """Return every metric in the Prometheus text exposition format."""
+        snapshot = self.snapshot()
+        lines = ['# HELP ckb_stroke_stage_seconds Time spent in each scoring stage.',
+                 '# TYPE ckb_stroke_stage_seconds summary']
+        for stage, values in snapshot['stages'].items():
+            lines.append('ckb_stroke_stage_seconds_count{} {}'.format(_labels(stage=stage), values['calls']))
+            lines.append('ckb_stroke_stage_seconds_sum{} {!r}'.format(_labels(stage=stage), values['seconds']))
+
+        lines += ['# HELP ckb_stroke_model_calls_total Scoring calls per model family and sex.',
+                  '# TYPE ckb_stroke_model_calls_total counter']
+        lines += ['ckb_stroke_model_calls_total{} {}'.format(_labels(model=call['model'], sex=call['sex']),
+                                                            call['calls'])
+                  for call in snapshot['model_calls']]
+        lines += ['# HELP ckb_stroke_model_rows_total Rows scored per model family and sex.',
+                  '# TYPE ckb_stroke_model_rows_total counter']
+        lines += ['ckb_stroke_model_rows_total{} {}'.format(_labels(model=call['model'], sex=call['sex']),
+                                                           call['rows'])
+                  for call in snapshot['model_calls']]
+
+        lines += ['# HELP ckb_stroke_missing_models_total Scoring calls left NaN for want of a trained model, per '
+                  'model family and sex.',
+                  '# TYPE ckb_stroke_missing_models_total counter']
+        lines += ['ckb_stroke_missing_models_total{} {}'.format(_labels(model=missing['model'], sex=missing['sex']),
+                                                               missing['calls'])
+                  for missing in snapshot['missing_models']]
+
+        lines += ['# HELP ckb_stroke_model_load_seconds Time spent loading models, by family and source.',
+                  '# TYPE ckb_stroke_model_load_seconds summary']
+        for load in snapshot['model_loads']:
+            labels = _labels(model=load['model'], source=load['source'])
+            lines.append('ckb_stroke_model_load_seconds_count{} {}'.format(labels, load['loads']))
+            lines.append('ckb_stroke_model_load_seconds_sum{} {!r}'.format(labels, load['seconds']))
+
+        lines += ['# HELP ckb_stroke_imputed_values_total Missing values imputed with CKB means, by column.',
+                  '# TYPE ckb_stroke_imputed_values_total counter']
+        lines += ['ckb_stroke_imputed_values_total{} {}'.format(_labels(column=column), count)
+                  for column, count in snapshot['imputed_values'].items()]
+
+        batches = snapshot['batches']
+        lines += ['# HELP ckb_stroke_batch_size Rows per scored batch.',
+                  '# TYPE ckb_stroke_batch_size histogram']
+        lines += ['ckb_stroke_batch_size_bucket{} {}'.format(_labels(le=bound), count)
+                  for bound, count in batches['buckets'].items()]
+        lines.append('ckb_stroke_batch_size_bucket{} {}'.format(_labels(le='+Inf'), batches['count']))
+        lines.append('ckb_stroke_batch_size_count {}'.format(batches['count']))
+        lines.append('ckb_stroke_batch_size_sum {}'.format(batches['rows']))
+        return '\n'.join(lines) + '\n'
+
+
+class _Timer:
+
+    __slots__ = ('metrics', 'stage', 'start')
+
+    def __init__(self, metrics, stage):
+        self.metrics = metrics
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        self.metrics.record_stage(self.stage, time.perf_counter()-self.start)
+
+
+METRICS = Metrics(enabled=os.environ.get('CKB_STROKE_METRICS', '') not in ('', '0'))
+
+
+def enable():
+    METRICS.enabled = True
+
+
+def disable():
+    METRICS.enabled = False
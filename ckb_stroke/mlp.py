@@ -0,0 +1,113 @@
+"""Pure-NumPy forward pass for the MLP models.
+
+The `*_MLP_Model_*.h5` files are small Keras Sequential models of Dense
+layers applied to risk factors scaled by `data_scaler.pkl`. `DenseNetwork`
+holds their weights with the scaler folded into the first layer, so it takes
+unscaled risk factors and never needs keras or TensorFlow. `stack_networks`
+combines the four horizon networks of one sex into a single block-diagonal
+network, evaluated with one matrix product per layer. The forward pass runs
+in the dtype of its input, e.g. float32.
+"""
+
+import json
+
+import numpy as np
+
+from .compiled import CompiledModel
+
+ACTIVATIONS = {
+    'linear': lambda z: z,
+    'relu': lambda z: np.maximum(z, 0),
+    'tanh': np.tanh,
+    'sigmoid': lambda z: 1/(1+np.exp(-z)),
+}
+
+
+class DenseNetwork(CompiledModel):
+
+    def __init__(self, kernels, biases, activations):
+        unsupported = [activation for activation in activations if activation not in ACTIVATIONS]
+        if unsupported:
+            raise ValueError('Unsupported activations: {}'.format(', '.join(unsupported)))
+        self.kernels = [np.asarray(kernel, dtype=np.float64) for kernel in kernels]
+        self.biases = [np.asarray(bias, dtype=np.float64) for bias in biases]
+        self.activations = list(activations)
+
+    @property
+    def n_outputs(self):
+        return self.kernels[-1].shape[1]
+
+    def predict(self, x):
+        """Return the network output for unscaled risk factors, shape (N, n_outputs)."""
+        dtype = x.dtype
+        for kernel, bias, activation in zip(self.kernels, self.biases, self.activations):
+            x = ACTIVATIONS[activation](x.dot(kernel.astype(dtype, copy=False))+bias.astype(dtype, copy=False))
+        return x
+
+    def to_arrays(self):
+        arrays = {'activations': np.array(self.activations)}
+        for i, (kernel, bias) in enumerate(zip(self.kernels, self.biases)):
+            arrays['kernel_{}'.format(i)] = kernel
+            arrays['bias_{}'.format(i)] = bias
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        activations = [str(activation) for activation in arrays['activations']]
+        return cls([arrays['kernel_{}'.format(i)] for i in range(len(activations))],
+                   [arrays['bias_{}'.format(i)] for i in range(len(activations))],
+                   activations)
+
+    @classmethod
+    def from_keras_h5(cls, path, scaler):
+        """Read a Sequential model of Dense layers from a Keras .h5 file with h5py, folding in `scaler`.
+
+        Folding the MinMaxScaler into the first layer:
+        (x*scale + min).W + b = x.(scale[:, None]*W) + (min.W + b).
+        """
+        import h5py
+
+        kernels, biases, activations = [], [], []
+        with h5py.File(path, 'r') as f:
+            model_config = f.attrs['model_config']
+            model_config = json.loads(model_config.decode('utf-8') if isinstance(model_config, bytes) else model_config)
+            weights = f['model_weights']
+            for layer in model_config['config']['layers']:
+                if layer['class_name'] != 'Dense':
+                    raise ValueError('Unsupported layer {} in {}'.format(layer['class_name'], path))
+                group = weights[layer['config']['name']]
+                kernel_name, bias_name = [name.decode('utf-8') if isinstance(name, bytes) else name
+                                          for name in group.attrs['weight_names']]
+                kernels.append(group[kernel_name][()].astype(np.float64))
+                biases.append(group[bias_name][()].astype(np.float64))
+                activations.append(layer['config']['activation'])
+
+        biases[0] = scaler.min_.dot(kernels[0])+biases[0]
+        kernels[0] = scaler.scale_[:, np.newaxis]*kernels[0]
+        return cls(kernels, biases, activations)
+
+
+def _block_diagonal(blocks):
+    matrix = np.zeros((sum(block.shape[0] for block in blocks), sum(block.shape[1] for block in blocks)))
+    row = column = 0
+    for block in blocks:
+        matrix[row:row+block.shape[0], column:column+block.shape[1]] = block
+        row += block.shape[0]
+        column += block.shape[1]
+    return matrix
+
+
+def stack_networks(networks):
+    """Combine networks sharing an input and layer activations into one network with all their outputs.
+
+    The first layers are concatenated side by side and later layers placed
+    block-diagonally, so the outputs are identical to evaluating each network
+    separately. Returns None if the networks' depths or activations differ.
+    """
+    if len({tuple(network.activations) for network in networks}) != 1:
+        return None
+    kernels = [np.hstack([network.kernels[0] for network in networks])]
+    for i in range(1, len(networks[0].kernels)):
+        kernels.append(_block_diagonal([network.kernels[i] for network in networks]))
+    biases = [np.concatenate([network.biases[i] for network in networks]) for i in range(len(kernels))]
+    return DenseNetwork(kernels, biases, networks[0].activations)
@@ -0,0 +1,153 @@
+"""Batch risk estimates for each model family.
+
+Each function takes the imputed input vectors (a FeatureMatrix, see
+ckb_stroke.features) for a cohort of one sex and returns an (N, 4) array of stroke risk estimates, one column per horizon in
+HORIZONS order: 9-year risk followed by risk during years 0-3, 3-6 and 6-9.
+"""
+
+import weakref
+
+import numpy as np
+
+from .forest import SurvivalForest
+from .linear import CalibratedLinearSVM, LogisticModel, stacked_logistic_risk, stacked_svm_risk
+from .mlp import DenseNetwork, stack_networks
+from .parameters import HORIZONS
+from .registry import get_registry
+from .survival import SURVIVAL_YEARS, interval_risks, proportional_hazards_risk
+from .trees import TreeEnsemble, stack_ensembles
+
+
+##########################################################################################################
+#PROPORTIONAL HAZARDS MODELS
+
+def fsrp_risk(features, sex, registry=None):
+    """FSRP (without atrial fibrillation), as presented in Dufouil et al., 2017."""
+    return proportional_hazards_risk(features, sex, ['FSRP'], registry)[:, 0]
+
+
+def recalibrated_fsrp_risk(features, sex, registry=None):
+    """Recalibrated and Refitted FSRP (without atrial fibrillation) trained using CKB data."""
+    return proportional_hazards_risk(features, sex, ['Recalibrated_Refitted_FSRP'], registry)[:, 0]
+
+
+def cox_risk(features, sex, registry=None):
+    """CKB Cox model with additional risk factors recorded in CKB."""
+    return proportional_hazards_risk(features, sex, ['Cox'], registry)[:, 0]
+
+
+##########################################################################################################
+#RANDOM SURVIVAL FOREST
+
+def rsf_risk(features, sex, registry=None, reading='notebook'):
+    """Random survival forest implemented with the ranger() package in R, called through rpy2.
+
+    The whole cohort goes to the persistent R session in one predict call (see
+    ckb_stroke.rsession), which reads the survival at 3, 6 and 9 years as
+    `reading` says: by default where the notebook reads it, one unique death
+    time later. A compiled forest (see ckb_stroke.export) is evaluated with
+    NumPy instead, without starting R, and keeps the reading it was compiled
+    with.
+    """
+    registry = registry or get_registry()
+    rsf_model = registry.get(sex, 'RSF')
+    if isinstance(rsf_model, SurvivalForest):
+        return interval_risks(rsf_model.cumulative_risk(features.ml_input()))
+
+    from .rsession import ranger_survival
+    return interval_risks(1-ranger_survival(rsf_model, features.ml_input(), SURVIVAL_YEARS, reading))
+
+
+##########################################################################################################
+#MACHINE LEARNING MODELS
+
+def _horizon_models(registry, sex, family):
+    #Fetch all four models first so that a missing one fails before any scoring
+    return [registry.get(sex, family, horizon) for horizon in HORIZONS]
+
+
+#Stacked compiled models, keyed by the first of the horizon models they were built from
+_STACKED_MODELS = weakref.WeakKeyDictionary()
+
+
+def _stacked(registry, sex, family, horizon_models, stack):
+    """Return the stack of `horizon_models`.
+
+    A stack held by `registry` (in the bundle or shared memory) is used as it
+    is; otherwise stack(horizon_models) is built and reused while the same
+    model objects are loaded.
+    """
+    stacked = registry.stacked(sex, family)
+    if stacked is not None:
+        return stacked
+    cached = _STACKED_MODELS.get(horizon_models[0])
+    if cached is None or any(ref() is not model for ref, model in zip(cached[0], horizon_models)):
+        cached = ([weakref.ref(model) for model in horizon_models], stack(horizon_models))
+        _STACKED_MODELS[horizon_models[0]] = cached
+    return cached[1]
+
+
+def lr_risk(features, sex, registry=None, changed=None):
+    """Logistic regression, one model per horizon.
+
+    Compiled models (see ckb_stroke.export) are scored together with one
+    matrix product. `changed` lists the ML input columns in which rows may
+    differ from the first (see ckb_stroke.linear.linear_predictor).
+    """
+    horizon_models = _horizon_models(registry or get_registry(), sex, 'LR')
+    x = features.ml_input()
+    if all(isinstance(model, LogisticModel) for model in horizon_models):
+        return stacked_logistic_risk(horizon_models, x, changed)
+    return np.column_stack([model.predict_proba(x) if isinstance(model, LogisticModel)
+                            else model.predict_proba(x)[:, 1] for model in horizon_models])
+
+
+def svm_risk(features, sex, registry=None):
+    """Linear support vector machine on scaled risk factors, one model per horizon.
+
+    Compiled SVMs (see ckb_stroke.export) have the scaler folded into their
+    weights and are scored together with one matrix product.
+    """
+    registry = registry or get_registry()
+    horizon_models = _horizon_models(registry, sex, 'SVM')
+    x = features.ml_input()
+    if all(isinstance(model, CalibratedLinearSVM) for model in horizon_models):
+        return stacked_svm_risk(horizon_models, x)
+    scaled_x = registry.get_scaler().transform(x)
+    return np.column_stack([model.predict_proba(x) if isinstance(model, CalibratedLinearSVM)
+                            else model.predict_proba(scaled_x)[:, 1] for model in horizon_models])
+
+
+def gbt_risk(features, sex, registry=None):
+    """Gradient boosted trees, one model per horizon.
+
+    Compiled ensembles (see ckb_stroke.export) of the four horizons are
+    traversed together in one vectorized pass over the input rows.
+    """
+    registry = registry or get_registry()
+    horizon_models = _horizon_models(registry, sex, 'GBT')
+    x = features.ml_input()
+    if all(isinstance(model, TreeEnsemble) for model in horizon_models):
+        return _stacked(registry, sex, 'GBT', horizon_models, stack_ensembles).predict_proba(x)
+    return np.column_stack([model.predict_proba(x)[:, 0] if isinstance(model, TreeEnsemble)
+                            else model.predict_proba(x)[:, 1] for model in horizon_models])
+
+
+def mlp_risk(features, sex, registry=None):
+    """Multilayer perceptron on scaled risk factors, one model per horizon.
+
+    Compiled MLPs (see ckb_stroke.export) have the scaler folded into their
+    first layer and are evaluated with NumPy, the four horizons stacked into
+    one network, without importing keras.
+    """
+    registry = registry or get_registry()
+    horizon_models = _horizon_models(registry, sex, 'MLP')
+    x = features.ml_input()
+    if all(isinstance(model, DenseNetwork) for model in horizon_models):
+        stacked = _stacked(registry, sex, 'MLP', horizon_models, stack_networks)
+        if stacked is not None:
+            return stacked.predict(x)
+        return np.column_stack([model.predict(x)[:, 0] for model in horizon_models])
+    scaled_x = registry.get_scaler().transform(x)
+    return np.column_stack([model.predict(x)[:, 0] if isinstance(model, DenseNetwork)
+                            else model.predict(scaled_x)[:, 0] for model in horizon_models])
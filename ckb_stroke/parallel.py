@@ -0,0 +1,130 @@
+"""Multi-process cohort scoring.
+
+`ParallelScorer` shards a cohort by rows across a pool of worker processes
+and merges the shards' risk estimates back in input order. The compiled
+models (see ckb_stroke.export) are copied once into a single shared memory
+block, together with the arrays built from them for scoring: the packed
+traversal arrays of the tree ensembles and the stacked GBT and MLP models of
+each sex. Every worker builds its models as NumPy views of that block, so
+the weights are neither loaded nor copied per worker. A worker's only
+private copies are the LR and SVM weights stacked for each call, the float32
+leaf values of reduced precision scoring and the proportional hazards
+parameters, which are small module constants. The scaler is folded into the
+compiled SVM and MLP weights. Models without a compiled form are loaded by each
+worker from the model directory on first use. Models in the model bundle
+(see ckb_stroke.bundle) are not copied: every worker maps the bundle file
+itself, sharing its pages through the page cache.
+
+    with ParallelScorer(workers=8) as scorer:
+        risk_df = scorer.score(raw_df, 'Male')
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from .bundle import COMPILED_CLASSES, array_layout, compiled_models, layout_bytes, view_arrays, write_arrays
+from .parameters import MODEL_FAMILIES, SEXES
+from .registry import MODEL_DIR, ModelRegistry
+from .scoring import score_cohort
+
+#Shards per worker, so that a slow shard does not leave the other workers idle
+SHARDS_PER_WORKER = 4
+
+
+def share_models(registry, sexes=SEXES, families=MODEL_FAMILIES):
+    """Copy every available compiled model of `sexes` and `families` that is not in the model bundle, and the
+    stacked horizon models of the GBT and MLP families, into one shared memory block.
+
+    Returns the SharedMemory block and an index of (key, class name,
+    {array name: (offset, dtype, shape)}) entries describing its contents.
+    """
+    entries, offset = [], 0
+    bundle = registry.bundle
+    for key, model in compiled_models(registry, sexes, families, () if bundle is None else bundle):
+        arrays = model.mapped_arrays()
+        layout, offset = array_layout(arrays, offset)
+        entries.append((key, type(model).__name__, layout, arrays))
+
+    block = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+    for _, _, layout, arrays in entries:
+        write_arrays(block.buf, layout, arrays)
+    return block, [(key, class_name, layout) for key, class_name, layout, _ in entries]
+
+
+def attach_models(block, index, registry):
+    """Add the models described by `index` to `registry`, as views of the shared memory `block`."""
+    for (sex, family, horizon), class_name, layout in index:
+        registry.add(sex, family, horizon, COMPILED_CLASSES[class_name].from_arrays(view_arrays(block.buf, layout)),
+                     layout_bytes(layout))
+
+
+##########################################################################################################
+#WORKER PROCESSES
+
+_worker_block = None
+_worker_registry = None
+
+
+def _init_worker(block_name, index, model_dir):
+    global _worker_block, _worker_registry
+    #Workers share the parent's resource tracker, so the block is unlinked once, by the parent's close()
+    _worker_block = shared_memory.SharedMemory(name=block_name)
+    _worker_registry = ModelRegistry(model_dir)
+    attach_models(_worker_block, index, _worker_registry)
+
+
+def _score_shard(raw_df, sex, families, strict):
+    return score_cohort(raw_df, sex, families=families, registry=_worker_registry, strict=strict)
+
+
+class ParallelScorer:
+    """A pool of scoring processes sharing one copy of the compiled models.
+
+    `strict` is passed to score_cohort.
+    """
+
+    def __init__(self, workers=None, families=None, model_dir=MODEL_DIR, sexes=SEXES, strict=False):
+        self.workers = workers or os.cpu_count()
+        self.families = families
+        self.strict = strict
+        self.model_dir = model_dir
+        self._block, index = share_models(ModelRegistry(model_dir), sexes,
+                                          MODEL_FAMILIES if families is None else families)
+        self._executor = ProcessPoolExecutor(self.workers, initializer=_init_worker,
+                                             initargs=(self._block.name, index, model_dir))
+
+    def score(self, raw_df, sex=None):
+        """Score `raw_df` as score_cohort does, sharding its rows across the worker processes."""
+        shards = [rows for rows in np.array_split(np.arange(len(raw_df)), self.workers*SHARDS_PER_WORKER)
+                  if len(rows)]
+        if not shards:
+            return score_cohort(raw_df, sex, families=self.families, registry=ModelRegistry(self.model_dir),
+                                strict=self.strict)
+        if sex is None or isinstance(sex, str):
+            shard_sexes = repeat(sex)
+        else:
+            shard_sexes = [np.asarray(sex)[rows] for rows in shards]
+        return pd.concat(self._executor.map(_score_shard, [raw_df.iloc[rows] for rows in shards], shard_sexes,
+                                            repeat(self.families), repeat(self.strict)))
+
+    def close(self):
+        self._executor.shutdown()
+        self._block.close()
+        self._block.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def score_cohort_parallel(raw_df, sex, families=None, workers=None, model_dir=MODEL_DIR):
+    """score_cohort over `workers` processes (default: one per CPU)."""
+    with ParallelScorer(workers, families, model_dir, sexes=[sex]) as scorer:
+        return scorer.score(raw_df, sex)
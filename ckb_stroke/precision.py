@@ -0,0 +1,115 @@
+"""Reduced-precision (float32) scoring with an accuracy guardrail.
+
+For screening-scale batches the models can run in float32: the proportional
+hazards kernel, the LR and SVM matrix products, the MLP forward pass and the
+GBT leaf sums all compute in the dtype of the feature matrix (the GBT
+threshold comparisons are made in float32 in any case, as in scikit-learn).
+Risks then differ from float64 ones by rounding only, but by how much depends
+on the trained models, so `ReducedPrecision` checks before it is used: it
+scores a reference sample of each sex in float64 and in float32, records the
+maximum absolute difference in each model family's risk at each horizon, and
+allows float32 only for the families within `tolerance`. The other families,
+and RSF always, are scored in float64.
+
+    precision = ReducedPrecision(tolerance=1e-4)
+    risk_df = score_cohort(raw_df, 'Male', precision=precision)
+    precision.report()
+
+The reference sample is the benchmark's synthetic cohort (see
+ckb_stroke.benchmark) unless a table of raw risk factors is given. Each
+check runs once per registry, sex and model family.
+"""
+
+import threading
+
+import numpy as np
+import pandas as pd
+
+from .parameters import HORIZONS, MODEL_FAMILIES, SEXES
+from .preprocessing import derive_features, impute_missing_values
+from .registry import get_registry
+from .scoring import score_features
+
+#Maximum absolute difference in risk (a probability) allowed between float32 and float64
+DEFAULT_TOLERANCE = 1e-4
+REFERENCE_SIZE = 1000
+
+#Model families with float32 kernels; RSF is scored by R or the compiled forest in float64
+FLOAT32_FAMILIES = ['FSRP', 'Recalibrated_Refitted_FSRP', 'Cox', 'LR', 'SVM', 'GBT', 'MLP']
+
+
+class ReducedPrecision:
+    """Float32 scoring of the model families whose risks stay within `tolerance` of float64.
+
+    `reference_df` is a table of raw risk factors to check on, with a 'sex'
+    column if it holds both sexes; by default `reference_size` synthetic
+    individuals of each sex are drawn with `seed`.
+    """
+
+    def __init__(self, tolerance=DEFAULT_TOLERANCE, reference_df=None, reference_size=REFERENCE_SIZE, seed=0):
+        if tolerance < 0:
+            raise ValueError('tolerance must be at least 0')
+        self.tolerance = tolerance
+        self.reference_df = reference_df
+        self.reference_size = reference_size
+        self.seed = seed
+        self._differences = {}
+        self._lock = threading.Lock()
+
+    def __str__(self):
+        return 'float32 (tolerance {!r})'.format(self.tolerance)
+
+    def differences(self, sex, families, registry=None):
+        """Return the maximum absolute difference between float32 and float64 risks on the reference sample.
+
+        The result has shape (len(families), 4), one column per horizon, and
+        is NaN for families that cannot be scored (or have no float32 kernel).
+        """
+        registry = registry or get_registry()
+        families = list(families)
+        with self._lock:
+            missing = [family for family in families if (registry, sex, family) not in self._differences]
+            if missing:
+                for family, difference in zip(missing, self._measure(sex, missing, registry)):
+                    self._differences[(registry, sex, family)] = difference
+            return np.array([self._differences[(registry, sex, family)] for family in families])
+
+    def float32_families(self, sex, families, registry=None):
+        """Return the `families` allowed to be scored in float32 for `sex`."""
+        candidates = [family for family in families if family in FLOAT32_FAMILIES]
+        if not candidates:
+            return []
+        #NaN fails the comparison, so families without a result are refused
+        return [family for family, difference in zip(candidates, self.differences(sex, candidates, registry))
+                if (difference <= self.tolerance).all()]
+
+    def report(self, families=None, registry=None, sexes=SEXES):
+        """Return the differences of `families` by (sex, model) and horizon, with whether float32 is allowed."""
+        families = [family for family in (MODEL_FAMILIES if families is None else families)
+                    if family in FLOAT32_FAMILIES]
+        frames = []
+        for sex in sexes:
+            differences = self.differences(sex, families, registry)
+            report_df = pd.DataFrame(differences, columns=HORIZONS,
+                                     index=pd.MultiIndex.from_product([[sex], families], names=['sex', 'model']))
+            report_df['float32'] = (differences <= self.tolerance).all(axis=1)
+            frames.append(report_df)
+        return pd.concat(frames)
+
+    def _reference(self, sex):
+        if self.reference_df is None:
+            from .benchmark import synthetic_cohort
+            return synthetic_cohort(self.reference_size, sex, self.seed)
+        if 'sex' in self.reference_df:
+            return self.reference_df[self.reference_df['sex'] == sex]
+        return self.reference_df
+
+    def _measure(self, sex, families, registry):
+        """Score the reference sample of `sex` in float64 and float32, returning the differences of `families`."""
+        features, _ = impute_missing_values(derive_features(self._reference(sex)), sex, inplace=True)
+        partitions = [(sex, slice(0, len(features)))]
+        float64_risks = score_features(features, partitions, families, registry)
+        float32_risks = score_features(features.astype(np.float32), partitions, families, registry)
+        if not len(features):
+            return np.full((len(families), len(HORIZONS)), np.nan)
+        return np.abs(float32_risks-float64_risks).max(axis=0)
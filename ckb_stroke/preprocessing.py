@@ -0,0 +1,151 @@
+"""Backend processing of raw risk factors into model input vectors.
+
+These are the batch equivalents of the notebook's third and seventh cells:
+calculating derived risk factors, preparing the input vector, imputing missing
+data with CKB mean values and one-hot encoding region for the ML models. Every
+step works on whole columns, so a cohort of any size is processed at once,
+and the input vectors are written straight into a FeatureMatrix (see
+ckb_stroke.features).
+"""
+
+import numpy as np
+import pandas as pd
+
+from .features import FeatureMatrix, column_index, region_codes
+from .parameters import FEATURE_COLUMNS, IMPUTATION_MEANS, ML_COLUMN_NAMES, RAW_COLUMN_NAMES, REGIONS, URBAN_REGIONS
+
+MISSING = 'Missing'
+
+
+def raw_column(raw_df, column):
+    """Return a raw risk factor as a float64 array, with 'Missing' (or NaN) as NaN."""
+    values = raw_df[column]
+    if not pd.api.types.is_numeric_dtype(values):
+        values = pd.to_numeric(values.mask(values == MISSING))
+    return values.to_numpy(dtype=np.float64)
+
+
+def check_raw_columns(raw_df):
+    absent = [column for column in RAW_COLUMN_NAMES if column not in raw_df.columns]
+    if absent:
+        raise ValueError('Missing risk factor columns: {}'.format(', '.join(absent)))
+
+
+#Raw risk factors that enter the input vector unchanged, copied in runs of adjacent columns as
+#(input vector slice, raw column slice) pairs
+_DIRECT_COLUMNS = [column for column in RAW_COLUMN_NAMES if column not in ('age', 'region', 'sbp_mean')]
+
+
+def _runs(index):
+    starts = [0] + [k for k in range(1, len(index)) if index[k] != index[k-1]+1] + [len(index)]
+    return [(slice(index[start], index[end-1]+1), slice(start, end)) for start, end in zip(starts[:-1], starts[1:])]
+
+
+_DIRECT_RUNS = _runs(column_index(_DIRECT_COLUMNS))
+_FEATURE = {column: k for k, column in enumerate(FEATURE_COLUMNS)}
+_URBAN_CODES = [REGIONS.index(region) for region in URBAN_REGIONS]
+
+
+def raw_values(raw_df, columns):
+    """Return raw risk factors as a float64 matrix, one column each, with 'Missing' (or NaN) as NaN."""
+    selected_df = raw_df[columns]
+    if all(pd.api.types.is_numeric_dtype(dtype) for dtype in selected_df.dtypes):
+        return selected_df.to_numpy(dtype=np.float64)
+    return np.column_stack([raw_column(selected_df, column) for column in columns])
+
+
+def derive_features(raw_df):
+    """Return the input vector of every row of `raw_df` as a FeatureMatrix.
+
+    `raw_df` holds one row per individual with the columns of the notebook's
+    input cell. Unavailable values may be entered as 'Missing' or NaN. Missing
+    values are NaN in the result, and so are the derived risk factors that
+    depend on a missing input.
+    """
+    check_raw_columns(raw_df)
+    features = FeatureMatrix.empty(region_codes(raw_df['region']))
+    x = features.x
+    direct_values = raw_values(raw_df, _DIRECT_COLUMNS)
+    for feature_columns, raw_columns in _DIRECT_RUNS:
+        x[:, feature_columns] = direct_values[:, raw_columns]
+    age = raw_column(raw_df, 'age')
+    sbp_mean = raw_column(raw_df, 'sbp_mean')
+    has_diabetes = x[:, _FEATURE['has_diabetes']]
+    used_blood_pressure_drugs = x[:, _FEATURE['used_blood_pressure_drugs']]
+
+    #region_is_urban
+    x[:, _FEATURE['region_is_urban']] = np.isin(features.region_codes, _URBAN_CODES)
+
+    #age_at_study_date
+    x[:, _FEATURE['age_at_study_date']] = age/10
+
+    #over_65
+    age_missing = np.isnan(age)
+    over_65 = age >= 65
+    x[:, _FEATURE['over_65']] = np.where(age_missing, np.nan, over_65)
+
+    #diab_under_65 and diab_over_65
+    diab_missing = age_missing | np.isnan(has_diabetes)
+    x[:, _FEATURE['diab_under_65']] = np.where(diab_missing, np.nan, ~over_65 & (has_diabetes == 1))
+    x[:, _FEATURE['diab_over_65']] = np.where(diab_missing, np.nan, over_65 & (has_diabetes == 1))
+
+    #sbp_noHRX and sbp_HRX (NaN in either input propagates)
+    x[:, _FEATURE['sbp_noHRX']] = ((sbp_mean-120)*(1-used_blood_pressure_drugs))/10
+    x[:, _FEATURE['sbp_HRX']] = ((sbp_mean-120)*used_blood_pressure_drugs)/10
+
+    #sbp_mean
+    x[:, _FEATURE['sbp_mean']] = sbp_mean/10
+    return features
+
+
+#Input vector columns derived from each raw risk factor, besides the column of the same name
+_DERIVED_FROM = {
+    'age': ['age_at_study_date', 'over_65', 'diab_under_65', 'diab_over_65'],
+    'has_diabetes': ['diab_under_65', 'diab_over_65'],
+    'used_blood_pressure_drugs': ['sbp_noHRX', 'sbp_HRX'],
+    'sbp_mean': ['sbp_noHRX', 'sbp_HRX', 'sbp_mean'],
+    'region': ['region_is_urban'],
+}
+
+
+def dependent_columns(raw_columns):
+    """Return the sorted positions in ML_COLUMN_NAMES of the input vector columns computed from `raw_columns`.
+
+    Imputation fills each column on its own, so these are also the only
+    columns an imputed input vector can change in when `raw_columns` change.
+    """
+    columns = set()
+    for column in raw_columns:
+        columns.update(_DERIVED_FROM.get(column, []))
+        if column in _FEATURE:
+            columns.add(column)
+    positions = {_FEATURE[column] for column in columns}
+    if 'region' in raw_columns:
+        positions.update(range(len(FEATURE_COLUMNS), len(ML_COLUMN_NAMES)))
+    return np.array(sorted(positions), dtype=np.intp)
+
+
+def derive_risk_factors(raw_df):
+    """Return the input vector (in COLUMN_NAMES order) for every row of `raw_df` as a DataFrame.
+
+    The DataFrame counterpart of derive_features, e.g. for inspecting the
+    derived risk factors.
+    """
+    return derive_features(raw_df).to_frame(raw_df.index)
+
+
+def impute_missing_values(features, sex, inplace=False):
+    """Replace missing (NaN) values of a FeatureMatrix with the CKB mean value for `sex`.
+
+    `sex` is 'Male' or 'Female', or a list of (sex, rows) partitions of a
+    mixed-sex cohort, `rows` being a slice, each imputed with its own means.
+    Returns the imputed input vectors (`features` itself if `inplace`) and a
+    Series with the number of values imputed in each column.
+    """
+    if not inplace:
+        features = features.copy()
+    x = features.x
+    missing = np.isnan(x)
+    for partition_sex, rows in ([(sex, slice(None))] if isinstance(sex, str) else sex):
+        np.copyto(x[rows], IMPUTATION_MEANS[partition_sex], where=missing[rows])
+    return features, pd.Series(missing.sum(axis=0), index=FEATURE_COLUMNS, name='imputed')
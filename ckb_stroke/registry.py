@@ -0,0 +1,294 @@
+"""Process-wide registry of the trained model objects.
+
+The notebook deserializes every model it uses (and `data_scaler.pkl` twice) on
+every run. The registry loads each artifact once per process, on first use,
+keyed by (sex, family, horizon), and keeps it in memory for later calls. An
+optional memory cap evicts the least recently used models.
+
+Each model comes from the first of: the memory-mapped model bundle (see
+ckb_stroke.bundle), its compiled .npz file (see ckb_stroke.export) and the
+original model object.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from pickle import load
+
+from .metrics import METRICS
+from .parameters import HORIZON_FILE_SUFFIXES, HORIZONS, SEXES
+
+#Environment variable naming the directory of the trained model objects
+MODEL_DIR_VARIABLE = 'CKB_STROKE_MODEL_DIR'
+
+#The trained model objects are stored at the top level of the repository, which a non-editable install does not
+#include; CKB_STROKE_MODEL_DIR points elsewhere
+MODEL_DIR = os.environ.get(MODEL_DIR_VARIABLE) or os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+#Families scored by trained model objects rather than coefficients in parameters.py
+ARTIFACT_FAMILIES = ['RSF', 'LR', 'SVM', 'GBT', 'MLP']
+
+SCALER_KEY = (None, 'scaler', None)
+
+#Horizon under which a bundle or shared memory block holds the stack of a family's four horizon models
+STACKED = 'stacked'
+
+#The model bundle written by ckb_stroke.export --bundle
+BUNDLE_FILE_NAME = 'ckb_stroke_models.bundle'
+
+
+def artifact_file_name(sex, family, horizon=None):
+    """Return the file name of a trained model object, e.g. Male_SVM_Model_9YrRisk.pkl."""
+    if family == 'scaler':
+        return 'data_scaler.pkl'
+    if family == 'RSF':
+        return '{}_RSF_Model.rds'.format(sex)
+    if family == 'MLP':
+        return '{}_MLP_Model_{}.h5'.format(sex, HORIZON_FILE_SUFFIXES[horizon])
+    return '{}_{}_Model_{}.pkl'.format(sex, family, HORIZON_FILE_SUFFIXES[horizon])
+
+
+def compiled_file_name(sex, family, horizon=None):
+    """Return the file name of a compiled model written by ckb_stroke.export, e.g. Male_SVM_Model_9YrRisk.npz."""
+    return os.path.splitext(artifact_file_name(sex, family, horizon))[0]+'.npz'
+
+
+def _load_pickle(path):
+    with open(path, 'rb') as f:
+        return load(f)
+
+
+def _load_keras(path):
+    from keras.models import load_model
+    return load_model(path)
+
+
+def _load_rds(path):
+    import rpy2.robjects as robjects
+    from rpy2.robjects.packages import importr
+    importr('ranger')
+    return robjects.r['readRDS'](path)
+
+
+def _load_compiled_rsf(path):
+    from .forest import SurvivalForest
+    return SurvivalForest.load(path)
+
+
+def _load_compiled_lr(path):
+    from .linear import LogisticModel
+    return LogisticModel.load(path)
+
+
+def _load_compiled_svm(path):
+    from .linear import CalibratedLinearSVM
+    return CalibratedLinearSVM.load(path)
+
+
+def _load_compiled_mlp(path):
+    from .mlp import DenseNetwork
+    return DenseNetwork.load(path)
+
+
+def _load_compiled_gbt(path):
+    from .trees import TreeEnsemble
+    return TreeEnsemble.load(path)
+
+
+#Families with a compiled format, which is used in preference to the original model object when present
+COMPILED_LOADERS = {
+    'RSF': _load_compiled_rsf,
+    'LR': _load_compiled_lr,
+    'SVM': _load_compiled_svm,
+    'GBT': _load_compiled_gbt,
+    'MLP': _load_compiled_mlp,
+}
+
+
+class ModelRegistry:
+    """Loads trained model objects on first use and caches them.
+
+    `max_bytes` caps the memory held by cached models, estimated from the size
+    of their files. When a newly loaded model would exceed the cap, the least
+    recently used models are evicted (the data scaler is never evicted).
+    Models in the bundle are views of a shared read-only mapping and count
+    towards the cap with the size of their arrays.
+
+    `use_bundle=False` ignores the bundle, e.g. to rewrite it.
+    """
+
+    def __init__(self, model_dir=MODEL_DIR, max_bytes=None, use_bundle=True):
+        self.model_dir = model_dir
+        self.max_bytes = max_bytes
+        self.use_bundle = use_bundle
+        self._bundle = None
+        self._models = OrderedDict()
+        self._sizes = {}
+        self._lock = threading.RLock()
+        self.loads = 0
+        self.hits = 0
+        self.evictions = 0
+
+    def path(self, sex, family, horizon=None):
+        """Return the path of a trained model object, raising FileNotFoundError if it is not available."""
+        path = os.path.join(self.model_dir, artifact_file_name(sex, family, horizon))
+        if not os.path.exists(path):
+            raise FileNotFoundError(path)
+        return path
+
+    @property
+    def bundle(self):
+        """Return the model bundle of `model_dir`, mapping it on first use, or None if there is none."""
+        if self._bundle is None and self.use_bundle:
+            path = os.path.join(self.model_dir, BUNDLE_FILE_NAME)
+            if os.path.exists(path):
+                from .bundle import Bundle
+                self._bundle = Bundle(path)
+        return self._bundle
+
+    def compiled_path(self, sex, family, horizon=None):
+        """Return the path of the compiled model, or None if the family has none or it was not exported."""
+        if family not in COMPILED_LOADERS:
+            return None
+        path = os.path.join(self.model_dir, compiled_file_name(sex, family, horizon))
+        return path if os.path.exists(path) else None
+
+    def is_available(self, sex, family, horizon=None):
+        return ((self.bundle is not None and (sex, family, horizon) in self.bundle)
+                or self.compiled_path(sex, family, horizon) is not None
+                or os.path.exists(os.path.join(self.model_dir, artifact_file_name(sex, family, horizon))))
+
+    def has_models(self):
+        """Return whether `model_dir` holds any trained model of ARTIFACT_FAMILIES, in any form."""
+        return any(self.is_available(sex, family, horizon) for sex in SEXES for family in ARTIFACT_FAMILIES
+                   for horizon in ([None] if family == 'RSF' else HORIZONS))
+
+    def get(self, sex, family, horizon=None):
+        """Return the trained model for (sex, family, horizon), loading it if needed."""
+        key = (sex, family, horizon)
+        with self._lock:
+            if key in self._models:
+                self._models.move_to_end(key)
+                self.hits += 1
+                return self._models[key]
+
+            start = time.perf_counter()
+            bundle = self.bundle
+            if bundle is not None and key in bundle:
+                model, size, source = bundle.model(*key), bundle.nbytes(*key), 'bundle'
+            else:
+                model, size, source = self._load_file(sex, family, horizon)
+            METRICS.record_load(family, source, time.perf_counter()-start)
+            self.loads += 1
+
+            self._models[key] = model
+            self._sizes[key] = size
+            self._evict()
+            return model
+
+    def proportional_hazards_kernel(self, sex):
+        """Return the proportional hazards kernel of `sex`, on the parameters in the bundle if there is one."""
+        bundle = self.bundle
+        if bundle is not None:
+            return bundle.proportional_hazards_kernel(sex)
+        from .survival import PROPORTIONAL_HAZARDS_KERNELS
+        return PROPORTIONAL_HAZARDS_KERNELS[sex]
+
+    def stacked(self, sex, family):
+        """Return the stacked horizon models of (sex, family) from the bundle or added to the registry, or None."""
+        key = (sex, family, STACKED)
+        with self._lock:
+            if key in self._models or (self.bundle is not None and key in self.bundle):
+                return self.get(*key)
+        return None
+
+    def _load_file(self, sex, family, horizon):
+        path = self.compiled_path(sex, family, horizon)
+        if path is not None:
+            model, source = COMPILED_LOADERS[family](path), 'compiled'
+        else:
+            path = self.path(sex, family, horizon)
+            if family == 'MLP':
+                model = _load_keras(path)
+            elif family == 'RSF':
+                model = _load_rds(path)
+            else:
+                model = _load_pickle(path)
+            source = 'artifact'
+        return model, os.path.getsize(path), source
+
+    def add(self, sex, family, horizon, model, size=0):
+        """Cache an already loaded model, e.g. one built on shared memory, under (sex, family, horizon)."""
+        key = (sex, family, horizon)
+        with self._lock:
+            self._models[key] = model
+            self._sizes[key] = size
+            self._models.move_to_end(key)
+
+    def get_scaler(self):
+        """Return the data scaler used by the SVM and MLP models."""
+        return self.get(*SCALER_KEY)
+
+    def _evict(self):
+        if self.max_bytes is None:
+            return
+        #Never evict the model that was just loaded, even if it exceeds the cap on its own
+        evictable = [key for key in list(self._models)[:-1] if key != SCALER_KEY]
+        while evictable and self.resident_bytes > self.max_bytes:
+            key = evictable.pop(0)
+            del self._models[key]
+            del self._sizes[key]
+            self.evictions += 1
+
+    @property
+    def resident_bytes(self):
+        return sum(self._sizes.values())
+
+    def keys(self):
+        with self._lock:
+            return list(self._models)
+
+    def preload(self, sexes=SEXES, families=ARTIFACT_FAMILIES):
+        """Load every available model for `sexes` and `families` ahead of scoring.
+
+        Models whose files are not available are skipped. Returns the keys that
+        are cached afterwards.
+        """
+        if any(family in ('SVM', 'MLP') for family in families):
+            self.get_scaler()
+        for sex in sexes:
+            for family in families:
+                for horizon in ([None] if family == 'RSF' else HORIZONS):
+                    if self.is_available(sex, family, horizon):
+                        self.get(sex, family, horizon)
+        return self.keys()
+
+    def clear(self):
+        with self._lock:
+            self._models.clear()
+            self._sizes.clear()
+
+
+_default_registry = ModelRegistry()
+
+
+def get_registry():
+    """Return the process-wide registry used when no registry is passed explicitly."""
+    return _default_registry
+
+
+def check_model_dir(model_dir=MODEL_DIR, families=ARTIFACT_FAMILIES):
+    """Raise FileNotFoundError if any of `families` needs a trained model and `model_dir` holds none at all.
+
+    Scoring would otherwise leave every such family NaN, e.g. after a
+    non-editable install, which does not include the model files.
+    """
+    if any(family in ARTIFACT_FAMILIES for family in families) and not ModelRegistry(model_dir).has_models():
+        raise FileNotFoundError('No trained models in {}; give --model-dir or set {} to the directory of the model '
+                                'files'.format(model_dir, MODEL_DIR_VARIABLE))
+
+
+def warm_up(sexes=SEXES, families=ARTIFACT_FAMILIES):
+    """Preload the process-wide registry so that later scoring never deserializes models."""
+    return get_registry().preload(sexes, [family for family in families if family in ARTIFACT_FAMILIES])
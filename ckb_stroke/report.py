@@ -0,0 +1,205 @@
+"""Rendering of scored risk estimates.
+
+The notebook's final cell draws one matplotlib figure per individual, with
+the risk table's cells formatted as '{:.1%}'. For whole cohorts,
+`RiskWriter` writes the same 8 models x 4 horizons per individual without
+matplotlib, appending one scored batch at a time:
+
+    csv, parquet, jsonl   one row (or JSON object) per individual, with
+                          'model_horizon' columns such as 'FSRP_9yr'
+    html                  one document holding the notebook's risk table of
+                          each individual, horizons by models, in percent
+
+    with RiskWriter('risks.html') as writer:
+        writer.write(score_cohort(raw_df, 'Male'))
+
+Parquet needs pyarrow. matplotlib is only imported when a figure is drawn
+(save_risk_table_figure), with the non-interactive Agg backend so that it
+also works without a display.
+"""
+
+import html
+import os
+
+import numpy as np
+
+from .metrics import METRICS
+from .parameters import HORIZON_LABELS, HORIZONS, MODEL_FAMILIES, MODEL_LABELS
+
+REPORT_FORMATS = ['csv', 'parquet', 'jsonl', 'html']
+
+#Report formats implied by the output file extension; other extensions are csv
+REPORT_EXTENSIONS = {'.parquet': 'parquet', '.pq': 'parquet', '.jsonl': 'jsonl', '.ndjson': 'jsonl',
+                     '.html': 'html', '.htm': 'html'}
+
+_HTML_HEADER = '''<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>{title}</title>
+<style>
+body {{font-family: sans-serif}}
+table {{border-collapse: collapse; margin: 1em 0}}
+caption {{text-align: left; font-weight: bold}}
+th, td {{border: 1px solid #999; padding: 0.3em 0.6em}}
+td {{text-align: right}}
+</style>
+</head>
+<body>
+<h1>{title}</h1>
+'''
+
+_HTML_FOOTER = '</body>\n</html>\n'
+
+
+def report_format(path):
+    """Return the report format implied by the extension of `path` (csv for file objects)."""
+    extension = os.path.splitext(path)[1].lower() if isinstance(path, str) else ''
+    return REPORT_EXTENSIONS.get(extension, 'csv')
+
+
+def flat_columns(risk_df):
+    """Return a copy of a scored cohort with 'model_horizon' column names, e.g. 'FSRP_9yr'."""
+    flat_df = risk_df.copy()
+    flat_df.columns = ['{}_{}'.format(family, horizon) for family, horizon in risk_df.columns]
+    return flat_df
+
+
+def percent_cells(risks):
+    """Format an array of risks as in the notebook's table, e.g. '5.3%', with 'n/a' where a model was not scored."""
+    risks = np.asarray(risks, dtype=np.float64)
+    return np.where(np.isnan(risks), 'n/a', np.char.mod('%.1f%%', 100*risks))
+
+
+class RiskWriter:
+    """Appends scored batches (see score_cohort) to a report file or file object such as sys.stdout.
+
+    `out_format` is one of REPORT_FORMATS, by default implied by the
+    extension of `path`. `title` heads an html report.
+    """
+
+    def __init__(self, path, out_format=None, title='Stroke risk estimates'):
+        self.path = path
+        self.out_format = report_format(path) if out_format is None else out_format
+        if self.out_format not in REPORT_FORMATS:
+            raise ValueError('Unknown report format {!r}, expected one of {}'.format(
+                self.out_format, ', '.join(REPORT_FORMATS)))
+        self.title = title
+        self._file = None
+        self._parquet_writer = None
+        self._started = False
+
+    def write(self, risk_df):
+        with METRICS.timer('report_writing'):
+            if self.out_format == 'parquet':
+                self._write_parquet(risk_df)
+            else:
+                self._open()
+                if self.out_format == 'csv':
+                    flat_columns(risk_df).to_csv(self._file, header=not self._started)
+                elif self.out_format == 'jsonl':
+                    self._write_jsonl(risk_df)
+                else:
+                    self._file.write(html_tables(risk_df))
+            self._started = True
+
+    def _open(self):
+        if self._file is None:
+            self._file = open(self.path, 'w', newline='') if isinstance(self.path, str) else self.path
+            if self.out_format == 'html':
+                self._file.write(_HTML_HEADER.format(title=html.escape(self.title)))
+
+    def _write_parquet(self, risk_df):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ValueError('Parquet output requires pyarrow') from None
+
+        table = pa.Table.from_pandas(flat_columns(risk_df), preserve_index=True)
+        if self._parquet_writer is None:
+            self._parquet_writer = pq.ParquetWriter(self.path, table.schema)
+        self._parquet_writer.write_table(table)
+
+    def _write_jsonl(self, risk_df):
+        flat_df = flat_columns(risk_df)
+        if flat_df.index.name is None:
+            flat_df.index.name = 'id'
+        if len(flat_df):
+            #Older pandas versions end the last line without a newline
+            lines = flat_df.reset_index().to_json(orient='records', lines=True)
+            self._file.write(lines if lines.endswith('\n') else lines+'\n')
+
+    def close(self):
+        if self._parquet_writer is not None:
+            self._parquet_writer.close()
+        if self.out_format == 'html':
+            #An html report without individuals is still a complete document
+            self._open()
+        if self._file is not None:
+            if self.out_format == 'html':
+                self._file.write(_HTML_FOOTER)
+            if self._file is not self.path:
+                self._file.close()
+            else:
+                self._file.flush()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def write_risks(risk_df, path, out_format=None, title='Stroke risk estimates'):
+    """Write a scored cohort to `path` as one RiskWriter batch."""
+    with RiskWriter(path, out_format, title) as writer:
+        writer.write(risk_df)
+
+
+def _template_text(text):
+    """Escape `text` for HTML and for str.format."""
+    return html.escape(text).replace('{', '{{').replace('}', '}}')
+
+
+def html_tables(risk_df):
+    """Return the notebook's risk table of every individual of a scored cohort as HTML tables, captioned by row label.
+
+    Rows are the four horizons and columns the model families, as in risk_table.
+    """
+    families = list(risk_df.columns.unique(level='model'))
+    header = '<tr><th></th>{}</tr>\n'.format(''.join(
+        '<th>{}</th>'.format(_template_text(MODEL_LABELS[MODEL_FAMILIES.index(family)]).replace('\n', '<br>'))
+        for family in families))
+    rows = ''.join('<tr><th>{}</th>{}</tr>\n'.format(_template_text(label), '<td>{}</td>'*len(families))
+                   for label in HORIZON_LABELS)
+    #One format call per individual fills in the caption and the cells, horizons by families
+    template = '<table>\n<caption>{}</caption>\n' + header + rows + '</table>\n'
+    positions = risk_df.columns.get_indexer([(family, horizon) for horizon in HORIZONS for family in families])
+    cells = percent_cells(risk_df.to_numpy(dtype=np.float64)[:, positions])
+    return ''.join(template.format(html.escape(str(label)), *table_cells)
+                   for label, table_cells in zip(risk_df.index, cells.tolist()))
+
+
+def save_risk_table_figure(table, path):
+    """Draw a risk table (see scoring.risk_table) as in the final cell of the notebook and save it to `path`."""
+    with METRICS.timer('table_rendering'):
+        _save_risk_table_figure(table, path)
+
+
+def _save_risk_table_figure(table, path):
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots(1, 1)
+    ax.axis('tight')
+    ax.axis('off')
+    cell_text = [['{:.1%}'.format(value) for value in row] for row in table.values]
+    figure_table = ax.table(cellText=cell_text, colLabels=list(table.columns), rowLabels=list(table.index), loc='center')
+    figure_table.auto_set_font_size(False)
+    figure_table.set_fontsize(12)
+    figure_table.scale(3, 4)
+    fig.savefig(path, bbox_inches='tight')
+    plt.close(fig)
@@ -0,0 +1,118 @@
+"""Batched RSF predictions through the embedded R session.
+
+rpy2 runs R inside this process, so the session (with ranger attached and the
+helper below defined) persists between calls once started. Each call sends
+the whole cohort to R in memory, as an Arrow table when pyarrow and
+rpy2-arrow are installed and as a single numeric matrix otherwise, makes one
+`predict` call and returns only the survival columns for the requested
+years, selected inside R for all rows at once.
+
+By default the survival is read where the notebook reads it, at the unique
+death time after each of 3, 6 and 9 years (see survival_columns), so RSF
+risks are the notebook's. reading='exact' reads it at exactly those years.
+"""
+
+import threading
+
+import numpy as np
+
+from .parameters import ML_COLUMN_NAMES, REGION_DUMMY_COLUMNS
+
+#The RSF models were trained with the region indicators named after the region only
+RSF_COLUMN_NAMES = [column[len('region_'):] if column in REGION_DUMMY_COLUMNS else column
+                    for column in ML_COLUMN_NAMES]
+
+#Where survival_columns reads the survival at each year: at the next unique death time, as the notebook does, or
+#at the year itself
+SURVIVAL_READINGS = ['notebook', 'exact']
+
+#Survival columns are given as R's 1-based positions
+_SURVIVAL_AT = '''
+function(model, data, columns) {
+    predict(model, data)$survival[, columns, drop = FALSE]
+}
+'''
+
+_session = None
+_session_lock = threading.Lock()
+
+
+class _RSession:
+
+    def __init__(self):
+        import rpy2.robjects as robjects
+        from rpy2.robjects import numpy2ri
+        from rpy2.robjects.packages import PackageNotInstalledError, importr
+
+        importr('ranger')
+        self.robjects = robjects
+        self.numpy2ri = numpy2ri
+        #R is single threaded: calls into the session are serialized
+        self.lock = threading.Lock()
+        self.survival_at = robjects.r(_SURVIVAL_AT)
+        self.as_data_frame = robjects.r['as.data.frame']
+        try:
+            import pyarrow
+            import rpy2_arrow.pyarrow_rarrow as pyarrow_rarrow
+            importr('arrow')
+        except (ImportError, PackageNotInstalledError):
+            self.pyarrow = None
+        else:
+            self.pyarrow = pyarrow
+            self.pyarrow_rarrow = pyarrow_rarrow
+
+    def data_frame(self, x, columns):
+        """Convert a float matrix with named columns into an R data.frame."""
+        if self.pyarrow is not None:
+            table = self.pyarrow.Table.from_arrays([self.pyarrow.array(x[:, k]) for k in range(x.shape[1])],
+                                                   names=columns)
+            return self.as_data_frame(self.pyarrow_rarrow.pyarrow_table_to_r_table(table))
+        #One copy into an R matrix, named and turned into a data.frame inside R
+        data_frame = self.as_data_frame(self.numpy2ri.py2rpy(x))
+        data_frame.names = self.robjects.StrVector(columns)
+        return data_frame
+
+
+def survival_columns(death_times, years, reading='notebook'):
+    """Return the 0-based positions among a ranger forest's unique death times at which to read `years`.
+
+    The notebook takes the position of each year from R's which(), which is
+    1-based, and uses it as a 0-based Python index, so it reads the survival
+    at the unique death time after each of 3, 6 and 9 years. That is the
+    default reading; reading='exact' takes the position of the years
+    themselves.
+    """
+    if reading not in SURVIVAL_READINGS:
+        raise ValueError('Unknown survival reading {!r} (choose from {})'.format(reading, ', '.join(SURVIVAL_READINGS)))
+    death_times = np.asarray(death_times, dtype=np.float64)
+    positions = [np.flatnonzero(death_times == year) for year in years]
+    missing = [str(year) for year, found in zip(years, positions) if not len(found)]
+    if missing:
+        raise ValueError('The RSF model has no unique death time at {} years'.format(', '.join(missing)))
+    columns = np.array([found[0] for found in positions])
+    if reading == 'notebook':
+        columns += 1
+        if columns.max() >= len(death_times):
+            raise ValueError('The RSF model has no unique death time after {} years'.format(max(years)))
+    return columns
+
+
+def get_session():
+    """Return the R session, starting R and attaching ranger on first use."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = _RSession()
+        return _session
+
+
+def ranger_survival(rsf_model, x, years, reading='notebook'):
+    """Return survival at each of `years`, read as survival_columns does, for every row of the ML input `x`, shape
+    (N, len(years)), from one predict call."""
+    columns = survival_columns(rsf_model.rx2('unique.death.times'), years, reading)
+    session = get_session()
+    with session.lock:
+        data = session.data_frame(np.asarray(x, dtype=np.float64), RSF_COLUMN_NAMES)
+        survival = session.survival_at(rsf_model, data, session.robjects.IntVector([int(k)+1 for k in columns]))
+    #R matrices are stored column-major
+    return np.asarray(survival).reshape((len(x), len(years)), order='F')
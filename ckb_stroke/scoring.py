@@ -0,0 +1,257 @@
+"""Score a cohort with every model family in one pass.
+
+`score_cohort` is the batch counterpart of running the notebook once per
+individual: it takes an N-row table of raw risk factors (the variables of the
+input cell, one column each) and returns an N x (8 models x 4 horizons) table
+of stroke risk estimates.
+
+A table may mix men and women. Its rows are then sorted by sex once, so that
+each sex is a contiguous block: preprocessing runs once on the whole table
+into one feature matrix (see ckb_stroke.features), each block is imputed and
+scored with its own sex's means, coefficients, survival tables and trained
+models through row slices of that matrix rather than copies, and the risks
+are scattered back into input order.
+
+Given a concurrent.futures executor, the model families (the proportional
+hazards models together, then RSF, LR, SVM, GBT and MLP, for each sex) are
+scored as independent tasks on it and gathered into the same risk table; see
+ckb_stroke.fanout.
+
+Given a ReducedPrecision (see ckb_stroke.precision), the model families that
+pass its accuracy check are scored on a float32 copy of the feature matrix.
+"""
+
+import warnings
+from concurrent.futures import wait
+from functools import partial
+
+import numpy as np
+import pandas as pd
+
+from . import models
+from .metrics import METRICS
+from .parameters import HORIZON_LABELS, HORIZONS, MODEL_FAMILIES, MODEL_LABELS, SEXES
+from .preprocessing import derive_features, impute_missing_values
+from .survival import PROPORTIONAL_HAZARDS_FAMILIES, proportional_hazards_risk
+
+#The ML models (including RSF) are scored on the feature matrix with region one-hot encoded
+ML_FAMILIES = {
+    'RSF': models.rsf_risk,
+    'LR': models.lr_risk,
+    'SVM': models.svm_risk,
+    'GBT': models.gbt_risk,
+    'MLP': models.mlp_risk,
+}
+
+
+def result_columns(families=MODEL_FAMILIES):
+    return pd.MultiIndex.from_product([families, HORIZONS], names=['model', 'horizon'])
+
+
+def sex_partitions(sex, n_rows):
+    """Partition rows by sex.
+
+    `sex` is 'Male' or 'Female' for all `n_rows` rows or one value per row.
+    Returns the row order that makes each sex contiguous (None if the rows
+    are already in that order) and (sex, slice) partitions of the reordered
+    rows.
+    """
+    if isinstance(sex, str):
+        if sex not in SEXES:
+            raise ValueError("sex must be 'Male' or 'Female', got {!r}".format(sex))
+        return None, [(sex, slice(0, n_rows))]
+    codes = pd.Categorical(sex, categories=SEXES).codes
+    if len(codes) != n_rows:
+        raise ValueError('Got {} sexes for {} rows'.format(len(codes), n_rows))
+    if (codes < 0).any():
+        unknown = sorted(set(map(str, np.asarray(sex, dtype=object)[codes < 0])))
+        raise ValueError('Unknown values in the sex column: {}'.format(', '.join(unknown)))
+    order = None if (np.diff(codes) >= 0).all() else np.argsort(codes, kind='stable')
+    bounds = np.searchsorted(codes if order is None else codes[order], np.arange(len(SEXES)+1))
+    return order, [(sex, slice(start, end)) for sex, start, end in zip(SEXES, bounds[:-1], bounds[1:])
+                   if end > start]
+
+
+def score_cohort(raw_df, sex=None, families=None, registry=None, return_imputation_counts=False, cache=None,
+                 executor=None, precision=None, strict=False):
+    """Return stroke risk estimates for every row of `raw_df`.
+
+    `sex` is 'Male' or 'Female' for the whole table, or one value per row;
+    by default it is read from a 'sex' column of `raw_df`. The result has
+    one row per individual (same index as `raw_df`) and (model, horizon)
+    columns. Trained models come from `registry` (the process-wide
+    ModelRegistry by default). Model families whose trained model objects
+    are not available (e.g. the RSF .rds files) are returned as NaN with a
+    warning, or raise FileNotFoundError if `strict`.
+
+    With `return_imputation_counts`, also returns the number of values imputed
+    in each column of the input vector.
+
+    With a ResultCache (see ckb_stroke.cache) as `cache`, rows whose imputed
+    input was scored before take their risks from the cache, and the models
+    run only for the other rows.
+
+    With an `executor` (e.g. a ThreadPoolExecutor), the model families are
+    scored concurrently on it rather than one after another.
+
+    With a ReducedPrecision (see ckb_stroke.precision) as `precision`, the
+    model families within its tolerance are scored in float32 and the others
+    in float64.
+    """
+    if sex is None:
+        if 'sex' not in raw_df:
+            raise ValueError("Give a sex or a 'sex' column in the input")
+        sex = raw_df['sex'].to_numpy()
+    order, partitions = sex_partitions(sex, len(raw_df))
+    families = list(MODEL_FAMILIES if families is None else families)
+    unknown = [family for family in families if family not in MODEL_FAMILIES]
+    if unknown:
+        raise ValueError('Unknown model families: {}'.format(', '.join(unknown)))
+
+    METRICS.record_batch(len(raw_df))
+    with METRICS.timer('derivation'):
+        features = derive_features(raw_df if order is None else raw_df.take(order))
+    with METRICS.timer('imputation'):
+        features, imputation_counts = impute_missing_values(features, partitions, inplace=True)
+    METRICS.record_imputation(imputation_counts)
+
+    if cache is None:
+        risks = score_features(features, partitions, families, registry, executor, precision, strict)
+    else:
+        risks = np.full((len(raw_df), len(families), len(HORIZONS)), np.nan)
+        _score_with_cache(risks, features, partitions, families, registry, cache, executor, precision, strict)
+    if order is not None:
+        sorted_risks, risks = risks, np.empty_like(risks)
+        risks[order] = sorted_risks
+
+    risk_df = pd.DataFrame(risks.reshape(len(raw_df), len(families)*len(HORIZONS)), index=raw_df.index,
+                           columns=result_columns(families))
+    if return_imputation_counts:
+        return risk_df, imputation_counts
+    return risk_df
+
+
+def score_features(features, partitions, families=MODEL_FAMILIES, registry=None, executor=None, precision=None,
+                   strict=False):
+    """Return the risks of every model family for an imputed feature matrix, shape (N, len(families), 4).
+
+    This is score_cohort without derivation and imputation: `features` is a
+    FeatureMatrix (see ckb_stroke.features) already imputed with the means of
+    each sex, and `partitions` are its (sex, slice) row blocks as returned by
+    sex_partitions. Its dtype is kept, so a float32 matrix is scored in
+    float32 by every family with a float32 kernel. `registry`, `executor`,
+    `precision` and `strict` are as in score_cohort.
+    """
+    families = list(families)
+    risks = np.full((len(features), len(families), len(HORIZONS)), np.nan)
+    _score_partitions(risks, features, partitions, families, registry, executor, precision, strict)
+    return risks
+
+
+def _score_partitions(risks, features, partitions, families, registry, executor=None, precision=None,
+                      strict=False):
+    tasks = []
+    for partition_sex, rows in partitions:
+        float32_families = [] if precision is None else precision.float32_families(partition_sex, families, registry)
+        float32_features = features.rows(rows).astype(np.float32) if float32_families else None
+        tasks += _partition_tasks(risks[rows], features.rows(rows), partition_sex, families, registry,
+                                  float32_features, float32_families, strict)
+    if executor is None or len(tasks) < 2:
+        for task in tasks:
+            task()
+        return
+    #Each task fills its own columns of `risks`; wait for all of them before raising the first failure
+    futures = [executor.submit(task) for task in tasks]
+    wait(futures)
+    for future in futures:
+        future.result()
+
+
+def _partition_tasks(risks, features, sex, families, registry, float32_features=None, float32_families=(),
+                     strict=False):
+    """Return independent functions filling `risks`, shape (N, len(families), 4), for rows of one sex.
+
+    The proportional hazards models are evaluated together in one task (one
+    per precision), and each ML model family is a task of its own. The
+    `float32_families` are scored on `float32_features`. A missing trained
+    model raises if `strict`, and otherwise leaves its family's risks NaN.
+    """
+    tasks = []
+    for family_features, in_float32 in [(features, False), (float32_features, True)]:
+        proportional_hazards_families = [family for family in families if family in PROPORTIONAL_HAZARDS_FAMILIES
+                                         and (family in float32_families) == in_float32]
+        if proportional_hazards_families:
+            tasks.append(partial(_score_proportional_hazards, risks, family_features, sex, families,
+                                 proportional_hazards_families, registry))
+    for i, family in enumerate(families):
+        if family in ML_FAMILIES:
+            family_features = float32_features if family in float32_families else features
+            tasks.append(partial(_score_ml_family, risks[:, i], family_features, sex, family, registry, strict))
+    return tasks
+
+
+def _score_proportional_hazards(risks, features, sex, families, proportional_hazards_families, registry):
+    #The proportional hazards models are evaluated together, so they share one timer
+    with METRICS.timer('proportional_hazards'):
+        risks[:, [families.index(family) for family in proportional_hazards_families]] = \
+            proportional_hazards_risk(features, sex, proportional_hazards_families, registry)
+    for family in proportional_hazards_families:
+        METRICS.record_model_call(family, sex, len(features))
+
+
+def _score_ml_family(risks, features, sex, family, registry, strict=False):
+    try:
+        with METRICS.timer(family):
+            risks[...] = ML_FAMILIES[family](features, sex, registry=registry)
+    except FileNotFoundError as error:
+        if strict:
+            raise FileNotFoundError('No trained {} model for {}: {}'.format(family, sex, error)) from error
+        METRICS.record_missing_model(family, sex)
+        warnings.warn('No trained {} model for {} ({}); its risks are NaN'.format(family, sex, error))
+    else:
+        METRICS.record_model_call(family, sex, len(features))
+
+
+def _score_with_cache(risks, features, partitions, families, registry, cache, executor=None, precision=None,
+                      strict=False):
+    """Fill `risks` from `cache` where possible, scoring (and caching) only the rows that miss."""
+    from .cache import row_keys
+
+    sexes = np.empty(len(risks), dtype=object)
+    for partition_sex, rows in partitions:
+        sexes[rows] = partition_sex
+    keys = row_keys(features, sexes, families, 'float64' if precision is None else str(precision))
+    cached = cache.get_many(keys)
+    missed = np.array([value is None for value in cached], dtype=bool)
+    for i in np.flatnonzero(~missed):
+        risks[i] = cached[i]
+    missed_rows = np.flatnonzero(missed)
+    if not len(missed_rows):
+        return
+    #The missed rows stay sorted by sex, so the partitions carry over with shifted bounds
+    bounds = np.cumsum([0]+[missed[rows].sum() for _, rows in partitions])
+    missed_partitions = [(partition_sex, slice(start, end))
+                         for (partition_sex, _), start, end in zip(partitions, bounds[:-1], bounds[1:]) if end > start]
+    missed_risks = risks[missed_rows]
+    _score_partitions(missed_risks, features.rows(missed_rows), missed_partitions, families, registry, executor,
+                      precision, strict)
+    risks[missed_rows] = missed_risks
+    #Copy each row so that an entry does not keep a whole batch's risks alive
+    cache.put_many([keys[i] for i in missed_rows], [risks[i].copy() for i in missed_rows])
+
+
+def risk_table(risk_df, row):
+    """Return the notebook's table of risk estimates for one individual of a scored cohort.
+
+    Rows are the four horizons and columns the model families, labelled as in
+    the final cell of the notebook.
+    """
+    with METRICS.timer('risk_table'):
+        return _risk_table(risk_df.loc[row])
+
+
+def _risk_table(risks):
+    families = list(risks.index.unique(level='model'))
+    table_vals = np.array([[risks[(family, horizon)] for family in families] for horizon in HORIZONS])
+    return pd.DataFrame(table_vals, index=HORIZON_LABELS,
+                        columns=[MODEL_LABELS[MODEL_FAMILIES.index(family)] for family in families])
@@ -0,0 +1,341 @@
+"""Long-running local scoring service.
+
+Running the notebook as a one-shot process pays interpreter start-up, the
+keras/TensorFlow and rpy2 imports and model loading on every request. This
+service starts once, keeps every model warm in its model registry and
+answers HTTP requests:
+
+    POST /score    one individual as a JSON object with `sex` and the risk
+                   factors of the notebook's input cell (null or 'Missing'
+                   for unavailable values); returns the 8-model x 4-horizon
+                   risk table
+    GET  /metrics  latency percentiles and throughput counters, with the
+                   scoring instrumentation (see ckb_stroke.metrics)
+    GET  /metrics/prometheus
+                   the same in the Prometheus text exposition format
+    GET  /health   liveness check
+
+With `cache_size`, the risks of recently scored individuals are kept in a
+ResultCache (see ckb_stroke.cache), so that re-submitting an unchanged form
+does not run the models again; its statistics are part of /metrics.
+
+Every batch is validated first (see ckb_stroke.validation): invalid
+individuals get a 400 response listing their errors, and the rest of the
+batch is scored.
+
+Concurrent requests are coalesced into micro-batches of up to
+`max_batch_size` individuals, waiting at most `max_wait` seconds for a batch
+to fill, and each batch, men and women together, is scored with one
+score_cohort call. With `fan_out` threads, the model families of each batch
+are scored concurrently (see ckb_stroke.fanout). A request that is not
+answered within `timeout` seconds gets a 504 response, and every request gets
+a 503 response if the batching thread is no longer running.
+
+    python -m ckb_stroke.service --port 8000 --max-batch-size 256 --max-wait-ms 5
+"""
+
+import argparse
+import json
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, InvalidStateError, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pandas as pd
+
+from . import metrics
+from .cache import ResultCache
+from .metrics import METRICS
+from .parameters import SEXES
+from .registry import MODEL_DIR, ModelRegistry, check_model_dir, get_registry
+from .scoring import risk_table, score_cohort
+from .validation import validate
+
+
+class LatencyStats:
+    """Request latencies (over a sliding window) and throughput counters."""
+
+    def __init__(self, window=10000):
+        self._latencies = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.started = time.time()
+        self.requests = 0
+        self.errors = 0
+        self.batches = 0
+        self.batch_rows = 0
+
+    def record_request(self, seconds, failed=False):
+        with self._lock:
+            self._latencies.append(seconds)
+            self.requests += 1
+            self.errors += failed
+
+    def record_batch(self, size):
+        with self._lock:
+            self.batches += 1
+            self.batch_rows += size
+
+    def snapshot(self):
+        with self._lock:
+            latencies = np.array(self._latencies)
+            uptime = time.time() - self.started
+            p50, p99 = np.percentile(latencies, [50, 99]) if len(latencies) else (np.nan, np.nan)
+            return {
+                'requests': self.requests,
+                'errors': self.errors,
+                'batches': self.batches,
+                'mean_batch_size': self.batch_rows/self.batches if self.batches else 0.0,
+                'latency_p50_ms': float(p50)*1000,
+                'latency_p99_ms': float(p99)*1000,
+                'uptime_s': uptime,
+                'throughput_rps': self.requests/uptime if uptime > 0 else 0.0,
+            }
+
+    def prometheus_text(self):
+        """Return the snapshot as Prometheus gauges, e.g. ckb_stroke_service_requests."""
+        return ''.join('# TYPE ckb_stroke_service_{0} gauge\nckb_stroke_service_{0} {1!r}\n'.format(name, float(value))
+                       for name, value in self.snapshot().items())
+
+
+class MicroBatcher:
+    """Coalesces single-individual scoring requests into batches scored by a background thread."""
+
+    def __init__(self, max_batch_size=256, max_wait=0.005, families=None, registry=None, stats=None, cache=None,
+                 executor=None, validation=True):
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.families = families
+        self.registry = registry
+        self.cache = cache
+        self.executor = executor
+        self.validation = validation
+        self.stats = stats or LatencyStats()
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name='ckb-stroke-batcher', daemon=True)
+        self._thread.start()
+
+    def submit(self, sex, risk_factors):
+        """Queue one individual and return a Future resolving to its row of risk estimates."""
+        if sex not in SEXES:
+            raise ValueError("sex must be 'Male' or 'Female', got {!r}".format(sex))
+        future = Future()
+        self._queue.put((sex, risk_factors, future))
+        return future
+
+    def score(self, sex, risk_factors, timeout=None):
+        """Score one individual, waiting at most `timeout` seconds; a request that times out is not scored."""
+        future = self.submit(sex, risk_factors)
+        try:
+            return future.result(timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            raise
+
+    def is_alive(self):
+        return self._thread.is_alive()
+
+    def _next_batch(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _score_batch(self, batch):
+        #Requests already answered (rejected by validation) or cancelled after a timeout are skipped
+        batch = [request for request in batch if not request[2].done()]
+        if not batch:
+            return
+        raw_df = pd.DataFrame([risk_factors for _, risk_factors, _ in batch])
+        if self.validation:
+            report = validate(raw_df, [sex for sex, _, _ in batch])
+            if report.n_invalid:
+                for i, messages in zip(np.flatnonzero(report.invalid), report.row_messages()):
+                    _set_exception(batch[i][2], ValueError('; '.join(messages)))
+                batch = [request for request, valid in zip(batch, report.valid) if valid]
+                if not batch:
+                    return
+                raw_df = raw_df[report.valid.to_numpy()]
+        risk_df = score_cohort(raw_df, [sex for sex, _, _ in batch], families=self.families, registry=self.registry,
+                               cache=self.cache, executor=self.executor)
+        for (_, _, future), (_, risks) in zip(batch, risk_df.iterrows()):
+            _set_result(future, risks)
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            try:
+                self.stats.record_batch(len(batch))
+                try:
+                    self._score_batch(batch)
+                except Exception:
+                    #Score the requests still pending individually, so that one failing request does not fail the
+                    #whole batch
+                    for request in batch:
+                        try:
+                            self._score_batch([request])
+                        except Exception as error:
+                            _set_exception(request[2], error)
+            except Exception as error:
+                #Fail what is left of the batch rather than end the thread, which would leave every later request
+                #waiting for ever
+                for _, _, future in batch:
+                    _set_exception(future, error)
+
+
+def _set_result(future, result):
+    if not future.done():
+        try:
+            future.set_result(result)
+        except InvalidStateError:
+            #Cancelled in the meantime
+            pass
+
+
+def _set_exception(future, error):
+    if not future.done():
+        try:
+            future.set_exception(error)
+        except InvalidStateError:
+            pass
+
+
+def _make_handler(batcher, timeout=None):
+
+    class ScoringRequestHandler(BaseHTTPRequestHandler):
+
+        def _send_json(self, status, payload):
+            body = json.dumps(payload).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == '/health':
+                if batcher.is_alive():
+                    self._send_json(200, {'status': 'ok'})
+                else:
+                    self._send_json(503, {'status': 'scoring unavailable'})
+            elif self.path == '/metrics':
+                snapshot = dict(batcher.stats.snapshot(), scoring=METRICS.snapshot())
+                if batcher.cache is not None:
+                    snapshot['cache'] = batcher.cache.stats()
+                self._send_json(200, snapshot)
+            elif self.path == '/metrics/prometheus':
+                body = batcher.stats.prometheus_text() + METRICS.prometheus_text()
+                if batcher.cache is not None:
+                    body += batcher.cache.prometheus_text()
+                body = body.encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            else:
+                self._send_json(404, {'error': 'not found'})
+
+        def do_POST(self):
+            if self.path != '/score':
+                self._send_json(404, {'error': 'not found'})
+                return
+            start = time.perf_counter()
+            if not batcher.is_alive():
+                batcher.stats.record_request(time.perf_counter()-start, failed=True)
+                self._send_json(503, {'error': 'scoring unavailable'})
+                return
+            try:
+                risk_factors = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+                sex = risk_factors.pop('sex', None)
+                risks = batcher.score(sex, risk_factors, timeout)
+            except FutureTimeoutError:
+                batcher.stats.record_request(time.perf_counter()-start, failed=True)
+                self._send_json(504, {'error': 'scoring timed out after {} s'.format(timeout)})
+                return
+            except (ValueError, KeyError, TypeError) as error:
+                batcher.stats.record_request(time.perf_counter()-start, failed=True)
+                self._send_json(400, {'error': str(error)})
+                return
+            table = risk_table(risks.to_frame().T, risks.name)
+            batcher.stats.record_request(time.perf_counter()-start)
+            self._send_json(200, {
+                'index': list(table.index),
+                'columns': list(table.columns),
+                'data': [[None if np.isnan(value) else value for value in row] for row in table.values.tolist()],
+            })
+
+        def log_message(self, format, *args):
+            pass
+
+    return ScoringRequestHandler
+
+
+def serve(host='127.0.0.1', port=8000, max_batch_size=256, max_wait=0.005, families=None, preload=True,
+          instrument=True, cache_size=0, cache_ttl=None, fan_out=0, validation=True, timeout=30.0, model_dir=None):
+    """Run the scoring service until interrupted.
+
+    Models come from `model_dir`, or the process-wide registry if it is None.
+    """
+    if instrument:
+        metrics.enable()
+    registry = ModelRegistry(model_dir) if model_dir else get_registry()
+    if preload:
+        registry.preload()
+    cache = ResultCache(cache_size, cache_ttl) if cache_size else None
+    executor = ThreadPoolExecutor(fan_out, thread_name_prefix='ckb-stroke-fan-out') if fan_out else None
+    batcher = MicroBatcher(max_batch_size=max_batch_size, max_wait=max_wait, families=families, registry=registry,
+                           cache=cache, executor=executor, validation=validation)
+    server = ThreadingHTTPServer((host, port), _make_handler(batcher, timeout))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if executor is not None:
+            executor.shutdown()
+
+
+def main(argv=None, prog=None):
+    parser = argparse.ArgumentParser(prog=prog, description='Serve CKB stroke risk estimates over HTTP.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--max-batch-size', type=int, default=256)
+    parser.add_argument('--max-wait-ms', type=float, default=5.0)
+    parser.add_argument('--no-preload', action='store_true', help='load models on first use instead of at start-up')
+    parser.add_argument('--no-metrics', action='store_true', help='disable the scoring instrumentation')
+    parser.add_argument('--cache-size', type=int, default=0,
+                        help='cache the risks of this many recently scored individuals (default: no cache)')
+    parser.add_argument('--cache-ttl', type=float, default=None, help='seconds a cached result stays valid')
+    parser.add_argument('--fan-out', type=int, default=0,
+                        help='score the model families of each batch concurrently on this many threads '
+                             '(default: one after another)')
+    parser.add_argument('--no-validation', action='store_true',
+                        help='score requests without checking their risk factors first')
+    parser.add_argument('--timeout', type=float, default=30.0,
+                        help='seconds to wait for the risks of a request before answering 504 (default: 30)')
+    parser.add_argument('--model-dir', help='directory of the trained models (default: $CKB_STROKE_MODEL_DIR, else '
+                                            'the repository root)')
+    args = parser.parse_args(argv)
+    try:
+        check_model_dir(args.model_dir or MODEL_DIR)
+    except FileNotFoundError as error:
+        parser.exit(2, '{}: error: {}\n'.format(parser.prog, error))
+    serve(args.host, args.port, args.max_batch_size, args.max_wait_ms/1000, preload=not args.no_preload,
+          instrument=not args.no_metrics, cache_size=args.cache_size, cache_ttl=args.cache_ttl, fan_out=args.fan_out,
+          validation=not args.no_validation, timeout=args.timeout, model_dir=args.model_dir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""Streaming scoring of cohort files larger than memory.
+
+`score_file` reads a CSV or Parquet cohort in chunks of `chunk_size` rows,
+scores each chunk (derivation, imputation and every model)
+and appends its risk estimates to a CSV, Parquet, JSON-lines or HTML report
+(see ckb_stroke.report) before reading the next, so memory use depends on the
+chunk size and not on the file size.
+Parquet support needs pyarrow. With a `quarantine` file, each chunk is
+validated first (see ckb_stroke.validation) and its invalid rows are
+appended to that CSV, with their errors, instead of being scored.
+
+    score_file('cohort.parquet', 'risks.parquet', chunk_size=100000)
+"""
+
+import os
+from functools import partial
+
+import pandas as pd
+
+from .report import RiskWriter
+from .scoring import score_cohort
+from .validation import validate
+
+DEFAULT_CHUNK_SIZE = 100000
+
+PARQUET_EXTENSIONS = ('.parquet', '.pq')
+
+
+def is_parquet(path):
+    return isinstance(path, str) and os.path.splitext(path)[1].lower() in PARQUET_EXTENSIONS
+
+
+def read_cohort(path):
+    """Read a whole CSV or Parquet file (or CSV file object) of raw risk factors."""
+    if not is_parquet(path):
+        return pd.read_csv(path)
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ValueError('Parquet input requires pyarrow') from None
+    return pq.read_table(path).to_pandas()
+
+
+def read_chunks(path, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield a CSV or Parquet file as DataFrames of at most `chunk_size` rows, indexed by row number."""
+    if not is_parquet(path):
+        yield from pd.read_csv(path, chunksize=chunk_size)
+        return
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ValueError('Parquet input requires pyarrow') from None
+
+    start = 0
+    for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+        chunk = batch.to_pandas()
+        chunk.index = pd.RangeIndex(start, start+len(chunk))
+        start += len(chunk)
+        yield chunk
+
+
+def score_file(input_path, output_path, sex=None, families=None, chunk_size=DEFAULT_CHUNK_SIZE, registry=None,
+               scorer=None, out_format=None, quarantine=None, precision=None, strict=False):
+    """Score a cohort file chunk by chunk, appending the risk estimates to `output_path`.
+
+    Each row's sex comes from a 'sex' column unless `sex` is given. Chunks are
+    scored with score_cohort, or by a ParallelScorer's worker processes when
+    `scorer` is given. `out_format` selects the report format as in RiskWriter.
+    Invalid rows are written to the `quarantine` CSV file when one is given.
+    `precision` and `strict` are passed to score_cohort.
+    Returns the number of rows scored.
+    """
+    if scorer is not None:
+        score = scorer.score
+    else:
+        score = partial(score_cohort, families=families, registry=registry, precision=precision, strict=strict)
+    n_rows, n_quarantined = 0, 0
+    with RiskWriter(output_path, out_format) as writer:
+        for chunk in read_chunks(input_path, chunk_size):
+            if quarantine is not None:
+                report = validate(chunk, sex)
+                if report.n_invalid or not n_quarantined:
+                    #The quarantine file is written even if every row is valid, so that it is never stale
+                    report.quarantined(chunk).to_csv(quarantine, mode='a' if n_quarantined else 'w',
+                                                     header=not n_quarantined)
+                    n_quarantined += report.n_invalid
+                chunk = chunk[report.valid]
+            writer.write(score(chunk, sex))
+            n_rows += len(chunk)
+    return n_rows
@@ -0,0 +1,131 @@
+"""Shared proportional hazards kernel for the FSRP, Recalibrated and Refitted FSRP and CKB Cox models.
+
+All three models estimate risk as 1 - S(t)**exp(L - M), where L = x.dot(coeffs)
+is the linear predictor, M = coeffs.dot(means) and S(t) is the baseline
+survival at t = 3, 6 and 9 years. The kernel precomputes M, the positions of
+each model's risk factors in the feature matrix (see ckb_stroke.features) and
+a table of log baseline survival indexed by (model, region code, year),
+gathers every row's regional baseline by integer region code and evaluates all requested
+models and horizons in one broadcasted computation, so a batch mixing regions
+costs the same as a single-region one. The kernel computes in the dtype of
+the feature matrix, so a float32 matrix is scored in float32.
+"""
+
+import numpy as np
+
+from .features import column_index
+from .linear import linear_predictor
+from .parameters import (COX_BASELINE_SURVIVAL, COX_COEFFS, COX_COLUMNS, COX_MEANS, FSRP_BASELINE_SURVIVAL,
+                         FSRP_COEFFS, FSRP_COLUMNS, FSRP_MEANS, RECALIBRATED_FSRP_BASELINE_SURVIVAL,
+                         RECALIBRATED_FSRP_COEFFS, RECALIBRATED_FSRP_MEANS, REGIONS, SEXES)
+from .registry import get_registry
+
+PROPORTIONAL_HAZARDS_FAMILIES = ['FSRP', 'Recalibrated_Refitted_FSRP', 'Cox']
+
+SURVIVAL_YEARS = [3, 6, 9]
+
+
+#The FSRP's smoking_now is derived from smoking_now_0 (see fsrp_input)
+FSRP_INDEX = column_index(['smoking_now_0' if column == 'smoking_now' else column for column in FSRP_COLUMNS])
+_FSRP_SMOKING_NOW = FSRP_COLUMNS.index('smoking_now')
+
+
+def fsrp_input(features):
+    """Return the FSRP input matrix, with smoking_now 0 where smoking_now_0 is 1 and 1 otherwise."""
+    x = features.take(FSRP_INDEX)
+    x[:, _FSRP_SMOKING_NOW] = x[:, _FSRP_SMOKING_NOW] != 1
+    return x
+
+
+def interval_risks(p):
+    """Turn cumulative risk at 3, 6 and 9 years (last axis) into 9-year, 0-3, 3-6 and 6-9 year risk."""
+    p_3, p_6, p_9 = p[..., 0], p[..., 1], p[..., 2]
+    return np.stack([p_9, p_3, p_6-p_3, p_9-p_6], axis=-1)
+
+
+def _positions(index, changed):
+    #Positions within a model's input of the feature matrix columns `changed`
+    return None if changed is None else np.flatnonzero(np.isin(index, changed))
+
+
+def _regional_log_survival(survival_by_region):
+    return np.log(np.array([survival_by_region[region][0, SURVIVAL_YEARS] for region in REGIONS]))
+
+
+class ProportionalHazardsKernel:
+    """The three proportional hazards models for one sex, evaluated together.
+
+    `arrays` are the kernel arrays of `to_arrays` and `cox_columns` the Cox
+    model's risk factors, e.g. as read from a model bundle (see
+    ckb_stroke.bundle); by default both come from parameters.py.
+    """
+
+    def __init__(self, sex, arrays=None, cox_columns=None):
+        self.sex = sex
+        self.cox_index = column_index(COX_COLUMNS[sex] if cox_columns is None else cox_columns)
+        if arrays is not None:
+            self.fsrp_coeffs, self.cox_coeffs = arrays['fsrp_coeffs'], arrays['cox_coeffs']
+            self.M, self.log_survival = arrays['M'], arrays['log_survival']
+            return
+        #FSRP and Recalibrated and Refitted FSRP share their input vector
+        self.fsrp_coeffs = np.column_stack([FSRP_COEFFS[sex], RECALIBRATED_FSRP_COEFFS[sex]])
+        self.cox_coeffs = COX_COEFFS[sex]
+        self.M = np.array([FSRP_COEFFS[sex].dot(FSRP_MEANS[sex]),
+                           RECALIBRATED_FSRP_COEFFS[sex].dot(RECALIBRATED_FSRP_MEANS[sex]),
+                           COX_COEFFS[sex].dot(COX_MEANS[sex])])
+
+        #log baseline survival at 3, 6 and 9 years, shape (model, region, year); the FSRP has no regional baseline
+        fsrp_survival = FSRP_BASELINE_SURVIVAL[sex]
+        fsrp_log_survival = np.log([[fsrp_survival[year] for year in SURVIVAL_YEARS]] * len(REGIONS))
+        self.log_survival = np.stack([fsrp_log_survival,
+                                      _regional_log_survival(RECALIBRATED_FSRP_BASELINE_SURVIVAL[sex]),
+                                      _regional_log_survival(COX_BASELINE_SURVIVAL[sex])])
+
+    def to_arrays(self):
+        return {'fsrp_coeffs': self.fsrp_coeffs, 'cox_coeffs': self.cox_coeffs, 'M': self.M,
+                'log_survival': self.log_survival}
+
+    def linear_predictors(self, features, families=PROPORTIONAL_HAZARDS_FAMILIES, changed=None):
+        """Return L - M for each requested model, shape (N, len(families)).
+
+        `changed` lists the feature matrix columns in which rows may differ
+        from the first (see ckb_stroke.linear.linear_predictor).
+        """
+        dtype = features.dtype
+        M = self.M.astype(dtype, copy=False)
+        A = np.empty((len(features), len(families)), dtype=dtype)
+        fsrp_families = [family for family in families if family != 'Cox']
+        if fsrp_families:
+            L = linear_predictor(fsrp_input(features), self.fsrp_coeffs.astype(dtype, copy=False),
+                                 _positions(FSRP_INDEX, changed))
+            for family in fsrp_families:
+                model = PROPORTIONAL_HAZARDS_FAMILIES.index(family)
+                A[:, families.index(family)] = L[:, model]-M[model]
+        if 'Cox' in families:
+            x = features.take(self.cox_index)
+            A[:, families.index('Cox')] = linear_predictor(x, self.cox_coeffs.astype(dtype, copy=False),
+                                                           _positions(self.cox_index, changed))-M[2]
+        return A
+
+    def risks(self, features, families=PROPORTIONAL_HAZARDS_FAMILIES, changed=None):
+        """Return risk estimates of shape (N, len(families), 4) for a FeatureMatrix, horizons in HORIZONS order.
+
+        `changed` is as in linear_predictors.
+        """
+        families = list(families)
+        models = [PROPORTIONAL_HAZARDS_FAMILIES.index(family) for family in families]
+        B = np.exp(self.linear_predictors(features, families, changed))
+        #Gather each row's baseline by region code: (model, N, year) -> (N, model, year)
+        log_survival = self.log_survival.astype(features.dtype, copy=False)[models][:, features.region_codes, :]
+        log_survival = log_survival.transpose(1, 0, 2)
+        #1 - S**B, computed as -expm1(B*log(S))
+        return interval_risks(-np.expm1(B[:, :, np.newaxis]*log_survival))
+
+
+PROPORTIONAL_HAZARDS_KERNELS = {sex: ProportionalHazardsKernel(sex) for sex in SEXES}
+
+
+def proportional_hazards_risk(features, sex, families=PROPORTIONAL_HAZARDS_FAMILIES, registry=None, changed=None):
+    """Return ProportionalHazardsKernel.risks with the kernel of `registry` (the process-wide ModelRegistry by
+    default), which reads its parameters from the model bundle if there is one."""
+    return (registry or get_registry()).proportional_hazards_kernel(sex).risks(features, families, changed)
@@ -0,0 +1,254 @@
+"""Compiled gradient boosted tree ensembles.
+
+Each `Male_GBT_Model_*YrRisk.pkl` is a GradientBoostingClassifier of 1200
+depth-5 regression trees stored as 1200 separate sklearn objects.
+`TreeEnsemble` keeps every tree as a complete binary tree in heap order, in
+three contiguous arrays: split feature and threshold of shape
+(n_trees, 2**max_depth - 1) and leaf value of shape (n_trees, 2**max_depth).
+The children of node k are nodes 2k+1 and 2k+2, so no child pointers are
+stored; leaves above the full depth are padded with splits that always go
+left. All trees are then walked for a block of rows at once, one vectorized
+step per tree level, and `stack_ensembles` joins the four horizon ensembles of
+one sex so that they are scored in the same pass over the input matrix.
+
+Before walking the trees every feature value is replaced by its rank among
+the split thresholds used on that feature, so that each step gathers one
+packed (feature, threshold rank) integer instead of a feature and a float
+threshold. Leaf values are summed in float64, or in float32 for float32 input.
+"""
+
+import numpy as np
+
+from .compiled import CompiledModel
+
+TREE_LEAF = -1
+
+#Complete binary trees take 2**max_depth leaves each
+MAX_DEPTH = 12
+
+#Rows traversed at once, keeping the (rows x trees) index arrays small enough to stay in cache
+BLOCK_SIZE = 32
+
+
+def _float32_floor(threshold):
+    """Round float64 thresholds down to float32, so that x <= threshold is unchanged for float32 x."""
+    threshold32 = threshold.astype(np.float32)
+    rounded_up = threshold32.astype(np.float64) > threshold
+    threshold32[rounded_up] = np.nextafter(threshold32[rounded_up], np.float32(-np.inf))
+    return threshold32
+
+
+def _complete_tree(children_left, children_right, feature, threshold, value, max_depth):
+    """Lay out one sklearn tree as a complete binary tree of depth `max_depth` in heap order."""
+    leaf = children_left == TREE_LEAF
+    #Leaves become splits that always go left, to a copy of themselves
+    left = np.where(leaf, np.arange(len(leaf)), children_left)
+    right = np.where(leaf, np.arange(len(leaf)), children_right)
+    feature = np.where(leaf, 0, feature)
+    threshold = np.where(leaf, np.inf, threshold)
+    nodes = np.zeros(1, dtype=np.intp)
+    level_nodes = []
+    for _ in range(max_depth):
+        level_nodes.append(nodes)
+        nodes = np.column_stack([left[nodes], right[nodes]]).ravel()
+    split_nodes = np.concatenate(level_nodes)
+    return feature[split_nodes], threshold[split_nodes], value[nodes]
+
+
+def _deepen(feature, threshold, value, max_depth):
+    """Pad complete trees of shape (n_trees, 2**depth - 1) to a greater depth."""
+    depth = value.shape[1].bit_length()-1
+    extra = max_depth-depth
+    if extra == 0:
+        return feature, threshold, value
+    n_trees = len(value)
+    feature = np.hstack([feature, np.zeros((n_trees, 2**max_depth-2**depth), dtype=feature.dtype)])
+    threshold = np.hstack([threshold, np.full((n_trees, 2**max_depth-2**depth), np.inf, dtype=threshold.dtype)])
+    #Every old leaf heads a subtree of 2**extra identical leaves
+    return feature, threshold, np.repeat(value, 2**extra, axis=1)
+
+
+class TreeEnsemble(CompiledModel):
+    """Additive tree ensembles with a logistic link, one output per ensemble.
+
+    The trees of output k are rows output_offsets[k]:output_offsets[k+1] of
+    the node arrays. Leaf values are already multiplied by the learning rate.
+    `traversal` is the (levels, cut_points, cut_offsets, rank_bits) of
+    `mapped_arrays`; it is computed from the node arrays if not given.
+    """
+
+    def __init__(self, feature, threshold, value, output_offsets, base_scores, traversal=None):
+        self.feature = np.asarray(feature, dtype=np.int32)
+        self.threshold = np.asarray(threshold, dtype=np.float32)
+        self.value = np.asarray(value, dtype=np.float64)
+        self.output_offsets = np.asarray(output_offsets, dtype=np.int64)
+        self.base_scores = np.asarray(base_scores, dtype=np.float64)
+        self.max_depth = self.value.shape[1].bit_length()-1
+        if self.max_depth > MAX_DEPTH:
+            raise ValueError('Trees deeper than {} levels are not supported'.format(MAX_DEPTH))
+        if traversal is None:
+            self._compile()
+        else:
+            self._attach(*traversal)
+        self._leaf_values = {np.dtype(np.float64): self.value.ravel()}
+
+    def _compile(self):
+        #Sorted split thresholds of each feature, and each node's threshold as a rank among them
+        n_features = int(self.feature.max())+1 if self.feature.size else 0
+        split = np.isfinite(self.threshold)
+        feature, threshold = self.feature[split], self.threshold[split]
+        order = np.lexsort((threshold, feature))
+        feature, threshold = feature[order], threshold[order]
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = (feature[1:] != feature[:-1]) | (threshold[1:] != threshold[:-1])
+        feature_starts = np.searchsorted(feature[first], np.arange(n_features))
+        self.cut_points = np.split(threshold[first], feature_starts[1:])
+        rank_bits = max([len(cut_points) for cut_points in self.cut_points]+[1]).bit_length()+1
+        #Padding splits always go left: their rank is above that of any feature value
+        rank = np.full(self.threshold.shape, 2**rank_bits-1, dtype=np.int64)
+        split_rank = np.empty(len(order), dtype=np.int64)
+        split_rank[order] = np.cumsum(first)-1-feature_starts[feature]
+        rank[split] = split_rank
+        packed = (self.feature.astype(np.int64) << rank_bits) | rank
+        if packed.max(initial=0) >= 2**31:
+            raise ValueError('Too many features or split thresholds to compile')
+        self._rank_bits = rank_bits
+        self._levels = [packed[:, 2**d-1:2**(d+1)-1].astype(np.int32).ravel() for d in range(self.max_depth)]
+
+    def _attach(self, levels, cut_points, cut_offsets, rank_bits):
+        #The packed levels of all trees one after another, level d taking n_trees*2**d entries from n_trees*(2**d-1)
+        n_trees = len(self.value)
+        self._levels = [levels[n_trees*(2**d-1):n_trees*(2**(d+1)-1)] for d in range(self.max_depth)]
+        self.cut_points = [cut_points[start:end] for start, end in zip(cut_offsets[:-1], cut_offsets[1:])]
+        self._rank_bits = int(rank_bits)
+
+    def leaf_values(self, dtype=np.float64):
+        """Return the flat leaf values as `dtype`, converted once."""
+        dtype = np.dtype(dtype)
+        if dtype not in self._leaf_values:
+            self._leaf_values[dtype] = self.value.ravel().astype(dtype)
+        return self._leaf_values[dtype]
+
+    @property
+    def n_outputs(self):
+        return len(self.base_scores)
+
+    @property
+    def nbytes(self):
+        return self.feature.nbytes+self.threshold.nbytes+self.value.nbytes
+
+    def feature_ranks(self, x):
+        """Replace each feature value by the number of that feature's split thresholds below it."""
+        #sklearn compares float32 features with the split thresholds
+        x = np.asarray(x, dtype=np.float32)
+        ranks = np.zeros((len(x), x.shape[1]), dtype=np.int32)
+        for k, cut_points in enumerate(self.cut_points):
+            if len(cut_points):
+                ranks[:, k] = np.searchsorted(cut_points, x[:, k])
+        return ranks
+
+    def leaves(self, ranks):
+        """Return the flat index into `value` of the leaf reached in every tree by each row of `ranks`."""
+        n_rows, n_features = ranks.shape
+        n_trees = len(self.value)
+        row_offsets = (np.arange(n_rows, dtype=np.int32)*n_features)[:, np.newaxis]
+        flat_ranks = ranks.ravel()
+        rank_mask = 2**self._rank_bits-1
+        #Index of the current node within its level, over all trees: tree*2**d + position
+        nodes = np.broadcast_to(np.arange(n_trees, dtype=np.int32), (n_rows, n_trees))
+        for level in self._levels:
+            packed = np.take(level, nodes)
+            go_right = np.take(flat_ranks, (packed >> self._rank_bits)+row_offsets) > (packed & rank_mask)
+            nodes = 2*nodes+go_right
+        return nodes
+
+    def decision_function(self, x):
+        """Return the log-odds of each output for unscaled risk factors, shape (N, n_outputs)."""
+        dtype = np.float32 if np.asarray(x).dtype == np.float32 else np.float64
+        ranks = self.feature_ranks(x)
+        values = self.leaf_values(dtype)
+        raw = np.empty((len(ranks), self.n_outputs), dtype=dtype)
+        for start in range(0, len(ranks), BLOCK_SIZE):
+            leaf_values = np.take(values, self.leaves(ranks[start:start+BLOCK_SIZE]))
+            raw[start:start+BLOCK_SIZE] = np.add.reduceat(leaf_values, self.output_offsets[:-1], axis=1)
+        return raw+self.base_scores.astype(dtype)
+
+    def predict_proba(self, x):
+        """Return the stroke risk of each output for unscaled risk factors, shape (N, n_outputs)."""
+        return 1/(1+np.exp(-self.decision_function(x)))
+
+    def to_arrays(self):
+        return {'feature': self.feature, 'threshold': self.threshold, 'value': self.value,
+                'output_offsets': self.output_offsets, 'base_scores': self.base_scores}
+
+    def mapped_arrays(self):
+        #The traversal arrays too, so that ensembles built on a mapping do not compile their own copies
+        arrays = self.to_arrays()
+        arrays.update({
+            'levels': np.concatenate([np.empty(0, dtype=np.int32)]+self._levels),
+            'cut_points': np.concatenate([np.empty(0, dtype=np.float32)]+self.cut_points),
+            'cut_offsets': np.cumsum([0]+[len(cut_points) for cut_points in self.cut_points]),
+            'rank_bits': np.array(self._rank_bits),
+        })
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        traversal = None
+        if 'levels' in arrays:
+            traversal = (arrays['levels'], arrays['cut_points'], arrays['cut_offsets'], arrays['rank_bits'])
+        return cls(arrays['feature'], arrays['threshold'], arrays['value'], arrays['output_offsets'],
+                   arrays['base_scores'], traversal)
+
+    @classmethod
+    def from_sklearn(cls, classifier):
+        """Compile a fitted binary GradientBoostingClassifier with the default (prior) or zero initial model."""
+        if getattr(classifier, 'n_classes_', 2) != 2:
+            raise ValueError('Only binary GradientBoostingClassifier models can be compiled')
+        trees = [estimator.tree_ for estimator in classifier.estimators_[:, 0]]
+        max_depth = max(tree.max_depth for tree in trees)
+        if max_depth > MAX_DEPTH:
+            raise ValueError('Trees deeper than {} levels are not supported'.format(MAX_DEPTH))
+        feature, threshold, value = [], [], []
+        for tree in trees:
+            if hasattr(tree, 'children_left'):
+                nodes = (tree.children_left, tree.children_right, tree.feature, tree.threshold, tree.value)
+            else:
+                #Tree state as pickled: a structured array of nodes and an array of node values
+                nodes = (tree.nodes['left_child'], tree.nodes['right_child'], tree.nodes['feature'],
+                         tree.nodes['threshold'], tree.values)
+            children_left, children_right, tree_feature, tree_threshold, tree_value = nodes
+            tree_value = classifier.learning_rate*np.asarray(tree_value).reshape(len(children_left))
+            tree_nodes = _complete_tree(children_left, children_right, tree_feature, tree_threshold, tree_value,
+                                        max_depth)
+            feature.append(tree_nodes[0])
+            threshold.append(tree_nodes[1])
+            value.append(tree_nodes[2])
+
+        init = classifier.init_
+        if isinstance(init, str) and init == 'zero':
+            base_score = 0.0
+        elif hasattr(init, 'class_prior_'):
+            #As BinomialDeviance.get_init_raw_predictions
+            eps = np.finfo(np.float32).eps
+            p = np.clip(init.class_prior_[1], eps, 1-eps)
+            base_score = np.log(p/(1-p))
+        else:
+            raise ValueError('Unsupported initial model {!r}'.format(init))
+
+        return cls(np.array(feature), _float32_floor(np.array(threshold)), np.array(value), [0, len(trees)],
+                   [base_score])
+
+
+def stack_ensembles(ensembles):
+    """Join several compiled ensembles (e.g. the four horizons of one sex) into one with all their outputs."""
+    max_depth = max(ensemble.max_depth for ensemble in ensembles)
+    trees = [_deepen(ensemble.feature, ensemble.threshold, ensemble.value, max_depth) for ensemble in ensembles]
+    tree_offsets = np.cumsum([0]+[len(ensemble.value) for ensemble in ensembles])
+    return TreeEnsemble(
+        np.vstack([feature for feature, _, _ in trees]),
+        np.vstack([threshold for _, threshold, _ in trees]),
+        np.vstack([value for _, _, value in trees]),
+        np.concatenate([ensemble.output_offsets[:-1]+offset for ensemble, offset in zip(ensembles, tree_offsets)]
+                       + [tree_offsets[-1:]]),
+        np.concatenate([ensemble.base_scores for ensemble in ensembles]))
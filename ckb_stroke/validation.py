@@ -0,0 +1,226 @@
+"""Vectorized validation of raw risk factors.
+
+The notebook's input cell documents every risk factor in a comment, but
+nothing checks the values entered. `validate` checks a whole table of raw
+risk factors against those comments with array operations, one pass per
+rule rather than one per individual:
+
+    type        every risk factor apart from region is a number, NaN or 'Missing'
+    range       indicators (0: no, 1: yes) are 0 or 1, counts (children,
+                siblings_stroke, ...) are whole numbers, and continuous
+                risk factors lie within RANGES
+    one-hot     each group such as highest_education_0..5, occupation_0..9 or
+                gum_bleed_freq_0..3 has exactly one 1, or is missing entirely
+                (its values are then all imputed)
+    region      one of the ten CKB regions
+    sex         'Male' or 'Female', when given or in a sex column
+
+The result holds a per-row error mask for every risk factor and one-hot
+group, so invalid rows can be quarantined and the rest scored:
+
+    report = validate(raw_df)
+    valid_df, quarantined_df = report.split(raw_df)
+    risk_df = score_cohort(valid_df)
+
+Missing columns are an error of the whole table and raise ValueError.
+"""
+
+import re
+
+import numpy as np
+import pandas as pd
+
+from .metrics import METRICS
+from .parameters import RAW_COLUMN_NAMES, REGIONS, SEXES
+from .preprocessing import MISSING
+
+#Bounds of the continuous risk factors, in the units of the input cell, wide enough for any plausible adult
+RANGES = {
+    'age': (18, 120),
+    'sbp_mean': (50, 300),
+    'years_since_quitting_smoking': (0, 100),
+    'met': (0, 200),
+    'met_hours': (0, 24),
+    'standing_height_cm': (100, 250),
+    'sitting_height_cm': (40, 150),
+    'waist_cm': (30, 250),
+    'waist_hip_ratio_percent': (30, 200),
+    'weight_kg': (20, 300),
+    'bmi_calc': (8, 80),
+    'fat_percent': (0, 100),
+    'dbp_mean': (20, 200),
+    'heart_rate_mean_10s': (2, 25),
+}
+
+#Risk factors entered as a number of people or events
+COUNT_COLUMNS = ['household_size', 'blood_transfusions', 'children', 'siblings', 'siblings_stroke',
+                 'siblings_diabetes', 'siblings_heart_attack', 'siblings_cancer', 'children_stroke',
+                 'children_heart_attack', 'children_diabetes', 'children_cancer']
+
+#Every other numeric risk factor is an indicator
+NUMERIC_COLUMNS = [column for column in RAW_COLUMN_NAMES if column != 'region']
+INDICATOR_COLUMNS = [column for column in NUMERIC_COLUMNS if column not in RANGES and column not in COUNT_COLUMNS]
+
+
+def _one_hot_groups(columns):
+    groups = {}
+    for column in columns:
+        match = re.match(r'(.+)_\d+$', column)
+        if match:
+            groups.setdefault(match.group(1), []).append(column)
+    return {prefix: group for prefix, group in groups.items() if len(group) > 1}
+
+
+#One-hot groups by prefix, e.g. 'occupation': ['occupation_0', ..., 'occupation_9']
+ONE_HOT_GROUPS = _one_hot_groups(INDICATOR_COLUMNS)
+
+##########################################################################################################
+#COMPILED SCHEMA
+
+#The numeric risk factors are read in blocks of one rule each: indicators (with the one-hot groups as
+#contiguous runs), counts, then ranged risk factors
+_SCHEMA_COLUMNS = INDICATOR_COLUMNS + COUNT_COLUMNS + list(RANGES)
+_N_INDICATORS = len(INDICATOR_COLUMNS)
+_N_WHOLE = _N_INDICATORS+len(COUNT_COLUMNS)
+_LOW = np.array([low for low, _ in RANGES.values()], dtype=np.float64)
+_HIGH = np.array([high for _, high in RANGES.values()], dtype=np.float64)
+_GROUP_SLICES = [slice(INDICATOR_COLUMNS.index(group[0]), INDICATOR_COLUMNS.index(group[-1])+1)
+                 for group in ONE_HOT_GROUPS.values()]
+
+#Error mask columns: sex, region, the numeric risk factors in input order, then the one-hot groups
+GROUP_ERROR_COLUMNS = ['{}_*'.format(prefix) for prefix in ONE_HOT_GROUPS]
+ERROR_COLUMNS = ['sex', 'region'] + NUMERIC_COLUMNS + GROUP_ERROR_COLUMNS
+_ERROR_ORDER = np.concatenate([[0, 1], 2+np.array([_SCHEMA_COLUMNS.index(column) for column in NUMERIC_COLUMNS]),
+                               2+len(_SCHEMA_COLUMNS)+np.arange(len(ONE_HOT_GROUPS))])
+
+
+def _numeric_values(raw_df):
+    """Return the numeric risk factors, in _SCHEMA_COLUMNS order, as a float64 matrix with NaN for missing values,
+    and a mask of the entries that are neither numbers nor missing (None if there are none)."""
+    numeric_df = raw_df[_SCHEMA_COLUMNS]
+    non_numeric = [k for k, dtype in enumerate(numeric_df.dtypes) if not pd.api.types.is_numeric_dtype(dtype)]
+    if not non_numeric:
+        return numeric_df.to_numpy(dtype=np.float64), None
+    x = np.empty((len(raw_df), len(_SCHEMA_COLUMNS)))
+    wrong_type = np.zeros(x.shape, dtype=bool)
+    for k, column in enumerate(_SCHEMA_COLUMNS):
+        values = numeric_df[column]
+        if k in non_numeric:
+            given = values.notna().to_numpy() & (values != MISSING).to_numpy()
+            values = pd.to_numeric(values.mask(values == MISSING), errors='coerce')
+            wrong_type[:, k] = given & values.isna().to_numpy()
+        x[:, k] = values.to_numpy(dtype=np.float64)
+    return x, wrong_type
+
+
+def validate(raw_df, sex=None):
+    """Check every row of raw risk factors, returning a ValidationReport.
+
+    `sex` is checked as in score_cohort: one value for the table, one per
+    row, or by default the 'sex' column of `raw_df` if there is one.
+    """
+    absent = [column for column in RAW_COLUMN_NAMES if column not in raw_df.columns]
+    if absent:
+        raise ValueError('Missing risk factor columns: {}'.format(', '.join(absent)))
+    with METRICS.timer('validation'):
+        n_rows = len(raw_df)
+        x, wrong_type = _numeric_values(raw_df)
+        errors = np.empty((n_rows, 2+len(_SCHEMA_COLUMNS)+len(ONE_HOT_GROUPS)), dtype=bool)
+
+        if sex is None and 'sex' in raw_df:
+            sex = raw_df['sex'].to_numpy()
+        if sex is None:
+            errors[:, 0] = False
+        elif isinstance(sex, str):
+            errors[:, 0] = sex not in SEXES
+        else:
+            sex = np.asarray(sex, dtype=object)
+            if len(sex) != n_rows:
+                raise ValueError('Got {} sexes for {} rows'.format(len(sex), n_rows))
+            errors[:, 0] = ~np.isin(sex, SEXES)
+        errors[:, 1] = ~np.isin(raw_df['region'].to_numpy(), REGIONS)
+
+        #NaN (missing) passes every check below
+        value_errors = errors[:, 2:2+len(_SCHEMA_COLUMNS)]
+        indicators = x[:, :_N_INDICATORS]
+        is_one = indicators == 1
+        np.logical_and(indicators != 0, ~is_one, out=value_errors[:, :_N_INDICATORS])
+        counts = x[:, _N_INDICATORS:_N_WHOLE]
+        np.logical_or(counts < 0, counts != np.floor(counts), out=value_errors[:, _N_INDICATORS:_N_WHOLE])
+        ranged = x[:, _N_WHOLE:]
+        np.logical_or(ranged < _LOW, ranged > _HIGH, out=value_errors[:, _N_WHOLE:])
+        missing = np.isnan(x)
+        value_errors[:, :_N_WHOLE] &= ~missing[:, :_N_WHOLE]
+        if wrong_type is not None:
+            value_errors |= wrong_type
+
+        #A one-hot group is valid with exactly one 1 and no missing value, or with every value missing
+        for k, group in enumerate(_GROUP_SLICES):
+            n_missing = missing[:, group].sum(axis=1)
+            errors[:, 2+len(_SCHEMA_COLUMNS)+k] = np.where(n_missing == 0, is_one[:, group].sum(axis=1) != 1,
+                                                           n_missing != group.stop-group.start)
+    return ValidationReport(pd.DataFrame(errors[:, _ERROR_ORDER], index=raw_df.index, columns=ERROR_COLUMNS))
+
+
+def _describe(column):
+    if column == 'sex':
+        return "sex: not 'Male' or 'Female'"
+    if column == 'region':
+        return 'region: not one of {}'.format(', '.join(REGIONS))
+    if column in GROUP_ERROR_COLUMNS:
+        group = ONE_HOT_GROUPS[column[:-2]]
+        return '{}: not exactly one of {}..{} is 1'.format(column, group[0], group[-1])
+    if column in INDICATOR_COLUMNS:
+        return '{}: not 0 or 1'.format(column)
+    if column in COUNT_COLUMNS:
+        return '{}: not a whole number of at least 0'.format(column)
+    return '{}: not a number from {} to {}'.format(column, *RANGES[column])
+
+
+class ValidationReport:
+    """Per-row results of `validate`.
+
+    `errors` is a boolean DataFrame with the index of the validated table and
+    one column per check: sex, region, each numeric risk factor, and each
+    one-hot group (named after its prefix, e.g. 'occupation_*').
+    """
+
+    def __init__(self, errors):
+        self.errors = errors
+        self.invalid = errors.to_numpy().any(axis=1)
+
+    @property
+    def valid(self):
+        return ~self.invalid
+
+    @property
+    def n_invalid(self):
+        return int(self.invalid.sum())
+
+    def split(self, raw_df):
+        """Return the valid and the invalid rows of the validated table."""
+        return raw_df.iloc[np.flatnonzero(self.valid)], raw_df.iloc[np.flatnonzero(self.invalid)]
+
+    def row_messages(self):
+        """Return the error messages of each invalid row, in row order."""
+        columns = np.array(self.errors.columns)
+        return [[_describe(column) for column in columns[row]]
+                for row in self.errors.to_numpy()[np.flatnonzero(self.invalid)]]
+
+    def messages(self):
+        """Return {row label: [error messages]} for the invalid rows.
+
+        Rows are found by position, but invalid rows sharing a label share one
+        entry; row_messages keeps every row.
+        """
+        labels = self.errors.index[np.flatnonzero(self.invalid)]
+        messages = {}
+        for label, row_messages in zip(labels, self.row_messages()):
+            messages.setdefault(label, []).extend(row_messages)
+        return messages
+
+    def quarantined(self, raw_df):
+        """Return the invalid rows of the validated table with an 'errors' column of their error messages."""
+        quarantined_df = raw_df.iloc[np.flatnonzero(self.invalid)].copy()
+        quarantined_df['errors'] = ['; '.join(messages) for messages in self.row_messages()]
+        return quarantined_df
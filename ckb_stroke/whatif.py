@@ -0,0 +1,95 @@
+"""Counterfactual ("what if") scoring of one individual.
+
+`what_if` scores a base individual together with a list of perturbations of
+their raw risk factors, e.g. how 9-year risk moves if sbp_mean drops by 10
+mmHg or smoking_category_4 goes to 0:
+
+    what_if(base, 'Male', [{'sbp_mean': base['sbp_mean']-10}, {'smoking_category_4': 0}])
+    sensitivity_curve(base, 'Male', 'sbp_mean', np.linspace(100, 180, 50))
+
+The base and every perturbed copy are derived and imputed as one batch. The
+input vector columns that the perturbed risk factors feed (see
+preprocessing.dependent_columns) are the only ones in which the copies can
+differ from the base, so the linear predictor models (FSRP, Recalibrated and
+Refitted FSRP, CKB Cox and compiled LR) compute the base's linear predictor
+once and add each copy's change over those columns only. SVM, GBT, MLP and
+RSF score all rows in one batched call (see scoring.score_features).
+"""
+
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from . import models
+from .parameters import HORIZONS, MODEL_FAMILIES, RAW_COLUMN_NAMES
+from .preprocessing import dependent_columns, derive_features, impute_missing_values
+from .registry import get_registry
+from .scoring import ML_FAMILIES, result_columns, score_features, sex_partitions
+from .survival import PROPORTIONAL_HAZARDS_FAMILIES, proportional_hazards_risk
+
+
+def perturbed_cohort(base, perturbations):
+    """Return the raw risk factors of `base` followed by one copy of them per perturbation.
+
+    `base` is a dict, Series or one-row DataFrame of raw risk factors and
+    each perturbation a dict of new values for some of them.
+    """
+    if isinstance(base, pd.DataFrame):
+        if len(base) != 1:
+            raise ValueError('The base individual must be a single row, got {}'.format(len(base)))
+        base = base.iloc[0]
+    base = dict(base)
+    for row, changes in enumerate(perturbations, start=1):
+        unknown = [column for column in changes if column not in RAW_COLUMN_NAMES]
+        if unknown:
+            raise ValueError('Unknown risk factors in perturbation {}: {}'.format(row, ', '.join(unknown)))
+    #The base row repeated, with only the perturbed columns built value by value
+    raw_df = pd.DataFrame([base]).take(np.zeros(len(perturbations)+1, dtype=np.intp)).reset_index(drop=True)
+    for column in dict.fromkeys(column for changes in perturbations for column in changes):
+        raw_df[column] = [base.get(column, np.nan)] + [changes.get(column, base.get(column, np.nan))
+                                                       for changes in perturbations]
+    return raw_df
+
+
+def what_if(base, sex, perturbations, families=None, registry=None):
+    """Score `base` and each of `perturbations` of it (see perturbed_cohort).
+
+    Returns (model, horizon) risk estimates with the base individual in row
+    0 and perturbation i in row i, as score_cohort would for the perturbed
+    cohort.
+    """
+    if not isinstance(sex, str):
+        raise ValueError("sex must be 'Male' or 'Female', got {!r}".format(sex))
+    _, partitions = sex_partitions(sex, len(perturbations)+1)
+    families = list(MODEL_FAMILIES if families is None else families)
+    unknown = [family for family in families if family not in MODEL_FAMILIES]
+    if unknown:
+        raise ValueError('Unknown model families: {}'.format(', '.join(unknown)))
+    registry = registry or get_registry()
+
+    features, _ = impute_missing_values(derive_features(perturbed_cohort(base, perturbations)), sex, inplace=True)
+    changed = dependent_columns({column for changes in perturbations for column in changes})
+    risks = np.full((len(features), len(families), len(HORIZONS)), np.nan)
+    proportional_hazards_families = [family for family in families if family in PROPORTIONAL_HAZARDS_FAMILIES]
+    if proportional_hazards_families:
+        risks[:, [families.index(family) for family in proportional_hazards_families]] = \
+            proportional_hazards_risk(features, sex, proportional_hazards_families, registry, changed)
+    if 'LR' in families:
+        try:
+            risks[:, families.index('LR')] = models.lr_risk(features, sex, registry, changed)
+        except FileNotFoundError as error:
+            warnings.warn('No trained LR model for {} ({}); its risks are NaN'.format(sex, error))
+    batched_families = [family for family in families if family in ML_FAMILIES and family != 'LR']
+    if batched_families:
+        risks[:, [families.index(family) for family in batched_families]] = \
+            score_features(features, partitions, batched_families, registry)
+
+    return pd.DataFrame(risks.reshape(len(risks), len(families)*len(HORIZONS)), columns=result_columns(families))
+
+
+def sensitivity_curve(base, sex, column, values, families=None, registry=None):
+    """Score `base` with the raw risk factor `column` set to each of `values`, indexed by the values."""
+    risk_df = what_if(base, sex, [{column: value} for value in values], families, registry).iloc[1:]
+    risk_df.index = pd.Index(values, name=column)
+    return risk_df
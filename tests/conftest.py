@@ -0,0 +1,65 @@
+"""Shared inputs: the notebook's sample individual, variations on it and synthetic cohorts with missing values."""
+
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from ckb_stroke.benchmark import synthetic_cohort
+from ckb_stroke.parameters import RAW_COLUMN_NAMES, REGIONS, SEXES
+from ckb_stroke.preprocessing import MISSING
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+NOTEBOOK_SCRIPT = os.path.join(REPO_DIR, 'Run Models for External Validation.py')
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+
+
+def notebook_inputs():
+    """Return the values of the notebook's input cell, from `sex = ...` to the last risk factor, as a dict."""
+    with open(NOTEBOOK_SCRIPT) as f:
+        lines = f.read().splitlines()
+    start = next(i for i, line in enumerate(lines) if line.startswith('sex = '))
+    end = next(i for i, line in enumerate(lines) if i > start and line.startswith('# In the following cell'))
+    inputs = {}
+    exec('\n'.join(lines[start:end]), {}, inputs)
+    return inputs
+
+
+def notebook_individual(**changes):
+    """Return the notebook's sample individual as a one-row table of raw risk factors, with `changes` applied."""
+    inputs = notebook_inputs()
+    inputs.update(changes)
+    return pd.DataFrame([[inputs[column] for column in RAW_COLUMN_NAMES]], columns=RAW_COLUMN_NAMES)
+
+
+def varied_individuals(n, seed=0, sex=None):
+    """Return `n` copies of the notebook's sample individual with random ages, blood pressures and regions.
+
+    Without `sex`, a 'sex' column gives each row a random sex.
+    """
+    rng = np.random.default_rng(seed)
+    raw_df = pd.concat([notebook_individual()]*n, ignore_index=True)
+    raw_df['age'] = rng.uniform(30, 79, n)
+    raw_df['sbp_mean'] = rng.uniform(90, 200, n)
+    raw_df['region'] = rng.choice(REGIONS, n)
+    if sex is None:
+        raw_df.insert(0, 'sex', rng.choice(SEXES, n))
+    return raw_df
+
+
+def mixed_cohort(n, seed=0, missing_fraction=0.1):
+    """Return `n` synthetic individuals of both sexes, interleaved, with a 'sex' column and some 'Missing' values."""
+    rng = np.random.default_rng(seed)
+    raw_df = pd.concat([synthetic_cohort(n-n//2, SEXES[0], seed), synthetic_cohort(n//2, SEXES[1], seed+1)],
+                       ignore_index=True)
+    raw_df.insert(0, 'sex', [SEXES[0]]*(n-n//2) + [SEXES[1]]*(n//2))
+    raw_df = raw_df.iloc[rng.permutation(n)].reset_index(drop=True)
+    for column in ['sbp_mean', 'bmi_calc', 'met', 'household_size']:
+        raw_df[column] = raw_df[column].astype(object).mask(rng.random(n) < missing_fraction, MISSING)
+    return raw_df
+
+
+@pytest.fixture
+def cohort():
+    return mixed_cohort(60)
@@ -0,0 +1,81 @@
+"""The model bundle and the compiled logistic regressions it completes, against the .npz files and pickles."""
+
+import glob
+import os
+import pickle
+
+import numpy as np
+import pytest
+
+from ckb_stroke.bundle import BUNDLE_FORMAT_VERSION, Bundle, write_bundle
+from ckb_stroke.export import EXPORTERS, export_models
+from ckb_stroke.linear import LogisticModel
+from ckb_stroke.parameters import HORIZONS
+from ckb_stroke.registry import BUNDLE_FILE_NAME, MODEL_DIR, STACKED, ModelRegistry, compiled_file_name
+from ckb_stroke.scoring import score_cohort
+
+from conftest import varied_individuals
+
+SEX = 'Male'
+HORIZON = '9yr'
+#RSF needs R and the .rds files, which are not in the repository
+FAMILIES = ['FSRP', 'Recalibrated_Refitted_FSRP', 'Cox', 'LR', 'SVM', 'GBT', 'MLP']
+COMPILED_FILES = sorted(glob.glob(os.path.join(MODEL_DIR, '*_Model*.npz')))
+
+
+def test_lr_compiles_from_pickle():
+    pytest.importorskip('sklearn')
+    with open(ModelRegistry().path(SEX, 'LR', HORIZON), 'rb') as f:
+        original = pickle.load(f)
+    compiled = EXPORTERS['LR'](ModelRegistry(use_bundle=False), SEX, HORIZON)
+    x = np.random.default_rng(0).random((200, len(compiled.coef)))
+    np.testing.assert_allclose(compiled.predict_proba(x), original.predict_proba(x)[:, 1], rtol=1e-12)
+    shipped = LogisticModel.load(os.path.join(MODEL_DIR, compiled_file_name(SEX, 'LR', HORIZON)))
+    np.testing.assert_allclose(compiled.predict_proba(x), shipped.predict_proba(x), rtol=1e-12)
+
+
+def test_exported_lrs_score_as_shipped(tmp_path):
+    pytest.importorskip('sklearn')
+    written = export_models(['LR'], out_dir=str(tmp_path))
+    assert len(written) == 2*len(HORIZONS)
+    raw_df = varied_individuals(50, sex=SEX)
+    exported = score_cohort(raw_df, SEX, families=['LR'], registry=ModelRegistry(str(tmp_path)))
+    assert not exported.isna().any().any()
+    shipped = score_cohort(raw_df, SEX, families=['LR'], registry=ModelRegistry(use_bundle=False))
+    np.testing.assert_allclose(exported.to_numpy(), shipped.to_numpy(), rtol=1e-12)
+
+
+def test_bundle_scores_as_compiled_files(tmp_path):
+    path = str(tmp_path / BUNDLE_FILE_NAME)
+    keys = write_bundle(path, ModelRegistry(use_bundle=False))
+    bundle = Bundle(path)
+    assert sorted(bundle.keys(), key=str) == sorted(keys, key=str)
+    assert len([key for key in keys if key[2] != STACKED]) == len(COMPILED_FILES)
+    assert (SEX, 'GBT', STACKED) in bundle and (SEX, 'MLP', STACKED) in bundle
+
+    #The bundle is the only file in tmp_path, so every model is read from it
+    raw_df = varied_individuals(100, sex=SEX)
+    bundled = score_cohort(raw_df, SEX, families=FAMILIES, registry=ModelRegistry(str(tmp_path)))
+    assert not bundled.isna().any().any()
+    compiled = score_cohort(raw_df, SEX, families=FAMILIES, registry=ModelRegistry(use_bundle=False))
+    np.testing.assert_array_equal(bundled.to_numpy(), compiled.to_numpy())
+
+
+def test_bundled_parameters_are_views_of_the_mapping(tmp_path):
+    write_bundle(str(tmp_path / BUNDLE_FILE_NAME), ModelRegistry(use_bundle=False), families=['GBT', 'MLP'])
+    registry = ModelRegistry(str(tmp_path))
+    kernel, gbt = registry.proportional_hazards_kernel(SEX), registry.stacked(SEX, 'GBT')
+    arrays = list(kernel.to_arrays().values()) + gbt._levels + gbt.cut_points + registry.stacked(SEX, 'MLP').kernels
+    assert not any(array.flags.owndata for array in arrays)
+    np.testing.assert_array_equal(kernel.log_survival, ModelRegistry(use_bundle=False).proportional_hazards_kernel(
+        SEX).log_survival)
+
+
+def test_bundle_rejects_other_format_versions(tmp_path):
+    path = str(tmp_path / BUNDLE_FILE_NAME)
+    write_bundle(path, ModelRegistry(use_bundle=False), families=['LR'])
+    with open(path, 'r+b') as f:
+        f.seek(8)
+        f.write(np.uint32(BUNDLE_FORMAT_VERSION+1).tobytes())
+    with pytest.raises(ValueError, match='format version'):
+        Bundle(path)
@@ -0,0 +1,91 @@
+"""The score command: explicitly requested models must exist, and missing optional backends are clean errors."""
+
+import importlib.util
+import os
+import subprocess
+import sys
+
+import pandas as pd
+import pytest
+
+from ckb_stroke.cli import main
+
+from conftest import notebook_individual
+
+
+@pytest.fixture
+def cohort_csv(tmp_path):
+    path = tmp_path / 'cohort.csv'
+    pd.concat([notebook_individual()]*3, ignore_index=True).to_csv(path, index=False)
+    return str(path)
+
+
+def test_score(cohort_csv, tmp_path):
+    output = str(tmp_path / 'risks.csv')
+    main(['score', cohort_csv, '--sex', 'Female', '--models', 'fsrp,lr', '-o', output])
+    risk_df = pd.read_csv(output, index_col=0)
+    assert len(risk_df) == 3 and risk_df.notna().all().all()
+
+
+def test_default_models_leave_missing_ones_nan(cohort_csv, tmp_path):
+    output = str(tmp_path / 'risks.csv')
+    main(['score', cohort_csv, '--sex', 'Female', '-o', output])
+    risk_df = pd.read_csv(output, index_col=0)
+    assert risk_df.filter(like='GBT_').isna().all().all()
+    assert risk_df.filter(like='LR_').notna().all().all()
+
+
+@pytest.mark.parametrize('chunk_size', [[], ['--chunk-size', '2']])
+def test_requested_missing_model_is_an_error(cohort_csv, tmp_path, capsys, chunk_size):
+    with pytest.raises(SystemExit) as exit_info:
+        main(['score', cohort_csv, '--sex', 'Female', '--models', 'fsrp,gbt', '-o', str(tmp_path / 'risks.csv')]
+             + chunk_size)
+    assert exit_info.value.code == 2
+    assert 'ckb-stroke: error: No trained GBT model for Female' in capsys.readouterr().err
+
+
+@pytest.mark.skipif(importlib.util.find_spec('pyarrow') is not None, reason='pyarrow is installed')
+@pytest.mark.parametrize('chunk_size', [[], ['--chunk-size', '2']])
+def test_parquet_output_without_pyarrow(cohort_csv, tmp_path, capsys, chunk_size):
+    with pytest.raises(SystemExit) as exit_info:
+        main(['score', cohort_csv, '--sex', 'Female', '-o', str(tmp_path / 'risks.parquet')] + chunk_size)
+    assert exit_info.value.code == 2
+    assert 'ckb-stroke: error: Parquet output requires pyarrow' in capsys.readouterr().err
+
+
+@pytest.mark.skipif(importlib.util.find_spec('pyarrow') is not None, reason='pyarrow is installed')
+@pytest.mark.parametrize('chunk_size', [[], ['--chunk-size', '2']])
+def test_parquet_input_without_pyarrow(tmp_path, capsys, chunk_size):
+    path = tmp_path / 'cohort.parquet'
+    path.write_bytes(b'PAR1')
+    with pytest.raises(SystemExit):
+        main(['score', str(path), '--sex', 'Female', '-o', str(tmp_path / 'risks.csv')] + chunk_size)
+    assert 'ckb-stroke: error: Parquet input requires pyarrow' in capsys.readouterr().err
+
+
+def test_serve_usage_names_the_command(capsys):
+    with pytest.raises(SystemExit):
+        main(['serve', '--help'])
+    assert capsys.readouterr().out.startswith('usage: ckb-stroke serve')
+
+
+@pytest.mark.parametrize('command', [['score', 'cohort.csv'], ['serve']])
+def test_empty_model_dir_is_an_error(tmp_path, capsys, command):
+    with pytest.raises(SystemExit) as exit_info:
+        main(command + ['--model-dir', str(tmp_path)])
+    assert exit_info.value.code == 2
+    assert 'error: No trained models in {}'.format(tmp_path) in capsys.readouterr().err
+
+
+def test_proportional_hazards_need_no_model_dir(cohort_csv, tmp_path):
+    output = str(tmp_path / 'risks.csv')
+    main(['score', cohort_csv, '--sex', 'Female', '--models', 'fsrp,cox', '--model-dir', str(tmp_path), '-o', output])
+    assert pd.read_csv(output, index_col=0).notna().all().all()
+
+
+def test_model_dir_from_environment(tmp_path):
+    code = 'from ckb_stroke.registry import MODEL_DIR; print(MODEL_DIR)'
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True,
+                            env=dict(os.environ, CKB_STROKE_MODEL_DIR=str(tmp_path)),
+                            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    assert result.stdout.strip() == str(tmp_path)
@@ -0,0 +1,108 @@
+"""SurvivalForest against a small synthetic forest in ranger's layout, with survival computed by hand."""
+
+import numpy as np
+import pytest
+
+from ckb_stroke.forest import SurvivalForest
+from ckb_stroke.parameters import ML_COLUMN_NAMES
+
+YEARS = [3, 6, 9]
+DEATH_TIMES = [1.0, 3.0, 4.0, 6.0, 9.0, 10.0]
+
+#Cumulative hazard of each terminal node at DEATH_TIMES
+CHF = {
+    'a': [0.01, 0.02, 0.03, 0.05, 0.08, 0.10],
+    'b': [0.02, 0.05, 0.07, 0.10, 0.20, 0.25],
+    'c': [0.00, 0.01, 0.01, 0.02, 0.04, 0.05],
+    'd': [0.03, 0.06, 0.08, 0.12, 0.18, 0.30],
+    'e': [0.01, 0.03, 0.04, 0.07, 0.09, 0.11],
+}
+
+
+class FakeRObject:
+    """Stands in for an rpy2 list, answering rx2(name) from a dict."""
+
+    def __init__(self, **items):
+        self.items = items
+
+    def rx2(self, name):
+        return self.items[name]
+
+
+def ranger_model():
+    """A two-tree ranger survival forest, in the layout of ranger_model$forest.
+
+    The variables are in a different order from ML_COLUMN_NAMES, and the
+    region indicator is named after the region only, as in training.
+    Node IDs are 0-based, terminal nodes have children 0 and 0, and their
+    split variable and value are 0.
+    """
+    variable_names = ['Gansu', 'age_at_study_date']
+    #Tree 1: age <= 5.5 -> a, else b
+    tree_1 = {'children': [[1, 0, 0], [2, 0, 0]], 'var_ids': [1, 0, 0], 'values': [5.5, 0, 0],
+              'chf': [[], CHF['a'], CHF['b']]}
+    #Tree 2: Gansu <= 0.5 -> (age <= 6.5 -> c, else d), else e
+    tree_2 = {'children': [[1, 3, 0, 0, 0], [2, 4, 0, 0, 0]], 'var_ids': [0, 1, 0, 0, 0],
+              'values': [0.5, 6.5, 0, 0, 0], 'chf': [[], [], CHF['e'], CHF['c'], CHF['d']]}
+    trees = [tree_1, tree_2]
+    forest = FakeRObject(**{
+        'unique.death.times': np.array(DEATH_TIMES),
+        'independent.variable.names': variable_names,
+        'child.nodeIDs': [[np.array(left), np.array(right)] for left, right in (tree['children'] for tree in trees)],
+        'split.varIDs': [np.array(tree['var_ids']) for tree in trees],
+        'split.values': [np.array(tree['values'], dtype=float) for tree in trees],
+        'chf': [[np.array(node_chf, dtype=float) for node_chf in tree['chf']] for tree in trees],
+    })
+    return FakeRObject(forest=forest)
+
+
+def ml_rows(rows):
+    """Return ML input rows, zero apart from the given {column: value}."""
+    x = np.zeros((len(rows), len(ML_COLUMN_NAMES)))
+    for i, values in enumerate(rows):
+        for column, value in values.items():
+            x[i, ML_COLUMN_NAMES.index(column)] = value
+    return x
+
+
+ROWS = [
+    {'age_at_study_date': 5.0},
+    #A value equal to the split value goes left, as in ranger
+    {'age_at_study_date': 5.5},
+    {'age_at_study_date': 6.0},
+    {'age_at_study_date': 7.0},
+    {'age_at_study_date': 5.0, 'region_Gansu': 1},
+    {'age_at_study_date': 7.0, 'region_Gansu': 1},
+]
+
+#Terminal node reached in tree 1 and tree 2 by each row
+LEAVES = [('a', 'c'), ('a', 'c'), ('b', 'c'), ('b', 'd'), ('a', 'e'), ('b', 'e')]
+
+
+def expected_survival(offset):
+    columns = [DEATH_TIMES.index(year)+offset for year in YEARS]
+    return np.array([[np.exp(-(CHF[leaf_1][k]+CHF[leaf_2][k])/2) for k in columns] for leaf_1, leaf_2 in LEAVES])
+
+
+#The notebook reads the survival at the unique death time after each year
+@pytest.mark.parametrize('reading, offset', [('notebook', 1), ('exact', 0)])
+def test_from_ranger_matches_hand_computed_survival(reading, offset):
+    forest = SurvivalForest.from_ranger(ranger_model(), YEARS, reading)
+    assert forest.n_trees == 2
+    np.testing.assert_array_equal(forest.times, [DEATH_TIMES[DEATH_TIMES.index(year)+offset] for year in YEARS])
+    np.testing.assert_allclose(1-forest.cumulative_risk(ml_rows(ROWS)), expected_survival(offset), rtol=1e-12)
+
+
+def test_save_load_round_trip(tmp_path):
+    forest = SurvivalForest.from_ranger(ranger_model(), YEARS)
+    path = tmp_path / 'Male_RSF_Model.npz'
+    forest.save(path)
+    loaded = SurvivalForest.load(path)
+    np.testing.assert_array_equal(loaded.cumulative_risk(ml_rows(ROWS)), forest.cumulative_risk(ml_rows(ROWS)))
+
+
+def test_from_ranger_rejects_unknown_variables():
+    model = ranger_model()
+    model.rx2('forest').items['independent.variable.names'] = ['Gansu', 'not_a_risk_factor']
+    with pytest.raises(ValueError, match='not_a_risk_factor'):
+        SurvivalForest.from_ranger(model, YEARS)
@@ -0,0 +1,73 @@
+"""Compiled linear models: compiling, saving, loading and scoring.
+
+The SVM pickles of the repository need scikit-learn 0.22, so compiling is
+checked on a small calibrated SVM trained in the test with the installed
+scikit-learn; the shipped .npz files are checked to round trip.
+"""
+
+import glob
+import os
+
+import numpy as np
+import pytest
+
+from ckb_stroke.compiled import FORMAT_VERSION
+from ckb_stroke.linear import CalibratedLinearSVM, LogisticModel, stacked_svm_risk
+from ckb_stroke.registry import MODEL_DIR
+
+SVM_FILES = sorted(glob.glob(os.path.join(MODEL_DIR, '*_SVM_Model_*.npz')))
+
+
+def training_data(seed=0):
+    rng = np.random.default_rng(seed)
+    #Columns on different scales, as the risk factors are
+    x = rng.normal(size=(400, 6))*[1, 10, 100, 1, 1, 5] + [0, 50, 0, 0, 0, 0]
+    y = (x[:, 0]+x[:, 1]/10+rng.normal(size=len(x)) > 5).astype(int)
+    return x, y
+
+
+def random_input(n_features, n=50, seed=0):
+    return np.random.default_rng(seed).random((n, n_features))
+
+
+def assert_round_trip(model, path, x):
+    model.save(path)
+    loaded = type(model).load(path)
+    np.testing.assert_array_equal(loaded.predict_proba(x), model.predict_proba(x))
+    return loaded
+
+
+@pytest.mark.parametrize('path', SVM_FILES, ids=os.path.basename)
+def test_repository_svms_round_trip(path, tmp_path):
+    model = CalibratedLinearSVM.load(path)
+    assert_round_trip(model, tmp_path / os.path.basename(path), random_input(model.weights.shape[1]))
+
+
+def test_svm_compiles_from_sklearn(tmp_path):
+    calibration = pytest.importorskip('sklearn.calibration')
+    from sklearn.preprocessing import MinMaxScaler
+    from sklearn.svm import LinearSVC
+
+    x, y = training_data()
+    scaler = MinMaxScaler().fit(x)
+    classifier = calibration.CalibratedClassifierCV(LinearSVC(), cv=3, method='isotonic').fit(scaler.transform(x), y)
+    compiled = CalibratedLinearSVM.from_sklearn(classifier, scaler)
+    assert compiled.n_folds == 3
+    np.testing.assert_allclose(compiled.predict_proba(x), classifier.predict_proba(scaler.transform(x))[:, 1],
+                               atol=1e-12)
+    assert_round_trip(compiled, tmp_path / 'svm.npz', x)
+
+
+def test_stacked_svms_score_as_each_alone():
+    svms = [CalibratedLinearSVM.load(path) for path in SVM_FILES if os.path.basename(path).startswith('Male_')]
+    x = random_input(svms[0].weights.shape[1], n=200)
+    np.testing.assert_allclose(stacked_svm_risk(svms, x), np.column_stack([svm.predict_proba(x) for svm in svms]),
+                               rtol=1e-12)
+
+
+def test_load_rejects_other_format_versions(tmp_path):
+    path = tmp_path / 'lr.npz'
+    with open(path, 'wb') as f:
+        np.savez(f, format_version=FORMAT_VERSION+1, coef=np.zeros(3), intercept=np.array(0.0))
+    with pytest.raises(ValueError, match='format version'):
+        LogisticModel.load(path)
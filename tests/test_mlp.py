@@ -0,0 +1,60 @@
+"""Compiled MLPs: compiling from the Keras .h5 files, saving, loading and stacking."""
+
+import glob
+import os
+
+import numpy as np
+import pytest
+
+from ckb_stroke.export import EXPORTERS, export_models
+from ckb_stroke.mlp import DenseNetwork, stack_networks
+from ckb_stroke.parameters import HORIZONS
+from ckb_stroke.registry import MODEL_DIR, ModelRegistry, compiled_file_name
+from ckb_stroke.scoring import score_cohort
+
+from conftest import notebook_individual
+
+SEX = 'Male'
+MLP_FILES = sorted(glob.glob(os.path.join(MODEL_DIR, '*_MLP_Model_*.npz')))
+
+
+def random_input(n_features, n=50, seed=0):
+    return np.random.default_rng(seed).random((n, n_features))
+
+
+def shipped(sex, horizon):
+    return DenseNetwork.load(os.path.join(MODEL_DIR, compiled_file_name(sex, 'MLP', horizon)))
+
+
+@pytest.mark.parametrize('path', MLP_FILES, ids=os.path.basename)
+def test_repository_mlps_round_trip(path, tmp_path):
+    model = DenseNetwork.load(path)
+    x = random_input(model.kernels[0].shape[0])
+    model.save(tmp_path / 'mlp.npz')
+    np.testing.assert_array_equal(DenseNetwork.load(tmp_path / 'mlp.npz').predict(x), model.predict(x))
+
+
+@pytest.mark.parametrize('horizon', HORIZONS)
+def test_mlp_compiles_from_h5(horizon):
+    pytest.importorskip('h5py')
+    compiled = EXPORTERS['MLP'](ModelRegistry(), SEX, horizon)
+    x = random_input(compiled.kernels[0].shape[0], n=200)
+    np.testing.assert_allclose(compiled.predict(x), shipped(SEX, horizon).predict(x), rtol=1e-12)
+
+
+def test_stacked_networks_score_as_each_alone():
+    networks = [shipped(SEX, horizon) for horizon in HORIZONS]
+    x = random_input(networks[0].kernels[0].shape[0], n=200)
+    np.testing.assert_allclose(stack_networks(networks).predict(x), np.hstack([network.predict(x)
+                                                                               for network in networks]), rtol=1e-12)
+
+
+def test_exported_mlps_score_as_shipped(tmp_path):
+    pytest.importorskip('h5py')
+    written = export_models(['MLP'], out_dir=str(tmp_path))
+    assert len(written) == 2*len(HORIZONS)
+    raw_df = notebook_individual()
+    exported = score_cohort(raw_df, SEX, families=['MLP'], registry=ModelRegistry(str(tmp_path)))
+    assert not exported.isna().any().any()
+    np.testing.assert_allclose(exported.to_numpy(), score_cohort(raw_df, SEX, families=['MLP']).to_numpy(),
+                               rtol=1e-12)
@@ -0,0 +1,73 @@
+"""The risk table of the notebook's sample individual, pinned for both sexes, several regions and missing values.
+
+The expected risks in data/notebook_individual_risks.csv were scored from the
+trained models in the repository, and agree with the figure the notebook
+saved for its own case. RSF is left out: it needs R and the .rds files, which
+are not in the repository. No female GBT models are shipped, so those risks
+are NaN.
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from ckb_stroke.parameters import HORIZON_LABELS, HORIZONS, MODEL_FAMILIES, MODEL_LABELS, SEXES
+from ckb_stroke.preprocessing import MISSING
+from ckb_stroke.scoring import risk_table, score_cohort
+
+from conftest import DATA_DIR, notebook_individual
+
+GOLDEN_PATH = os.path.join(DATA_DIR, 'notebook_individual_risks.csv')
+GOLDEN_FAMILIES = ['FSRP', 'Recalibrated_Refitted_FSRP', 'Cox', 'LR', 'SVM', 'GBT', 'MLP']
+
+REGIONS = ['Haikou', 'Gansu', 'Qingdao', 'Sichuan']
+
+#Risk factors entered as 'Missing' in the incomplete cases, including a whole one-hot group
+MISSING_COLUMNS = ['sbp_mean', 'dbp_mean', 'bmi_calc', 'fat_percent'] + ['household_income_{}'.format(k)
+                                                                         for k in range(6)]
+
+CASES = [(sex, region, False) for sex in SEXES for region in REGIONS] + [(sex, 'Haikou', True) for sex in SEXES]
+
+#The notebook's saved figure for its sample individual (Female, Haikou), in percent, horizons by GOLDEN_FAMILIES;
+#it shows GBT too, but the female GBT models are not in the repository
+NOTEBOOK_FIGURE = [[0.2, 4.5, 4.1, 4.7, 4.0, np.nan, 3.6],
+                   [0.0, 0.7, 0.6, 0.7, 1.1, np.nan, 0.8],
+                   [0.1, 1.8, 1.6, 1.8, 1.7, np.nan, 4.3],
+                   [0.1, 2.0, 1.8, 1.9, 1.1, np.nan, 2.1]]
+
+
+def case_individual(sex, region, missing):
+    changes = {'sex': sex, 'region': region}
+    if missing:
+        changes.update(dict.fromkeys(MISSING_COLUMNS, MISSING))
+    return notebook_individual(**changes)
+
+
+def golden_table(sex, region, missing):
+    """Return the expected risk table of a case, horizons by model families as in risk_table."""
+    golden = pd.read_csv(GOLDEN_PATH).set_index(['sex', 'region', 'missing'])
+    risks = golden.loc[(sex, region, missing)]
+    return np.array([[risks['{}_{}'.format(family, horizon)] for family in GOLDEN_FAMILIES] for horizon in HORIZONS])
+
+
+@pytest.mark.parametrize('sex,region,missing', CASES)
+def test_risk_table(sex, region, missing):
+    risk_df = score_cohort(case_individual(sex, region, missing), sex, families=GOLDEN_FAMILIES)
+    table = risk_table(risk_df, 0)
+    assert list(table.index) == HORIZON_LABELS
+    assert list(table.columns) == [MODEL_LABELS[MODEL_FAMILIES.index(family)] for family in GOLDEN_FAMILIES]
+    np.testing.assert_allclose(table.to_numpy(), golden_table(sex, region, missing), rtol=1e-9, atol=1e-12)
+
+
+def test_matches_notebook_figure():
+    risk_df = score_cohort(notebook_individual(), 'Female', families=GOLDEN_FAMILIES)
+    np.testing.assert_array_equal(np.round(100*risk_table(risk_df, 0).to_numpy(), 1), NOTEBOOK_FIGURE)
+
+
+def test_cases_score_together_as_alone():
+    raw_df = pd.concat([case_individual(*case) for case in CASES], ignore_index=True)
+    risk_df = score_cohort(raw_df, [sex for sex, _, _ in CASES], families=GOLDEN_FAMILIES)
+    for row, case in enumerate(CASES):
+        np.testing.assert_allclose(risk_table(risk_df, row).to_numpy(), golden_table(*case), rtol=1e-9, atol=1e-12)
@@ -0,0 +1,49 @@
+"""Sharded scoring across worker processes, against scoring in this process."""
+
+import numpy as np
+
+from ckb_stroke.parallel import ParallelScorer, attach_models, share_models
+from ckb_stroke.registry import ModelRegistry
+from ckb_stroke.scoring import score_cohort
+
+from conftest import varied_individuals
+
+SEX = 'Male'
+#RSF needs R and the .rds files, which are not in the repository
+FAMILIES = ['FSRP', 'Recalibrated_Refitted_FSRP', 'Cox', 'LR', 'SVM', 'GBT', 'MLP']
+
+
+def test_parallel_scorer():
+    raw_df = varied_individuals(50, sex=SEX)
+    with ParallelScorer(2, FAMILIES, sexes=[SEX]) as scorer:
+        risk_df = scorer.score(raw_df, SEX)
+    expected_df = score_cohort(raw_df, SEX, families=FAMILIES, registry=ModelRegistry())
+    assert risk_df.index.equals(expected_df.index)
+    #Shards are scored in smaller batches, which may round the matrix products differently
+    np.testing.assert_allclose(risk_df.to_numpy(), expected_df.to_numpy(), rtol=1e-12, atol=0)
+
+
+def test_parallel_scorer_mixed_sexes(cohort):
+    with ParallelScorer(2, FAMILIES) as scorer:
+        risk_df = scorer.score(cohort)
+        assert risk_df.index.equals(cohort.index)
+        np.testing.assert_allclose(risk_df.to_numpy(), score_cohort(cohort, families=FAMILIES).to_numpy(),
+                                   rtol=1e-12, atol=0)
+        np.testing.assert_allclose(scorer.score(cohort, cohort['sex'].to_numpy()).to_numpy(), risk_df.to_numpy(),
+                                   rtol=1e-12, atol=0)
+
+
+def test_attached_models_are_views_of_the_block():
+    block, index = share_models(ModelRegistry(), [SEX], ['SVM', 'GBT', 'MLP'])
+    try:
+        registry = ModelRegistry()
+        attach_models(block, index, registry)
+        gbt = registry.get(SEX, 'GBT', '9yr')
+        stacked_gbt, stacked_mlp = registry.stacked(SEX, 'GBT'), registry.stacked(SEX, 'MLP')
+        arrays = ([registry.get(SEX, 'SVM', '9yr').weights] + registry.get(SEX, 'MLP', '9yr').kernels
+                  + gbt._levels + gbt.cut_points + stacked_gbt._levels + [stacked_gbt.value] + stacked_mlp.kernels)
+        assert not any(array.flags.owndata for array in arrays)
+        del arrays, gbt, stacked_gbt, stacked_mlp, registry
+    finally:
+        block.close()
+        block.unlink()
@@ -0,0 +1,52 @@
+"""Risk report writers: batches appended to a report read back as the whole scored cohort."""
+
+import numpy as np
+import pandas as pd
+
+from ckb_stroke.cli import main
+from ckb_stroke.report import RiskWriter, flat_columns, html_tables, write_risks
+from ckb_stroke.scoring import score_cohort
+
+from conftest import notebook_individual
+
+FAMILIES = ['FSRP', 'Cox', 'RSF']
+
+
+def scored(cohort):
+    return score_cohort(cohort, families=FAMILIES)
+
+
+def test_jsonl_batches(cohort, tmp_path):
+    risk_df = scored(cohort)
+    path = str(tmp_path / 'risks.jsonl')
+    with RiskWriter(path) as writer:
+        for start in range(0, len(risk_df), 25):
+            writer.write(risk_df.iloc[start:start+25])
+    report_df = pd.read_json(path, lines=True).set_index('id')
+    assert list(report_df.index) == list(risk_df.index)
+    #to_json writes 10 decimal places
+    np.testing.assert_allclose(report_df.to_numpy(dtype=np.float64), flat_columns(risk_df).to_numpy(), rtol=0,
+                               atol=1e-10)
+
+
+def test_html_tables_show_percentages():
+    risk_df = score_cohort(notebook_individual(), 'Female', families=FAMILIES)
+    tables = html_tables(risk_df)
+    assert tables.count('<table>') == 1
+    assert '<td>{:.1f}%</td>'.format(100*risk_df[('Cox', '9yr')].iloc[0]) in tables
+    #RSF is not scored here
+    assert '<td>n/a</td>' in tables
+
+
+def test_empty_html_report_is_a_document(tmp_path):
+    path = str(tmp_path / 'risks.html')
+    write_risks(score_cohort(notebook_individual().iloc[:0], 'Female', families=FAMILIES), path)
+    with open(path) as f:
+        assert f.read().rstrip().endswith('</html>')
+
+
+def test_cli_format_from_extension(cohort, tmp_path):
+    input_path, output_path = tmp_path / 'cohort.csv', tmp_path / 'risks.jsonl'
+    cohort.to_csv(input_path, index=False)
+    main(['score', str(input_path), '--models', 'fsrp,cox', '-o', str(output_path), '--chunk-size', '7'])
+    assert len(pd.read_json(output_path, lines=True)) == len(cohort)
@@ -0,0 +1,80 @@
+"""RSF survival read from ranger predictions, with the R session faked."""
+
+import threading
+
+import numpy as np
+import pytest
+
+from ckb_stroke import rsession
+from ckb_stroke.parameters import ML_COLUMN_NAMES
+
+YEARS = [3, 6, 9]
+DEATH_TIMES = np.array([0.5, 2.0, 3.0, 4.5, 6.0, 7.0, 9.0, 9.5])
+
+
+class FakeRanger:
+    """A ranger model whose predictions hold `survival`, one column per unique death time."""
+
+    def __init__(self, survival):
+        self.survival = survival
+
+    def rx2(self, name):
+        return {'unique.death.times': DEATH_TIMES}[name]
+
+
+class FakeSession:
+    """Runs _SURVIVAL_AT's selection as R would: predict, then take the 1-based `columns` of the survival matrix."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.robjects = self
+        self.columns = None
+
+    def IntVector(self, values):
+        return list(values)
+
+    def data_frame(self, x, columns):
+        assert columns == rsession.RSF_COLUMN_NAMES
+        return x
+
+    def survival_at(self, model, data, columns):
+        self.columns = columns
+        survival = model.survival[:len(data)]
+        #R returns the matrix column-major
+        return survival[:, [column-1 for column in columns]].ravel(order='F')
+
+
+@pytest.fixture
+def session(monkeypatch):
+    session = FakeSession()
+    monkeypatch.setattr(rsession, 'get_session', lambda: session)
+    return session
+
+
+def fake_survival(n_rows):
+    #Survival falls with time, differently for each row, so every column is distinct
+    return np.exp(-np.outer(np.arange(1, n_rows+1)/100, DEATH_TIMES))
+
+
+def test_survival_columns_default_to_the_notebook_reading():
+    #The notebook reads the unique death time after each year
+    np.testing.assert_array_equal(rsession.survival_columns(DEATH_TIMES, YEARS), [3, 5, 7])
+    np.testing.assert_array_equal(rsession.survival_columns(DEATH_TIMES, YEARS, 'exact'), [2, 4, 6])
+
+
+def test_survival_columns_reject_missing_years():
+    with pytest.raises(ValueError, match='6'):
+        rsession.survival_columns(np.array([3.0, 5.9, 9.0]), YEARS, 'exact')
+    with pytest.raises(ValueError, match='after 9'):
+        rsession.survival_columns(np.array([3.0, 6.0, 9.0]), YEARS)
+    with pytest.raises(ValueError, match='reading'):
+        rsession.survival_columns(DEATH_TIMES, YEARS, 'nearest')
+
+
+@pytest.mark.parametrize('reading, columns', [('notebook', [3, 5, 7]), ('exact', [2, 4, 6])])
+def test_ranger_survival_reads_the_chosen_columns(session, reading, columns):
+    survival = fake_survival(5)
+    x = np.zeros((5, len(ML_COLUMN_NAMES)))
+    result = rsession.ranger_survival(FakeRanger(survival), x, YEARS, reading)
+    assert session.columns == [column+1 for column in columns]
+    np.testing.assert_array_equal(result, survival[:, columns])
@@ -0,0 +1,132 @@
+"""Every way of scoring a cohort gives the risks of plain score_cohort."""
+
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from ckb_stroke import metrics
+from ckb_stroke.cache import ResultCache
+from ckb_stroke.fanout import FanOutScorer
+from ckb_stroke.benchmark import synthetic_cohort
+from ckb_stroke.parameters import HORIZONS, MODEL_FAMILIES, SEXES
+from ckb_stroke.precision import ReducedPrecision
+from ckb_stroke.preprocessing import derive_features, impute_missing_values
+from ckb_stroke.scoring import score_cohort, score_features, sex_partitions
+
+#RSF needs R and the .rds files, which are not in the repository
+FAMILIES = [family for family in MODEL_FAMILIES if family != 'RSF']
+
+
+def assert_same_risks(risk_df, expected_df, rtol=0):
+    """Compare risk tables, exactly by default; batches of other sizes may round the matrix products differently."""
+    assert risk_df.index.equals(expected_df.index)
+    assert risk_df.columns.equals(expected_df.columns)
+    np.testing.assert_allclose(risk_df.to_numpy(), expected_df.to_numpy(), rtol=rtol, atol=0)
+
+
+def test_mixed_sexes_score_as_each_sex(cohort):
+    risk_df = score_cohort(cohort, families=FAMILIES)
+    assert risk_df.index.equals(cohort.index)
+    for sex in SEXES:
+        rows = cohort['sex'] == sex
+        assert_same_risks(risk_df[rows], score_cohort(cohort[rows], sex, families=FAMILIES), rtol=1e-12)
+
+
+def test_sex_per_row_as_sex_column(cohort):
+    expected_df = score_cohort(cohort, families=FAMILIES)
+    assert_same_risks(score_cohort(cohort.drop(columns='sex'), list(cohort['sex']), families=FAMILIES), expected_df)
+
+
+def test_cache(cohort):
+    expected_df = score_cohort(cohort, families=FAMILIES)
+    cache = ResultCache()
+    assert_same_risks(score_cohort(cohort, families=FAMILIES, cache=cache), expected_df)
+    assert cache.stats()['misses'] == len(cohort)
+    assert_same_risks(score_cohort(cohort, families=FAMILIES, cache=cache), expected_df)
+    assert cache.stats()['hits'] == len(cohort)
+    #Half of a batch from the cache, the other half scored
+    mixed_df = pd.concat([cohort.iloc[::2], cohort.iloc[1::2].assign(age=cohort['age'].iloc[1::2]+1)])
+    assert_same_risks(score_cohort(mixed_df, families=FAMILIES, cache=cache),
+                      score_cohort(mixed_df, families=FAMILIES), rtol=1e-12)
+
+
+def test_cache_evicts_least_recently_used(cohort):
+    cache = ResultCache(max_entries=10)
+    score_cohort(cohort, families=['FSRP'], cache=cache)
+    assert len(cache) == 10
+    assert cache.stats()['evictions'] == len(cohort)-10
+
+
+def test_executor(cohort):
+    expected_df = score_cohort(cohort, families=FAMILIES)
+    with ThreadPoolExecutor(4) as executor:
+        assert_same_risks(score_cohort(cohort, families=FAMILIES, executor=executor), expected_df)
+    with FanOutScorer(4, families=FAMILIES) as scorer:
+        assert_same_risks(scorer.score(cohort), expected_df)
+
+
+def test_reduced_precision(cohort):
+    expected_df = score_cohort(cohort, families=FAMILIES)
+    precision = ReducedPrecision(tolerance=1e-4)
+    risk_df = score_cohort(cohort, families=FAMILIES, precision=precision)
+    report_df = precision.report(FAMILIES)
+    assert report_df['float32'].any()
+    for sex in SEXES:
+        rows = (cohort['sex'] == sex).to_numpy()
+        float32_families = precision.float32_families(sex, FAMILIES)
+        for family in FAMILIES:
+            risks, expected = risk_df.loc[rows, family].to_numpy(), expected_df.loc[rows, family].to_numpy()
+            if family in float32_families:
+                #The reference sample is not this cohort, so allow a margin over the tolerance
+                np.testing.assert_allclose(risks, expected, atol=10*precision.tolerance)
+            else:
+                np.testing.assert_array_equal(risks, expected)
+
+
+
+def test_score_features_matches_score_cohort(cohort):
+    male_df = cohort[cohort['sex'] == 'Male']
+    features, _ = impute_missing_values(derive_features(male_df), 'Male')
+    _, partitions = sex_partitions('Male', len(features))
+    risks = score_features(features, partitions, FAMILIES)
+    assert risks.shape == (len(male_df), len(FAMILIES), len(HORIZONS))
+    risk_df = score_cohort(male_df, 'Male', families=FAMILIES)
+    np.testing.assert_array_equal(risks.reshape(len(risk_df), -1), risk_df.to_numpy())
+
+
+def test_score_features_keeps_float32():
+    features, _ = impute_missing_values(derive_features(synthetic_cohort(20, 'Male')), 'Male')
+    _, partitions = sex_partitions('Male', len(features))
+    float64_risks = score_features(features, partitions, ['FSRP', 'LR'])
+    float32_risks = score_features(features.astype(np.float32), partitions, ['FSRP', 'LR'])
+    assert not np.array_equal(float32_risks, float64_risks)
+    np.testing.assert_allclose(float32_risks, float64_risks, atol=1e-5)
+
+##########################################################################################################
+#MISSING TRAINED MODELS
+
+def test_missing_model_warns_and_is_nan(cohort):
+    enabled = metrics.METRICS.enabled
+    metrics.enable()
+    metrics.METRICS.reset()
+    try:
+        with pytest.warns(UserWarning, match='No trained RSF model for Male'):
+            risk_df = score_cohort(cohort, families=['FSRP', 'RSF'])
+        missing = metrics.METRICS.snapshot()['missing_models']
+    finally:
+        metrics.METRICS.enabled = enabled
+        metrics.METRICS.reset()
+    assert risk_df['RSF'].isna().all().all()
+    assert risk_df['FSRP'].notna().all().all()
+    assert sorted((entry['model'], entry['sex']) for entry in missing) == [('RSF', 'Female'), ('RSF', 'Male')]
+
+
+def test_strict_raises_for_missing_model(cohort):
+    with pytest.raises(FileNotFoundError, match='No trained GBT model for Female'):
+        score_cohort(cohort, families=['GBT'], strict=True)
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        score_cohort(cohort[cohort['sex'] == 'Male'], families=['GBT'], strict=True)
@@ -0,0 +1,71 @@
+"""The micro-batcher and HTTP handler: failing requests are answered without holding up the others."""
+
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+from ckb_stroke import service
+from ckb_stroke.service import MicroBatcher, _make_handler
+
+from conftest import notebook_individual
+
+#Requests with this age fail in scoring, although they are valid
+FAILING_AGE = 77
+
+
+def request(**changes):
+    return notebook_individual(**changes).iloc[0].to_dict()
+
+
+@pytest.fixture
+def failing_score_cohort(monkeypatch):
+    score_cohort = service.score_cohort
+
+    def score_or_fail(raw_df, *args, **kwargs):
+        if (raw_df['age'] == FAILING_AGE).any():
+            raise RuntimeError('scoring failed')
+        return score_cohort(raw_df, *args, **kwargs)
+
+    monkeypatch.setattr(service, 'score_cohort', score_or_fail)
+
+
+def test_invalid_and_failing_requests_in_one_batch(failing_score_cohort):
+    batcher = MicroBatcher(max_batch_size=3, max_wait=1, families=['FSRP'])
+    invalid = batcher.submit('Female', request(region='Beijing'))
+    failing = batcher.submit('Female', request(age=FAILING_AGE))
+    valid = batcher.submit('Male', request())
+    with pytest.raises(ValueError, match='region'):
+        invalid.result(5)
+    with pytest.raises(RuntimeError, match='scoring failed'):
+        failing.result(5)
+    assert valid.result(5).notna().all()
+    assert batcher.stats.batches == 1
+    #The batching thread is still running
+    assert batcher.is_alive()
+    assert batcher.score('Male', request(), timeout=5).notna().all()
+
+
+def test_timeout_is_504(monkeypatch):
+    score_cohort = service.score_cohort
+
+    def slow_score_cohort(*args, **kwargs):
+        time.sleep(0.5)
+        return score_cohort(*args, **kwargs)
+
+    monkeypatch.setattr(service, 'score_cohort', slow_score_cohort)
+    batcher = MicroBatcher(max_wait=0, families=['FSRP'])
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _make_handler(batcher, timeout=0.05))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        body = json.dumps(dict(request(), sex='Female')).encode('utf-8')
+        with pytest.raises(urllib.error.HTTPError) as error_info:
+            urllib.request.urlopen('http://127.0.0.1:{}/score'.format(server.server_port), body, timeout=5)
+        assert error_info.value.code == 504
+    finally:
+        server.shutdown()
+        server.server_close()
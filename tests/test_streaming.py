@@ -0,0 +1,49 @@
+"""Chunked scoring of cohort files, against scoring the whole cohort at once."""
+
+import numpy as np
+import pandas as pd
+
+from ckb_stroke.cli import main
+from ckb_stroke.scoring import score_cohort
+from ckb_stroke.report import flat_columns
+from ckb_stroke.streaming import score_file
+
+from conftest import varied_individuals
+
+#RSF needs R and the .rds files, which are not in the repository
+FAMILIES = ['FSRP', 'Recalibrated_Refitted_FSRP', 'Cox', 'LR', 'SVM', 'GBT', 'MLP']
+
+
+def test_score_file(tmp_path):
+    input_path = tmp_path / 'cohort.csv'
+    varied_individuals(60).to_csv(input_path, index=False)
+    assert score_file(str(input_path), str(tmp_path / 'whole.csv'), families=FAMILIES, chunk_size=1000) == 60
+    assert score_file(str(input_path), str(tmp_path / 'chunked.csv'), families=FAMILIES, chunk_size=7) == 60
+    whole_df = pd.read_csv(tmp_path / 'whole.csv', index_col=0)
+    chunked_df = pd.read_csv(tmp_path / 'chunked.csv', index_col=0)
+    expected_df = flat_columns(score_cohort(pd.read_csv(input_path), families=FAMILIES))
+    assert list(chunked_df.columns) == list(expected_df.columns)
+    assert chunked_df.index.equals(expected_df.index)
+    #CSV holds 15 significant digits
+    np.testing.assert_allclose(whole_df.to_numpy(), expected_df.to_numpy(), rtol=1e-12)
+    np.testing.assert_allclose(chunked_df.to_numpy(), whole_df.to_numpy(), rtol=1e-12)
+
+
+def test_score_file_quarantine(cohort, tmp_path):
+    input_path, output_path, quarantine_path = tmp_path / 'cohort.csv', tmp_path / 'risks.csv', tmp_path / 'bad.csv'
+    cohort.loc[[3, 40], 'region'] = 'Beijing'
+    cohort.to_csv(input_path, index=False)
+    n_rows = score_file(str(input_path), str(output_path), families=['FSRP'], chunk_size=25,
+                        quarantine=str(quarantine_path))
+    assert n_rows == len(cohort)-2
+    assert list(pd.read_csv(quarantine_path, index_col=0).index) == [3, 40]
+    assert 3 not in pd.read_csv(output_path, index_col=0).index
+
+
+def test_cli_chunk_size(tmp_path):
+    input_path = tmp_path / 'cohort.csv'
+    varied_individuals(20).to_csv(input_path, index=False)
+    for name, chunk_size in [('whole.csv', []), ('chunked.csv', ['--chunk-size', '3'])]:
+        main(['score', str(input_path), '--models', 'fsrp,cox,lr', '-o', str(tmp_path / name)] + chunk_size)
+    np.testing.assert_allclose(pd.read_csv(tmp_path / 'chunked.csv', index_col=0).to_numpy(),
+                               pd.read_csv(tmp_path / 'whole.csv', index_col=0).to_numpy(), rtol=1e-12)
@@ -0,0 +1,71 @@
+"""Compiled GBT ensembles: compiling, saving, loading and stacking.
+
+The GBT pickles of the repository need scikit-learn 0.22, so compiling is
+checked on small ensembles trained in the test with the installed
+scikit-learn; the shipped .npz files are checked to round trip.
+"""
+
+import glob
+import os
+
+import numpy as np
+import pytest
+
+from ckb_stroke.registry import MODEL_DIR
+from ckb_stroke.trees import TreeEnsemble, stack_ensembles
+
+GBT_FILES = sorted(glob.glob(os.path.join(MODEL_DIR, '*_GBT_Model_*.npz')))
+
+
+def training_data(seed=0):
+    rng = np.random.default_rng(seed)
+    #Columns on different scales, as the risk factors are
+    x = rng.normal(size=(400, 6))*[1, 10, 100, 1, 1, 5] + [0, 50, 0, 0, 0, 0]
+    y = (x[:, 0]+x[:, 1]/10+rng.normal(size=len(x)) > 5).astype(int)
+    return x, y
+
+
+def random_input(n_features, n=50, seed=0):
+    return np.random.default_rng(seed).random((n, n_features))
+
+
+def n_features(ensemble):
+    return int(ensemble.feature.max())+1
+
+
+@pytest.mark.parametrize('path', GBT_FILES, ids=os.path.basename)
+def test_repository_ensembles_round_trip(path, tmp_path):
+    model = TreeEnsemble.load(path)
+    x = random_input(n_features(model))
+    model.save(tmp_path / 'gbt.npz')
+    np.testing.assert_array_equal(TreeEnsemble.load(tmp_path / 'gbt.npz').predict_proba(x), model.predict_proba(x))
+
+
+@pytest.mark.parametrize('max_depth', [1, 3, 5])
+def test_gbt_compiles_from_sklearn(max_depth, tmp_path):
+    ensemble = pytest.importorskip('sklearn.ensemble')
+    x, y = training_data()
+    classifier = ensemble.GradientBoostingClassifier(n_estimators=20, max_depth=max_depth, random_state=0).fit(x, y)
+    compiled = TreeEnsemble.from_sklearn(classifier)
+    np.testing.assert_allclose(compiled.predict_proba(x)[:, 0], classifier.predict_proba(x)[:, 1], atol=1e-12)
+
+
+def test_stacked_ensembles_score_as_each_alone():
+    ensemble = pytest.importorskip('sklearn.ensemble')
+    x, y = training_data()
+    #Different depths, so the shallower ensembles are deepened when stacked
+    ensembles = [TreeEnsemble.from_sklearn(ensemble.GradientBoostingClassifier(
+        n_estimators=10, max_depth=max_depth, random_state=0).fit(x, y)) for max_depth in [2, 4]]
+    np.testing.assert_allclose(stack_ensembles(ensembles).predict_proba(x),
+                               np.hstack([compiled.predict_proba(x) for compiled in ensembles]), rtol=1e-12)
+
+
+@pytest.mark.parametrize('path', GBT_FILES[:1], ids=os.path.basename)
+def test_ensembles_attach_mapped_traversal_arrays(path):
+    model = TreeEnsemble.load(path)
+    attached = TreeEnsemble.from_arrays(model.mapped_arrays())
+    x = random_input(n_features(model))
+    np.testing.assert_array_equal(attached.predict_proba(x), model.predict_proba(x))
+    stacked = stack_ensembles([model, model])
+    np.testing.assert_array_equal(TreeEnsemble.from_arrays(stacked.mapped_arrays()).predict_proba(x),
+                                  stacked.predict_proba(x))
@@ -0,0 +1,106 @@
+"""Per-row error masks of validate, starting from the notebook's sample individual."""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from ckb_stroke.preprocessing import MISSING
+from ckb_stroke.validation import ERROR_COLUMNS, ONE_HOT_GROUPS, validate
+
+from conftest import notebook_individual
+
+HOUSEHOLD_INCOME = ONE_HOT_GROUPS['household_income']
+
+
+def flagged(report, row=0):
+    """Return the error mask columns set for one row."""
+    errors = report.errors.iloc[row]
+    return sorted(errors.index[errors.to_numpy()])
+
+
+def test_notebook_individual_is_valid():
+    report = validate(notebook_individual(), 'Female')
+    assert list(report.errors.columns) == ERROR_COLUMNS
+    assert report.n_invalid == 0
+    assert report.messages() == {}
+
+
+@pytest.mark.parametrize('changes,errors', [
+    ({'region': 'Beijing'}, ['region']),
+    ({'age': 12}, ['age']),
+    ({'sbp_mean': 400}, ['sbp_mean']),
+    ({'has_diabetes': 2}, ['has_diabetes']),
+    ({'children': 1.5}, ['children']),
+    ({'siblings': -1}, ['siblings']),
+    ({'waist_cm': 'seventy'}, ['waist_cm']),
+    #Two categories of one group, and none
+    ({'occupation_0': 1}, ['occupation_*']),
+    ({'occupation_3': 0}, ['occupation_*']),
+    #An indicator out of range also breaks its group
+    ({'occupation_3': 2}, ['occupation_3', 'occupation_*']),
+    ({'age': 12, 'region': 'Beijing', 'gum_bleed_freq_1': 1}, ['age', 'gum_bleed_freq_*', 'region']),
+])
+def test_errors_are_flagged_where_they_are(changes, errors):
+    report = validate(notebook_individual(**changes), 'Female')
+    assert flagged(report) == sorted(errors)
+
+
+@pytest.mark.parametrize('changes', [
+    {'sbp_mean': MISSING, 'has_diabetes': MISSING, 'children': MISSING, 'waist_cm': np.nan},
+    #A one-hot group entirely missing is imputed
+    dict.fromkeys(HOUSEHOLD_INCOME, MISSING),
+])
+def test_missing_values_are_valid(changes):
+    assert validate(notebook_individual(**changes), 'Female').n_invalid == 0
+
+
+def test_partly_missing_one_hot_group_is_invalid():
+    report = validate(notebook_individual(**{HOUSEHOLD_INCOME[0]: MISSING}), 'Female')
+    assert flagged(report) == ['household_income_*']
+
+
+def test_sex():
+    raw_df = pd.concat([notebook_individual()]*3, ignore_index=True)
+    assert validate(raw_df, 'Unknown').n_invalid == 3
+    report = validate(raw_df, ['Male', 'female', 'Female'])
+    assert list(report.invalid) == [False, True, False]
+    assert flagged(report, 1) == ['sex']
+    #Without a sex, only the risk factors are checked
+    assert validate(raw_df).n_invalid == 0
+    with pytest.raises(ValueError, match='2 sexes for 3 rows'):
+        validate(raw_df, ['Male', 'Female'])
+
+
+def test_masks_by_row():
+    raw_df = pd.concat([notebook_individual(), notebook_individual(region='Beijing'), notebook_individual(age=12),
+                        notebook_individual()], ignore_index=True)
+    raw_df.index = ['a', 'b', 'c', 'd']
+    report = validate(raw_df, 'Male')
+    assert report.errors.index.equals(raw_df.index)
+    assert list(report.valid) == [True, False, False, True]
+    assert list(report.errors['region']) == [False, True, False, False]
+    assert list(report.errors['age']) == [False, False, True, False]
+    valid_df, invalid_df = report.split(raw_df)
+    assert list(valid_df.index) == ['a', 'd'] and list(invalid_df.index) == ['b', 'c']
+    quarantined_df = report.quarantined(raw_df)
+    assert list(quarantined_df['errors']) == ['region: not one of Qingdao, Harbin, Haikou, Suzhou, Liuzhou, Sichuan, '
+                                              'Gansu, Henan, Zhejiang, Hunan', 'age: not a number from 18 to 120']
+
+
+def test_duplicate_index_by_position():
+    raw_df = pd.concat([notebook_individual(age=12), notebook_individual(), notebook_individual(region='Beijing')])
+    assert list(raw_df.index) == [0, 0, 0]
+    report = validate(raw_df, 'Male')
+    assert report.row_messages() == [['age: not a number from 18 to 120'], [
+        'region: not one of Qingdao, Harbin, Haikou, Suzhou, Liuzhou, Sichuan, Gansu, Henan, Zhejiang, Hunan']]
+    assert report.messages() == {0: report.row_messages()[0] + report.row_messages()[1]}
+    valid_df, invalid_df = report.split(raw_df)
+    assert len(valid_df) == 1 and list(invalid_df['age']) == [12, 43]
+    quarantined_df = report.quarantined(raw_df)
+    assert list(quarantined_df['age']) == [12, 43]
+    assert list(quarantined_df['errors']) == ['; '.join(messages) for messages in report.row_messages()]
+
+
+def test_missing_columns_raise():
+    with pytest.raises(ValueError, match='Missing risk factor columns: waist_cm'):
+        validate(notebook_individual().drop(columns='waist_cm'))
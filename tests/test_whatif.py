@@ -0,0 +1,60 @@
+"""What-if scoring of perturbations of one individual, against scoring the perturbed copies as a cohort."""
+
+import numpy as np
+import pytest
+
+from ckb_stroke.linear import linear_predictor
+from ckb_stroke.parameters import RAW_COLUMN_NAMES
+from ckb_stroke.preprocessing import dependent_columns, derive_features, impute_missing_values
+from ckb_stroke.scoring import score_cohort
+from ckb_stroke.whatif import perturbed_cohort, sensitivity_curve, what_if
+
+from conftest import notebook_individual
+
+SEX = 'Female'
+#RSF needs R and the .rds files, which are not in the repository
+FAMILIES = ['FSRP', 'Recalibrated_Refitted_FSRP', 'Cox', 'LR', 'SVM', 'MLP']
+
+PERTURBATIONS = [{'sbp_mean': 120}, {'smoking_category_4': 1, 'smoking_category_1': 0}, {'age': 70, 'has_diabetes': 1},
+                 {'region': 'Gansu'}, {'bmi_calc': 'Missing'}]
+
+
+def test_what_if_scores_as_perturbed_cohort():
+    base = notebook_individual()
+    risk_df = what_if(base, SEX, PERTURBATIONS, families=FAMILIES)
+    expected_df = score_cohort(perturbed_cohort(base, PERTURBATIONS), SEX, families=FAMILIES)
+    assert risk_df.columns.equals(expected_df.columns)
+    np.testing.assert_allclose(risk_df.to_numpy(), expected_df.to_numpy(), rtol=1e-12)
+
+
+def test_sensitivity_curve():
+    base, values = notebook_individual(), np.linspace(100, 180, 9)
+    curve_df = sensitivity_curve(base, SEX, 'sbp_mean', values, families=FAMILIES)
+    assert list(curve_df.index) == list(values)
+    perturbations = [{'sbp_mean': value} for value in values]
+    expected_df = score_cohort(perturbed_cohort(base, perturbations), SEX, families=FAMILIES)
+    np.testing.assert_allclose(curve_df.to_numpy(), expected_df.iloc[1:].to_numpy(), rtol=1e-12)
+    #Higher systolic blood pressure never lowers the FSRP 9-year risk
+    assert np.all(np.diff(curve_df[('FSRP', '9yr')].to_numpy()) >= 0)
+
+
+def test_unknown_risk_factor():
+    with pytest.raises(ValueError, match='Unknown risk factors'):
+        what_if(notebook_individual(), SEX, [{'sbp': 120}])
+
+
+def test_perturbed_inputs_differ_only_in_dependent_columns():
+    base = notebook_individual()
+    for column in RAW_COLUMN_NAMES:
+        values = ['Gansu', 'Harbin'] if column == 'region' else ['Missing', 0, 1, 200]
+        raw_df = perturbed_cohort(base, [{column: value} for value in values])
+        features, _ = impute_missing_values(derive_features(raw_df), SEX)
+        differing = np.flatnonzero((features.data != features.data[0]).any(axis=0))
+        assert set(differing) <= set(dependent_columns([column])), column
+
+
+def test_linear_predictor_over_changed_columns():
+    x = np.random.default_rng(0).random((20, 6))
+    x[1:, [0, 2, 5]] = x[0, [0, 2, 5]]
+    coeffs = np.random.default_rng(1).random((6, 4))
+    np.testing.assert_allclose(linear_predictor(x, coeffs, np.array([1, 3, 4])), x.dot(coeffs), rtol=1e-12)